@@ -0,0 +1,50 @@
+"""
+Identifies the client behind each request for usage accounting and budgets.
+
+The client header is not authenticated, so it is only trusted from the
+peers listed in USAGE_TRUSTED_PROXIES: the bundled frontends, or a
+reverse proxy that authenticates callers and overwrites the header.
+"""
+import re
+from config.settings import settings
+from services.usage import current_client
+
+
+CLIENT_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+
+def is_trusted_peer(client) -> bool:
+    """Return True if the ASGI (host, port) client may set the client header."""
+    return bool(client) and client[0] in settings.USAGE_TRUSTED_PROXIES
+
+
+def client_id_from_headers(headers) -> str:
+    """Return the client ID from the request headers, or the default client."""
+    header = settings.USAGE_CLIENT_HEADER.lower().encode("latin-1")
+    for key, value in headers:
+        if key.lower() == header:
+            client_id = value.decode("latin-1").strip()
+            if CLIENT_ID_PATTERN.match(client_id):
+                return client_id
+    return settings.USAGE_DEFAULT_CLIENT
+
+
+class ClientIdMiddleware:
+    """Pure ASGI middleware, so the client ID is visible to everything the endpoint awaits."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        if is_trusted_peer(scope.get("client")):
+            client_id = client_id_from_headers(scope.get("headers", []))
+        else:
+            client_id = settings.USAGE_DEFAULT_CLIENT
+        token = current_client.set(client_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_client.reset(token)
@@ -0,0 +1,103 @@
+"""
+Response compression middleware with brotli and gzip support.
+"""
+import asyncio
+import gzip
+from config.settings import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Pick the best supported encoding from an Accept-Encoding header, or ''."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the given encoding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Compresses single-message JSON and text responses above a size threshold.
+
+    Streaming responses (sent in several body messages) pass through
+    unchanged so they are never buffered in memory.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        encoding = choose_encoding(headers.get("accept-encoding", ""))
+        if not encoding:
+            return await self.app(scope, receive, send)
+        
+        start_message = None
+        
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                return await send(message)
+            
+            start, start_message = start_message, None
+            response_headers = {k.decode("latin-1").lower() for k, _ in start["headers"]}
+            content_type = next(
+                (v.decode("latin-1") for k, v in start["headers"] if k.lower() == b"content-type"), ""
+            )
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in response_headers
+                or len(body) < settings.COMPRESSION_MIN_BYTES
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                return await send(message)
+            
+            if len(body) >= settings.COMPRESSION_OFFLOAD_BYTES:
+                # Large bodies take milliseconds to compress; keep that off the event loop
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            start["headers"] = [
+                (k, v) for k, v in start["headers"] if k.lower() != b"content-length"
+            ] + [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+        
+        await self.app(scope, receive, send_compressed)
@@ -2,73 +2,186 @@
 FastAPI application for content analysis and extraction.
 """
 import asyncio
+import hmac
+import os
+import tempfile
+import time
 from datetime import datetime
-from typing import List
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from typing import List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Request
+from fastapi.responses import JSONResponse, FileResponse, ORJSONResponse
 
 from config.settings import settings
+from api.profiling import ProfilingMiddleware, is_admin, list_profiles, profile_path
+from api.compression import CompressionMiddleware
+from api.client_id import ClientIdMiddleware
 from database.db_manager import db_manager
+from database.vector_index import vector_index
+from services.admission import admission_controller, QueueFullError, Reservation, INTERACTIVE, BULK
 from services.ai_service import ai_service
+from services.backfill import backfill_runner
+from services.batcher import analysis_batcher
+from services.classifier import local_classifier
+from services.executor import cpu_executor, loop_lag_monitor
+from services.router import ContextLimitError
+from services.usage import BudgetExceededError, token_budget
+from services.document_rephraser import rephrase_document
 from models.schemas import (
     AnalyzeRequest, AnalyzeBatchRequest, AnalyzeResponse,
-    SearchRequest, SearchResponse, BatchAnalyzeResponse
+    SearchRequest, SearchResponse, BatchAnalyzeResponse, RollupResponse,
+    RephraseDocumentRequest, RephraseDocumentResponse, BackfillRequest
 )
 from utils.text_processing import (
-    extract_keywords, extract_json_and_summary, 
-    compute_confidence, clean_text, validate_text_input
+    postprocess_analysis, validate_text_input, plan_packs, local_analysis_response, local_confidence
 )
+from utils.normalization import clean_text, normalize_text, text_normalizer
+from utils.taxonomy import taxonomy_tagger
+from utils.document_extraction import detect_document_kind, extract_document_text
 
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Content Analysis API",
     description="AI-powered content analysis and extraction service",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
+app.add_middleware(ClientIdMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup."""
+    loop_lag_monitor.start()
     await db_manager.init_database()
+    # Carry today's spend over a restart so daily budgets are not reset
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    token_budget.seed_day(await db_manager.get_client_usage_since(today))
+    await backfill_runner.recover()
+    await asyncio.to_thread(local_classifier.refresh)
+    # Loads the cached automaton, or compiles and caches the dictionary on first start,
+    # before traffic arrives; afterwards tagging never waits for a build
+    await asyncio.get_running_loop().run_in_executor(cpu_executor.thread_pool(), taxonomy_tagger.refresh, True)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Pause backfills and release executor workers on shutdown."""
+    for job_id in backfill_runner.get_state()["running"]:
+        await backfill_runner.pause(job_id)
+    await loop_lag_monitor.stop()
+    cpu_executor.shutdown()
 
 
 @app.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_endpoint(request: AnalyzeRequest):
     """Analyze content and return structured metadata."""
-    text = clean_text(request.text)
+    return await analyze_text(request.text, classifier=request.classifier)
+
+
+async def analyze_text(text: str, batched: bool = True, lane: str = INTERACTIVE,
+                       reservation: Optional[Reservation] = None, classifier: bool = False,
+                       normalization: Optional[dict] = None) -> AnalyzeResponse:
+    """Run the analysis pipeline for one text.
+    
+    Set batched=False for callers that already group texts themselves, so
+    their items are not collected a second time by the micro-batcher. The
+    model call waits for an admission slot in the given lane, using one
+    unit of the request's reservation if it reserved room up front.
+    With classifier=True, texts the local classifier is confident about
+    are answered without a model call. Pass the normalization report
+    for text the caller has already normalized.
+    """
+    if normalization is None:
+        text, normalization = await normalize_input(text)
     
     if not validate_text_input(text):
         raise HTTPException(status_code=400, detail="Empty text provided.")
     
+    if classifier:
+        model_result = await classify_locally(text)
+        if model_result is not None:
+            return await save_model_result(text, model_result, normalization)
+    
     try:
-        model_result = await ai_service.analyze_content(text)
+        async with admission_controller.slot(lane, reservation):
+            if batched and settings.MICRO_BATCH_ENABLED:
+                model_result = await analysis_batcher.submit(text)
+            else:
+                model_result = await ai_service.analyze_content(text)
+    except (QueueFullError, BudgetExceededError) as e:
+        raise retry_later_exception(e)
+    except ContextLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+    return await save_model_result(text, model_result, normalization)
+
+
+async def normalize_input(text: str) -> Tuple[str, dict]:
+    """Normalize request text off the loop and add its report to the running totals."""
+    text, report = await cpu_executor.run(normalize_text, text, size=len(text))
+    text_normalizer.record(report)
+    return text, report
+
+
+async def classify_locally(text: str) -> Optional[dict]:
+    """Build a model result from the local classifier, or return None if it is not confident."""
+    labels = await cpu_executor.run(
+        local_classifier.confident_labels, text, size=min(len(text), settings.CLASSIFIER_MAX_CHARS)
+    )
+    if labels is None:
+        return None
+    raw_response = await cpu_executor.run(
+        local_analysis_response, text, labels["sentiment"], labels["topics"], size=len(text)
+    )
+    return {"raw_response": raw_response, "messages": [], "usage": [], "classified": True}
+
+
+def retry_later_exception(error) -> HTTPException:
+    """Build the 429 response for work shed by admission control or token budgets."""
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+async def save_model_result(text: str, model_result: dict,
+                            normalization: Optional[dict] = None) -> AnalyzeResponse:
+    """Parse a model result, persist it and build the API response."""
     raw_response = model_result["raw_response"]
-    summary, parsed = extract_json_and_summary(raw_response)
-    
-    # Extract metadata
-    title = parsed.get("title") if parsed else None
-    topics = parsed.get("topics", []) if parsed else []
-    sentiment = parsed.get("sentiment", "neutral") if parsed else "neutral"
-    keywords = parsed.get("keywords", extract_keywords(text)) if parsed else extract_keywords(text)
-    confidence = compute_confidence(parsed, keywords)
+    # Locally answered rows are picked up by backfills of outdated rows
+    prompt_version = (
+        "classifier" if model_result.get("classified")
+        else "local" if model_result.get("degraded")
+        else settings.ANALYSIS_PROMPT_VERSION
+    )
+    # Parsing, keyword extraction and transcript serialization scale with the
+    # input, so large results run in the executor instead of on the loop
+    metadata = await cpu_executor.run(
+        postprocess_analysis, text, raw_response, model_result["messages"], local_confidence(prompt_version),
+        size=2 * len(text) + len(raw_response),
+    )
     
     # Prepare record for database
     record = {
-        "title": title,
-        "topics": topics,
-        "sentiment": sentiment,
-        "keywords": keywords,
-        "summary": summary,
+        "title": metadata["title"],
+        "topics": metadata["topics"],
+        "sentiment": metadata["sentiment"],
+        "keywords": metadata["keywords"],
+        "tags": metadata["tags"],
+        "summary": metadata["summary"],
         "content": text,
         "raw_response": raw_response,
-        "messages": model_result["messages"],
+        "messages": metadata["messages_json"],
+        "usage": model_result.get("usage", []),
         "created_at": datetime.utcnow().isoformat() + "Z",
-        "confidence": confidence,
+        "confidence": metadata["confidence"],
+        "prompt_version": prompt_version,
     }
     
     # Save to database
@@ -76,26 +189,76 @@ async def analyze_endpoint(request: AnalyzeRequest):
     
     return AnalyzeResponse(
         id=row_id,
-        title=title,
-        topics=topics,
-        sentiment=sentiment,
-        keywords=keywords,
-        summary=summary,
+        title=record["title"],
+        topics=record["topics"],
+        sentiment=record["sentiment"],
+        keywords=record["keywords"],
+        tags=[tag for tag, _ in record["tags"]],
+        summary=record["summary"],
         created_at=record["created_at"],
-        confidence=confidence,
+        confidence=record["confidence"],
+        compression=model_result.get("compression"),
+        classified_locally=bool(model_result.get("classified")),
+        normalization=normalization,
     )
 
 
 @app.post("/analyze_batch", response_model=BatchAnalyzeResponse)
 async def analyze_batch_endpoint(request: AnalyzeBatchRequest):
-    """Analyze multiple texts in batch."""
-    tasks = []
+    """Analyze multiple texts in batch, packing short texts into shared calls."""
+    normalized = await asyncio.gather(*(normalize_input(text) for text in request.texts))
+    texts = [text for text, _ in normalized]
+    reports = [report for _, report in normalized]
+    results = [None] * len(texts)
+    
+    async def run_local(index: int):
+        model_result = await classify_locally(texts[index])
+        if model_result is not None:
+            results[index] = await save_model_result(texts[index], model_result, reports[index])
     
-    for text in request.texts:
-        task = analyze_single_text(text)
-        tasks.append(task)
+    if request.classifier:
+        await asyncio.gather(*(run_local(i) for i, text in enumerate(texts) if validate_text_input(text)))
+    remaining = [i for i, result in enumerate(results) if result is None]
     
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    if settings.PACK_ENABLED:
+        packs, singles = plan_packs([texts[i] for i in remaining])
+        packs = [[remaining[i] for i in pack] for pack in packs]
+        singles = [remaining[i] for i in singles]
+    else:
+        packs, singles = [], remaining
+    
+    # Reserve queue room for every model call up front so a batch is shed whole, not item by item
+    try:
+        reservation = admission_controller.reserve(BULK, len(packs) + len(singles))
+    except QueueFullError as e:
+        raise retry_later_exception(e)
+    
+    async def run_single(index: int):
+        try:
+            results[index] = await analyze_single_text(texts[index], reports[index], reservation)
+        except Exception as e:
+            results[index] = e
+    
+    async def run_pack(indices: List[int]):
+        try:
+            async with admission_controller.slot(BULK, reservation):
+                model_results = await ai_service.analyze_packed([texts[i] for i in indices])
+        except (ValueError, RuntimeError):
+            # Packed call failed or could not be split; analyze items one by one
+            await asyncio.gather(*(run_single(i) for i in indices))
+            return
+        for index, model_result in zip(indices, model_results):
+            try:
+                results[index] = await save_model_result(texts[index], model_result, reports[index])
+            except Exception as e:
+                results[index] = e
+    
+    tasks = [run_pack(indices) for indices in packs]
+    tasks.extend(run_single(index) for index in singles)
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        admission_controller.cancel(reservation)
     
     processed_results = []
     for result in results:
@@ -104,20 +267,126 @@ async def analyze_batch_endpoint(request: AnalyzeBatchRequest):
         else:
             processed_results.append(result.dict())
     
-    return BatchAnalyzeResponse(count=len(processed_results), results=processed_results)
+    # Rows were built from validated models; skip re-validating them
+    return ORJSONResponse({"count": len(processed_results), "results": processed_results})
 
 
-async def analyze_single_text(text: str):
+async def analyze_single_text(text: str, normalization: Optional[dict] = None,
+                              reservation: Optional[Reservation] = None):
     """Helper function to analyze a single text."""
     try:
-        return await analyze_endpoint(AnalyzeRequest(text=text))
+        return await analyze_text(
+            text, batched=False, lane=BULK, reservation=reservation, normalization=normalization
+        )
     except HTTPException as e:
         raise Exception(e.detail)
 
 
+async def save_upload_to_temp(upload: UploadFile) -> str:
+    """Stream an upload to a temporary file in chunks and return its path."""
+    suffix = os.path.splitext(upload.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=settings.UPLOAD_TMP_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(settings.UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.UPLOAD_MAX_BYTES:
+                    raise ValueError(f"File exceeds the {settings.UPLOAD_MAX_BYTES} byte upload limit")
+                await asyncio.to_thread(f.write, chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+async def analyze_upload(upload: UploadFile, reservation: Reservation) -> dict:
+    """Extract text from one uploaded document and run it through analysis."""
+    result = {"filename": upload.filename}
+    kind = detect_document_kind(upload.filename, upload.content_type)
+    if kind is None:
+        result["error"] = "Unsupported file type; upload PDF, DOCX, HTML or plain text."
+        return result
+    result["kind"] = kind
+    
+    try:
+        path = await save_upload_to_temp(upload)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+    
+    try:
+        started = time.perf_counter()
+        text = await cpu_executor.run_process(extract_document_text, path, kind)
+        result["extraction_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as e:
+        result["error"] = f"Text extraction failed: {e}"
+        return result
+    finally:
+        os.remove(path)
+    
+    result["chars"] = len(text)
+    try:
+        started = time.perf_counter()
+        analysis = await analyze_text(text, lane=BULK, reservation=reservation)
+        result["analysis_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    except HTTPException as e:
+        result["error"] = e.detail
+        return result
+    
+    result["analysis"] = analysis.dict()
+    return result
+
+
+@app.post("/analyze_file", response_model=BatchAnalyzeResponse)
+async def analyze_file_endpoint(files: List[UploadFile] = File(...)):
+    """Extract text from uploaded PDF, DOCX, HTML or text files and analyze each one."""
+    try:
+        reservation = admission_controller.reserve(BULK, len(files))
+    except QueueFullError as e:
+        raise retry_later_exception(e)
+    
+    try:
+        results = await asyncio.gather(*(analyze_upload(upload, reservation) for upload in files))
+    finally:
+        admission_controller.cancel(reservation)
+    return ORJSONResponse({"count": len(results), "results": list(results)})
+
+
+@app.post("/rephrase_document", response_model=RephraseDocumentResponse)
+async def rephrase_document_endpoint(request: RephraseDocumentRequest):
+    """Rephrase a whole document paragraph by paragraph, reusing cached paragraphs."""
+    if not validate_text_input(request.text):
+        raise HTTPException(status_code=400, detail="Empty text provided.")
+    
+    try:
+        async with admission_controller.slot(INTERACTIVE):
+            result = await rephrase_document(request.text)
+    except QueueFullError as e:
+        raise retry_later_exception(e)
+    return RephraseDocumentResponse(**result)
+
+
+ROLLUP_PERIOD_PATTERN = "^(day|week|month)$"
+ROLLUP_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+
 @app.get("/search", response_model=SearchResponse)
-async def search_endpoint(topic: str = Query(...)):
-    """Search analyses by topic or keyword."""
+async def search_endpoint(
+    topic: str = Query(...),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    include_messages: bool = Query(True),
+    start: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    end: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+):
+    """Search analyses by topic or keyword, optionally one page at a time.
+    
+    A start/end date range limits the search to the matching month shards.
+    """
     topic = clean_text(topic)
     
     if not validate_text_input(topic):
@@ -126,8 +395,142 @@ async def search_endpoint(topic: str = Query(...)):
             detail="Provide a non-empty topic query parameter"
         )
     
-    results = await db_manager.search_analyses_by_term(topic)
-    return SearchResponse(count=len(results), results=results)
+    results = await db_manager.search_analyses_by_term(topic, limit, offset, start, end)
+    if not include_messages:
+        for row in results:
+            row.pop("messages", None)
+    # Rows come straight from the database; skip response-model validation
+    return ORJSONResponse({"count": len(results), "results": results})
+
+
+@app.get("/search/similar", response_model=SearchResponse)
+async def search_similar_endpoint(
+    q: str = Query(...),
+    k: int = Query(settings.SIMILAR_DEFAULT_K, ge=1, le=settings.SIMILAR_MAX_K),
+):
+    """Find stored analyses most similar to the query text by embedding cosine similarity."""
+    q = clean_text(q)
+    
+    if not validate_text_input(q):
+        raise HTTPException(status_code=400, detail="Provide a non-empty q query parameter")
+    if not settings.VECTOR_INDEX_ENABLED:
+        raise HTTPException(status_code=404, detail="Vector index is disabled")
+    
+    matches = await vector_index.search_async(q, k)
+    scores = dict(matches)
+    results = await db_manager.get_analyses_by_ids([analysis_id for analysis_id, _ in matches])
+    # Indexes built before versions were dropped on save may still hold superseded rows
+    results = [row for row in results if row.get("superseded_by") is None]
+    for row in results:
+        row["score"] = round(scores[row["id"]], 4)
+    
+    # Rows come straight from the database; skip response-model validation
+    return ORJSONResponse({"count": len(results), "results": results})
+
+
+@app.get("/search/tag", response_model=SearchResponse)
+async def search_tag_endpoint(
+    tag: str = Query(...),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    include_messages: bool = Query(True),
+    start: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    end: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+):
+    """Find analyses carrying an exact taxonomy tag, with how often its terms occurred."""
+    tag = tag.strip()
+    
+    if not tag:
+        raise HTTPException(status_code=400, detail="Provide a non-empty tag query parameter")
+    
+    results = await db_manager.search_analyses_by_tag(tag, limit, offset, start, end)
+    if not include_messages:
+        for row in results:
+            row.pop("messages", None)
+    # Rows come straight from the database; skip response-model validation
+    return ORJSONResponse({"count": len(results), "results": results})
+
+
+@app.get("/stats/sentiment", response_model=RollupResponse)
+async def sentiment_stats(
+    period: str = Query("day", pattern=ROLLUP_PERIOD_PATTERN),
+    start: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    end: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+):
+    """Sentiment distribution per day, week or month."""
+    results = await db_manager.get_sentiment_rollup(period, start, end)
+    return RollupResponse(period=period, count=len(results), results=results)
+
+
+@app.get("/stats/topics", response_model=RollupResponse)
+async def topic_stats(
+    period: str = Query("day", pattern=ROLLUP_PERIOD_PATTERN),
+    start: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    end: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    limit: int = Query(settings.ROLLUP_DEFAULT_TOPIC_LIMIT, ge=1, le=100),
+):
+    """Top topics per day, week or month."""
+    results = await db_manager.get_topic_rollup(period, start, end, limit)
+    return RollupResponse(period=period, count=len(results), results=results)
+
+
+@app.get("/stats/confidence", response_model=RollupResponse)
+async def confidence_stats(
+    period: str = Query("day", pattern=ROLLUP_PERIOD_PATTERN),
+    start: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    end: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+):
+    """Confidence histogram per day, week or month."""
+    results = await db_manager.get_confidence_rollup(period, start, end)
+    return RollupResponse(period=period, count=len(results), results=results)
+
+
+def require_admin_token(request: Request, token: Optional[str], header: str, name: str) -> None:
+    """Reject requests that don't carry the given admin token; endpoints are closed while it is unset."""
+    supplied = request.headers.get(header, "")
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail=f"{name} admin token required")
+
+
+def require_usage_admin(request: Request) -> None:
+    """Reject requests without the usage admin token."""
+    require_admin_token(request, settings.USAGE_ADMIN_TOKEN, settings.USAGE_ADMIN_HEADER, "Usage")
+
+
+@app.get("/usage", response_model=RollupResponse)
+async def usage_stats(
+    request: Request,
+    period: str = Query("day", pattern=ROLLUP_PERIOD_PATTERN),
+    start: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    end: Optional[str] = Query(None, pattern=ROLLUP_DATE_PATTERN),
+    client_id: Optional[str] = Query(None),
+):
+    """Prompt and completion tokens per day, week or month, by client and model (admin only)."""
+    require_usage_admin(request)
+    results = await db_manager.get_usage_summary(period, start, end, client_id)
+    return RollupResponse(period=period, count=len(results), results=results)
+
+
+@app.get("/usage/budget")
+async def usage_budget(request: Request):
+    """Return current token usage against the per-minute and per-day budgets (admin only)."""
+    require_usage_admin(request)
+    return token_budget.get_state()
+
+
+@app.get("/analysis/{analysis_id}/usage")
+async def get_analysis_usage(analysis_id: int, request: Request):
+    """Get the token usage recorded for one analysis (admin only)."""
+    require_usage_admin(request)
+    usage = await db_manager.get_usage_for_analysis(analysis_id)
+    return {"analysis_id": analysis_id, "count": len(usage), "usage": usage}
+
+
+@app.get("/analysis/{analysis_id}/tags")
+async def get_analysis_tags(analysis_id: int):
+    """Get the taxonomy tags stored for one analysis."""
+    tags = await db_manager.get_analysis_tags(analysis_id)
+    return {"analysis_id": analysis_id, "count": len(tags), "tags": tags}
 
 
 @app.get("/analysis/{analysis_id}")
@@ -138,13 +541,141 @@ async def get_analysis_by_id(analysis_id: int):
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    return analysis
+    return ORJSONResponse(analysis)
+
+
+@app.get("/classifier")
+async def classifier_endpoint():
+    """Return the local classifier's metadata, evaluation report and usage counters."""
+    return await asyncio.to_thread(local_classifier.get_state)
+
+
+@app.get("/taxonomy")
+async def taxonomy_endpoint():
+    """Return the loaded taxonomy dictionary's size, build time and tagging counters."""
+    return await asyncio.to_thread(taxonomy_tagger.get_state)
+
+
+@app.get("/routing")
+async def routing_stats():
+    """Return model routing counters and recent routing decisions."""
+    return ai_service.router.get_state()
+
+
+@app.get("/profiles")
+async def list_profiles_endpoint(request: Request):
+    """List recent request profiles (admin only)."""
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Profiling admin token required")
+    profiles = await asyncio.to_thread(list_profiles)
+    return {"count": len(profiles), "profiles": profiles}
+
+
+@app.get("/profiles/{name}")
+async def download_profile_endpoint(name: str, request: Request):
+    """Download one request profile in collapsed-stack format (admin only)."""
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Profiling admin token required")
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+
+def require_backfill_admin(request: Request) -> None:
+    """Reject requests without the backfill admin token."""
+    require_admin_token(request, settings.BACKFILL_ADMIN_TOKEN, settings.BACKFILL_ADMIN_HEADER, "Backfill")
+
+
+async def backfill_job_or_404(job_id: str) -> dict:
+    """Return a backfill job with its running flags, or raise 404."""
+    job = await db_manager.get_backfill_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    job["running"] = backfill_runner.is_running(job_id)
+    job["running_elsewhere"] = backfill_runner.is_running_elsewhere(job_id)
+    return job
+
+
+async def local_backfill_job(job_id: str) -> dict:
+    """Return a job that this process may pause or resume, or raise 404 or 409."""
+    job = await backfill_job_or_404(job_id)
+    if job["running_elsewhere"]:
+        raise HTTPException(status_code=409, detail="Backfill job is running in another process")
+    return job
+
+
+@app.post("/backfill")
+async def create_backfill_endpoint(body: BackfillRequest, request: Request):
+    """Create a backfill job over the matching rows and start it (admin only)."""
+    require_backfill_admin(request)
+    predicate = {
+        "not_prompt_version": settings.ANALYSIS_PROMPT_VERSION if body.outdated else None,
+        "start": body.start,
+        "end": body.end,
+        "max_confidence": body.max_confidence,
+    }
+    try:
+        job = await backfill_runner.create_job(
+            body.stage, body.write, {key: value for key, value in predicate.items() if value is not None}, body.rate
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    backfill_runner.start(job["id"])
+    return await backfill_job_or_404(job["id"])
+
+
+@app.get("/backfill")
+async def list_backfill_endpoint(request: Request):
+    """List backfill jobs and their checkpoints (admin only)."""
+    require_backfill_admin(request)
+    jobs = await db_manager.list_backfill_jobs()
+    for job in jobs:
+        job["running"] = backfill_runner.is_running(job["id"])
+        job["running_elsewhere"] = backfill_runner.is_running_elsewhere(job["id"])
+    return {"count": len(jobs), "jobs": jobs}
+
+
+@app.get("/backfill/{job_id}")
+async def get_backfill_endpoint(job_id: str, request: Request):
+    """Return one backfill job's progress (admin only)."""
+    require_backfill_admin(request)
+    return await backfill_job_or_404(job_id)
+
+
+@app.post("/backfill/{job_id}/pause")
+async def pause_backfill_endpoint(job_id: str, request: Request):
+    """Pause a running backfill job once its in-flight rows finish (admin only)."""
+    require_backfill_admin(request)
+    await local_backfill_job(job_id)
+    await backfill_runner.pause(job_id)
+    return await backfill_job_or_404(job_id)
+
+
+@app.post("/backfill/{job_id}/resume")
+async def resume_backfill_endpoint(job_id: str, request: Request):
+    """Resume a paused backfill job from its checkpoint (admin only)."""
+    require_backfill_admin(request)
+    await local_backfill_job(job_id)
+    backfill_runner.start(job_id)
+    return await backfill_job_or_404(job_id)
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "service": "content-analysis-api"}
+    return {
+        "status": "healthy",
+        "service": "content-analysis-api",
+        "micro_batcher": analysis_batcher.get_state(),
+        "llm_backend": ai_service.resilience.get_state(),
+        "precompression": {"enabled": settings.PRECOMPRESS_ENABLED, **ai_service.precompression_stats},
+        "admission": admission_controller.get_state(),
+        "normalization": text_normalizer.get_state(),
+        "executor": cpu_executor.get_state(),
+        "event_loop_lag": loop_lag_monitor.get_state(),
+        "backfill": backfill_runner.get_state(),
+    }
 
 
 async def test_api():
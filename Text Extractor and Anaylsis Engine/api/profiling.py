@@ -0,0 +1,195 @@
+"""
+Opt-in wall-clock request profiling for the FastAPI app.
+
+A sampler thread periodically records the request task's logical async
+stack (including the coroutine it is awaiting, so time spent in awaits
+shows up) together with the stacks of busy worker threads such as the
+aiosqlite connection threads. Samples are written in the collapsed-stack
+format understood by flamegraph.pl and speedscope.
+"""
+import asyncio
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from config.settings import settings
+
+
+# Innermost frames in these files or worker loops mean a thread is idle
+IDLE_THREAD_FILES = ("threading.py", "queue.py", "selectors.py")
+IDLE_THREAD_FUNCTIONS = ("_worker", "_connection_worker_thread")
+
+
+def _frame_label(frame) -> str:
+    """Format a frame as 'function (file:line)' for a collapsed stack."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> List:
+    """Return a thread's frames, outermost first."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _async_stack(task: asyncio.Task, loop_frame) -> List[str]:
+    """Return the task's logical stack, outermost first.
+
+    Follows the chain of awaited coroutines; if the task is currently
+    running on the loop thread, synchronous frames below its innermost
+    coroutine are appended from the thread's real stack.
+    """
+    labels = []
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            labels.append(f"<await {type(awaitable).__name__}>")
+            break
+        frames.append(frame)
+        labels.append(_frame_label(frame))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    
+    if frames and loop_frame is not None:
+        thread_frames = _thread_stack(loop_frame)
+        innermost = frames[-1]
+        for position, frame in enumerate(thread_frames):
+            if frame is innermost:
+                labels.extend(_frame_label(f) for f in thread_frames[position + 1:])
+                break
+    return labels
+
+
+class RequestProfiler:
+    """Samples one request's async stack and busy worker threads until stopped."""
+    
+    def __init__(self, task: asyncio.Task, interval: float):
+        self.task = task
+        self.interval = interval
+        self.loop_thread_id = threading.get_ident()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+    
+    def start(self) -> None:
+        """Start sampling in the background."""
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            try:
+                frames = sys._current_frames()
+                stack = _async_stack(self.task, frames.get(self.loop_thread_id))
+                if stack:
+                    self.samples[";".join(["event-loop"] + stack)] += 1
+                
+                for thread_id, frame in frames.items():
+                    if thread_id in (own_id, self.loop_thread_id):
+                        continue
+                    if (os.path.basename(frame.f_code.co_filename) in IDLE_THREAD_FILES
+                            or frame.f_code.co_name in IDLE_THREAD_FUNCTIONS):
+                        continue
+                    if thread_id not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    root = f"thread:{names.get(thread_id, thread_id)}"
+                    labels = [_frame_label(f) for f in _thread_stack(frame)]
+                    self.samples[";".join([root] + labels)] += 1
+            except Exception:
+                # Frames can change underneath us; drop the sample
+                continue
+    
+    def collapsed(self) -> str:
+        """Return samples in collapsed-stack format, one stack per line."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def is_admin(headers: Dict[str, str]) -> bool:
+    """Return True if the request carries the profiling admin token."""
+    token = settings.PROFILING_ADMIN_TOKEN
+    supplied = headers.get(settings.PROFILING_HEADER.lower()) or ""
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def should_profile(headers: Dict[str, str]) -> bool:
+    """Decide whether to profile a request from its headers and the sampling rate."""
+    if not settings.PROFILING_ENABLED:
+        return False
+    return is_admin(headers) or random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def write_profile(profiler: RequestProfiler, method: str, path: str, elapsed: float) -> str:
+    """Write a profile to PROFILING_DIR, prune old ones and return the file name."""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}_{int(time.time() * 1000) % 1000:03d}_{method}_{slug}_{int(elapsed * 1000)}ms.folded"
+    with open(os.path.join(settings.PROFILING_DIR, name), "w") as f:
+        f.write(profiler.collapsed())
+    
+    profiles = list_profiles()
+    for stale in profiles[settings.PROFILING_MAX_FILES:]:
+        os.remove(os.path.join(settings.PROFILING_DIR, stale["name"]))
+    return name
+
+
+def list_profiles() -> List[Dict]:
+    """List stored profiles, newest first."""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(settings.PROFILING_DIR):
+        if not name.endswith(".folded"):
+            continue
+        stat = os.stat(os.path.join(settings.PROFILING_DIR, name))
+        profiles.append({"name": name, "bytes": stat.st_size, "modified": stat.st_mtime})
+    profiles.sort(key=lambda p: p["modified"], reverse=True)
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Return the path of a stored profile, or None if the name is not a stored profile."""
+    if os.path.basename(name) != name or not name.endswith(".folded"):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware, so the endpoint runs inside the task being sampled."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        if not should_profile(headers):
+            return await self.app(scope, receive, send)
+        
+        profiler = RequestProfiler(asyncio.current_task(), settings.PROFILING_INTERVAL_MS / 1000.0)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - started
+            profiler.stop()
+            await asyncio.to_thread(write_profile, profiler, scope["method"], scope["path"], elapsed)
@@ -0,0 +1,3 @@
+"""
+Package initialization files to make directories importable.
+"""
@@ -0,0 +1,305 @@
+"""
+Micro-benchmarks for text processing and database hot paths.
+
+Run with `python main.py bench`. Results are compared against a JSON
+baseline and the run fails when any benchmark's median time regresses by
+more than the configured threshold, or has no baseline to compare with.
+Timings are machine-specific, so each machine saves its own baseline with
+--save-baseline before the gate can pass.
+"""
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from config.settings import settings
+
+
+VOCABULARY_SIZE = 5000
+SENTIMENTS = ["positive", "neutral", "negative"]
+
+
+def make_vocabulary(seed: int = 7) -> List[str]:
+    """Build a deterministic vocabulary of pseudo-words."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(VOCABULARY_SIZE)]
+
+
+def make_text(rng: random.Random, vocabulary: List[str], words: int) -> str:
+    """Build a synthetic document of roughly the given number of words."""
+    # Skewed choice so some words repeat, as in real text
+    chosen = [vocabulary[min(int(rng.paretovariate(1.2)) - 1, VOCABULARY_SIZE - 1)] for _ in range(words)]
+    sentences = [" ".join(chosen[i:i + 15]).capitalize() + "." for i in range(0, len(chosen), 15)]
+    return " ".join(sentences)
+
+
+def make_model_response(rng: random.Random, vocabulary: List[str], summary_words: int = 40) -> str:
+    """Build a synthetic model response in the analysis prompt's format."""
+    metadata = {
+        "title": make_text(rng, vocabulary, 6),
+        "topics": rng.sample(vocabulary, 3),
+        "sentiment": rng.choice(SENTIMENTS),
+        "keywords": rng.sample(vocabulary, 3),
+    }
+    return f"Summary: {make_text(rng, vocabulary, summary_words)}\n\n{json.dumps(metadata, indent=2)}"
+
+
+def make_record(rng: random.Random, vocabulary: List[str], content_words: int = 120) -> Dict:
+    """Build a synthetic analysis record like the API stores."""
+    content = make_text(rng, vocabulary, content_words)
+    raw_response = make_model_response(rng, vocabulary)
+    return {
+        "title": make_text(rng, vocabulary, 6),
+        "topics": rng.sample(vocabulary, 3),
+        "sentiment": rng.choice(SENTIMENTS),
+        "keywords": rng.sample(vocabulary, 3),
+        "summary": make_text(rng, vocabulary, 30),
+        "content": content,
+        "raw_response": raw_response,
+        "messages": [
+            {"role": "system", "content": "You are a precise AI content analyst."},
+            {"role": "user", "content": content},
+            {"role": "assistant", "content": raw_response},
+        ],
+        "created_at": "2024-01-%02dT12:00:00Z" % rng.randint(1, 28),
+        "confidence": rng.choice([0.3, 0.7, 0.9, 1.0]),
+    }
+
+
+def build_database(path: str, rows: int, seed: int = 11) -> None:
+    """Create a synthetic analyses database with the given number of rows."""
+    from database.db_manager import DatabaseManager
+    
+    vector_enabled = settings.VECTOR_INDEX_ENABLED
+    settings.VECTOR_INDEX_ENABLED = False
+    try:
+        asyncio.run(DatabaseManager(path).init_database())
+    finally:
+        settings.VECTOR_INDEX_ENABLED = vector_enabled
+    
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary()
+    conn = sqlite3.connect(path)
+    try:
+        for start in range(0, rows, 10000):
+            batch = []
+            for _ in range(min(10000, rows - start)):
+                r = make_record(rng, vocabulary)
+                batch.append((
+                    r["title"], json.dumps(r["topics"]), r["sentiment"], json.dumps(r["keywords"]),
+                    r["summary"], r["content"], r["raw_response"], json.dumps(r["messages"]),
+                    r["created_at"], r["confidence"],
+                ))
+            conn.executemany(
+                """
+                INSERT INTO analyses
+                (title, topics, sentiment, keywords, summary, content, raw_response, messages, created_at, confidence)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                batch,
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def get_database(work_dir: str, rows: int) -> str:
+    """Return a cached synthetic database of the given size, building it if needed."""
+    path = os.path.join(work_dir, f"bench_{rows}.db")
+    if not os.path.exists(path):
+        print(f"  building {rows:,}-row database (cached at {path})...")
+        build_database(path + ".tmp", rows)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict:
+    """Time fn over several runs and measure its peak traced memory on one extra run.
+    
+    tracemalloc only sees Python allocations, so memory SQLite allocates
+    in C (page cache, sorter) is not part of the peak.
+    """
+    for _ in range(warmup):
+        fn()
+    
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "peak_kb": round(peak / 1024, 1),
+        "repeat": repeat,
+    }
+
+
+def text_benchmarks() -> Dict[str, Callable[[], object]]:
+    """Benchmarks for utils.text_processing."""
+    from utils.text_processing import extract_keywords, extract_json_and_summary, compute_confidence
+    
+    rng = random.Random(3)
+    vocabulary = make_vocabulary()
+    short_text = make_text(rng, vocabulary, 200)
+    long_text = make_text(rng, vocabulary, 100000)
+    response = make_model_response(rng, vocabulary)
+    long_response = make_model_response(rng, vocabulary, summary_words=20000)
+    parsed = {"title": "t", "topics": ["a"], "sentiment": "neutral", "keywords": ["k"]}
+    
+    return {
+        "extract_keywords[200w]": lambda: extract_keywords(short_text),
+        "extract_keywords[100kw]": lambda: extract_keywords(long_text),
+        "extract_json_and_summary[typical]": lambda: extract_json_and_summary(response),
+        "extract_json_and_summary[20kw]": lambda: extract_json_and_summary(long_response),
+        "compute_confidence[x1000]": lambda: [compute_confidence(parsed, ["k"]) for _ in range(1000)],
+    }
+
+
+def serialization_benchmarks() -> Dict[str, Callable[[], object]]:
+    """Benchmarks for the API's validated stdlib JSON path versus the direct orjson path."""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from models.schemas import SearchResponse
+    
+    rng = random.Random(9)
+    vocabulary = make_vocabulary()
+    rows = [{"id": i, **make_record(rng, vocabulary)} for i in range(1000)]
+    
+    def validated_json():
+        model = SearchResponse(count=len(rows), results=rows)
+        return JSONResponse(jsonable_encoder(model)).body
+    
+    def direct_orjson():
+        return ORJSONResponse({"count": len(rows), "results": rows}).body
+    
+    return {
+        "serialize.search[validated+json x1000]": validated_json,
+        "serialize.search[orjson x1000]": direct_orjson,
+    }
+
+
+def db_benchmarks(db_path: str, rows: int) -> Dict[str, Callable[[], object]]:
+    """Benchmarks for DatabaseManager read, write and search paths on one database size."""
+    from database.db_manager import DatabaseManager
+    
+    # Saves always land in the current month's shard rather than the prebuilt legacy table,
+    # so give them a throwaway shard directory that is emptied on every run: timed writes
+    # then start from the same shard size each run, and reads still hit the legacy rows
+    shard_dir = os.path.splitext(db_path)[0] + "_bench_shards"
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    manager = DatabaseManager(db_path, shard_dir=shard_dir)
+    rng = random.Random(5)
+    vocabulary = make_vocabulary()
+    # Only the current and previous months' shards accept writes, so stamp records with the current time
+    now = datetime.utcnow().isoformat() + "Z"
+    records = [{**make_record(rng, vocabulary), "created_at": now} for _ in range(20)]
+    ids = [rng.randint(1, rows) for _ in range(100)]
+    loop = asyncio.new_event_loop()
+    
+    async def write_batch():
+        for record in records:
+            await manager.save_analysis(record)
+    
+    async def read_batch():
+        for analysis_id in ids:
+            await manager.get_analysis_by_id(analysis_id)
+    
+    def run(coro_fn):
+        vector_enabled = settings.VECTOR_INDEX_ENABLED
+        settings.VECTOR_INDEX_ENABLED = False
+        try:
+            return loop.run_until_complete(coro_fn())
+        finally:
+            settings.VECTOR_INDEX_ENABLED = vector_enabled
+    
+    # Cached databases may predate newer tables; init_database adds them
+    run(manager.init_database)
+    
+    return {
+        f"db.save_analysis[x20 @{rows}]": lambda: run(write_batch),
+        f"db.get_analysis_by_id[x100 @{rows}]": lambda: run(read_batch),
+        f"db.search_analyses_by_term[hit @{rows}]": lambda: run(
+            lambda: manager.search_analyses_by_term(vocabulary[42], limit=50)
+        ),
+        # A term that never matches forces a full table scan
+        f"db.search_analyses_by_term[miss @{rows}]": lambda: run(
+            lambda: manager.search_analyses_by_term("qqqqqqqqqqqq")
+        ),
+    }
+
+
+def load_baseline(path: str) -> Dict:
+    """Load baseline results, or an empty dict if none were saved yet."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_benchmarks(sizes: List[int], baseline_path: str = None, threshold: float = None,
+                   save_baseline: bool = False, work_dir: str = None) -> bool:
+    """Run the suite, compare it against the baseline and return True if nothing regressed."""
+    baseline_path = baseline_path or settings.BENCH_BASELINE_PATH
+    threshold = settings.BENCH_REGRESSION_THRESHOLD if threshold is None else threshold
+    work_dir = work_dir or settings.BENCH_WORK_DIR
+    os.makedirs(work_dir, exist_ok=True)
+    
+    benchmarks = {**text_benchmarks(), **serialization_benchmarks()}
+    suites = [(name, fn, settings.BENCH_REPEAT) for name, fn in benchmarks.items()]
+    for rows in sizes:
+        db_path = get_database(work_dir, rows)
+        for name, fn in db_benchmarks(db_path, rows).items():
+            # Full-scan searches on large tables are slow; fewer repeats keep runs reasonable
+            repeat = settings.BENCH_REPEAT if rows <= 100000 or "search" not in name else 3
+            suites.append((name, fn, repeat))
+    
+    baseline = load_baseline(baseline_path)
+    results: Dict[str, Dict] = {}
+    regressions: List[str] = []
+    missing: List[str] = []
+    
+    print(f"{'benchmark':<44} {'median':>10} {'peak KB':>10} {'vs base':>9}")
+    for name, fn, repeat in suites:
+        result = measure(fn, repeat)
+        results[name] = result
+        change: Optional[float] = None
+        if name in baseline:
+            change = result["median_s"] / baseline[name]["median_s"] - 1
+            if change > threshold:
+                regressions.append(name)
+        else:
+            missing.append(name)
+        change_text = f"{change:+.1%}" if change is not None else "new"
+        print(f"{name:<44} {result['median_s'] * 1000:>8.2f}ms {result['peak_kb']:>10.1f} {change_text:>9}")
+    print("(peak KB is Python heap from tracemalloc; SQLite's C allocations are not included)")
+    
+    if save_baseline:
+        merged = {**baseline, **results}
+        with open(baseline_path, "w") as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {baseline_path}")
+    
+    if regressions:
+        print(f"\nRegressed by more than {threshold:.0%}: {', '.join(regressions)}")
+        return False
+    if missing and not save_baseline:
+        print(f"\nNo baseline in {baseline_path} for: {', '.join(missing)}")
+        print("Run with --save-baseline on this machine to record one")
+        return False
+    return True
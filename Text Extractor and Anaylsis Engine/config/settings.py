@@ -15,15 +15,240 @@ class Settings:
     # Database Configuration
     DB_PATH: str = "extractor.db"
     
+    # Analysis Sharding Configuration
+    DB_SHARD_DIR: Optional[str] = None  # defaults to <DB_PATH without .db>_shards
+    # Global IDs are <yyyymm> * multiplier + n; smaller IDs are pre-sharding rows
+    DB_SHARD_ID_MULTIPLIER: int = 10 ** 9
+    DB_SHARD_WRITABLE_MONTHS: int = 2  # current and previous month; older shards open read-only
+    DB_SHARD_FANOUT_CONCURRENCY: int = 8
+    
+    # Vector Index Configuration
+    VECTOR_INDEX_ENABLED: bool = True
+    VECTOR_INDEX_PATH: Optional[str] = None  # defaults to <DB_PATH without .db>.vectors
+    # 64 dims keeps a 1M-row scan at ~256 MB, i.e. well under 50 ms per query
+    VECTOR_DIM: int = 64
+    VECTOR_HASH_BUCKETS: int = 2 ** 18
+    VECTOR_SEED: int = 1337
+    VECTOR_GROWTH_ROWS: int = 4096
+    SIMILAR_DEFAULT_K: int = 10
+    SIMILAR_MAX_K: int = 100
+    
+    # Document Rephrasing Configuration
+    REPHRASE_CONCURRENCY: int = 4
+    REPHRASE_PROMPT_VERSION: str = "athena-v1"  # bump to invalidate cached paragraphs
+    
+    # Document Upload Configuration
+    UPLOAD_TMP_DIR: Optional[str] = None  # defaults to the system temp directory
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024
+    
+    # Executor Configuration (sizes in characters of text handled)
+    EXECUTOR_INLINE_MAX_CHARS: int = 4000
+    # Big regex and json.dumps calls hold the GIL, so only a process keeps them off the loop
+    EXECUTOR_PROCESS_THRESHOLD_CHARS: int = 1000000
+    EXECUTOR_THREAD_WORKERS: int = 4
+    EXECUTOR_PROCESS_WORKERS: int = 2  # also extracts uploaded documents
+    LOOP_LAG_INTERVAL_MS: float = 100.0
+    LOOP_LAG_STALL_MS: float = 50.0
+    LOOP_LAG_WINDOW: int = 600
+    
+    # Analytics Rollup Configuration
+    ROLLUP_CONFIDENCE_BUCKETS: int = 10
+    ROLLUP_DEFAULT_TOPIC_LIMIT: int = 10
+    
     # API Configuration
     API_HOST: str = "127.0.0.1"
     API_PORT: int = 8000
     API_BASE_URL: str = f"http://{API_HOST}:{API_PORT}"
     
+    # Frontend Configuration
+    FRONTEND_HTTP_TIMEOUT: float = 30.0
+    FRONTEND_HTTP_MAX_CONNECTIONS: int = 20
+    # Batch mode sends this many texts per request, so short ones can still be packed together
+    FRONTEND_BATCH_CHUNK_SIZE: int = 8
+    FRONTEND_BATCH_CONCURRENCY: int = 4  # chunk requests in flight at once
+    FRONTEND_SEARCH_PAGE_SIZE: int = 10
+    
     # Analysis Configuration
     MAX_TOKENS: int = 700
     TEMPERATURE: float = 0.3
     MAX_KEYWORDS: int = 3
+    ANALYSIS_PROMPT_VERSION: str = "analyze-v1"  # bump when the analysis prompt or model changes
+    # Fixed confidence of rows answered by the local analyzer (open circuit, budget downgrade),
+    # kept below LLM rows so rollups can tell them apart and --max-confidence backfills select them
+    LOCAL_ANALYSIS_CONFIDENCE: float = 0.2
+    
+    # Local Classifier Configuration
+    CLASSIFIER_PATH: Optional[str] = None  # defaults to <DB_PATH without .db>.classifier.npz
+    CLASSIFIER_HASH_BUCKETS: int = 2 ** 16
+    CLASSIFIER_MAX_CHARS: int = 20000  # only the start of long texts is featurized
+    CLASSIFIER_MAX_TOPICS: int = 50
+    CLASSIFIER_MIN_TOPIC_SUPPORT: int = 20
+    CLASSIFIER_MAX_TRAIN_ROWS: int = 200000
+    CLASSIFIER_HOLDOUT: float = 0.2
+    CLASSIFIER_EPOCHS: int = 5
+    CLASSIFIER_BATCH_SIZE: int = 256
+    CLASSIFIER_LEARNING_RATE: float = 0.5
+    CLASSIFIER_L2: float = 1e-6
+    # Texts are answered locally only if the sentiment and at least one topic clear this probability
+    CLASSIFIER_THRESHOLD: float = 0.8
+    CLASSIFIER_MAX_PREDICTED_TOPICS: int = 3
+    CLASSIFIER_RELOAD_SECONDS: float = 30.0
+    # Fixed confidence of classifier-answered rows, whose summary is just the first sentence
+    CLASSIFIER_CONFIDENCE: float = 0.4
+    
+    # Taxonomy Tagging Configuration
+    TAXONOMY_PATH: Optional[str] = None  # defaults to <DB_PATH without .db>.taxonomy.tsv
+    TAXONOMY_CACHE_PATH: Optional[str] = None  # defaults to <TAXONOMY_PATH>.automaton.npz
+    TAXONOMY_MAX_TAGS: int = 50  # per analysis, most frequent first
+    TAXONOMY_RELOAD_SECONDS: float = 30.0
+    
+    # Input Normalization Configuration
+    # Steps run in this order; remove a step's name to disable it
+    NORMALIZE_STEPS: list = ["html", "nfkc", "urls", "boilerplate", "dedupe_lines", "whitespace"]
+    NORMALIZE_URL_MODE: str = "domain"  # "domain" keeps the host, "clean" drops tracking parameters, "remove" drops the URL
+    NORMALIZE_TRACKING_PARAMS: list = ["utm_", "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid", "_hs"]
+    # Patterns searched in short lines after casefolding; lines that match are dropped.
+    # Each is compiled separately, so start patterns with ^ or a literal to keep them fast.
+    # Anchor both ends where possible: headlines such as "Share prices fell" must survive
+    NORMALIZE_BOILERPLATE_PATTERNS: list = [
+        r"^(?:skip to (?:main )?content|toggle navigation|(?:main )?menu|search|home|sign in|log ?in|sign up|register)$",
+        r"^(?:subscribe(?: now| to [\w ]{1,40})?|share(?: this(?: article| story| post| page)?)?(?: on [\w ]{1,20})?"
+        r"|follow us(?: on [\w ]{1,30})?|advertisement|sponsored|read more|continue reading|back to top)\W*$",
+        r"^(?:related (?:articles|posts|stories)|you may also like|recommended for you)\W*$",
+        r"\b(?:we|this (?:web)?site) uses? cookies\b|^accept (?:all )?cookies\W*$",
+        r"^(?:©|\(c\)|copyright)\s*(?:©\s*)?(?:\d{4}|all rights)",
+        r"all rights reserved",
+        r"^(?:privacy policy|terms of (?:use|service)|cookie policy|contact us|about us)\W*$",
+    ]
+    NORMALIZE_BOILERPLATE_MAX_CHARS: int = 120  # longer lines are never treated as boilerplate
+    # Plain-text inputs with fewer non-blank lines (headlines, tweets) are never stripped of boilerplate
+    NORMALIZE_BOILERPLATE_MIN_LINES: int = 3
+    NORMALIZE_DEDUPE_MIN_CHARS: int = 16  # shorter repeated lines are kept
+    
+    # Input Pre-compression Configuration
+    PRECOMPRESS_ENABLED: bool = False
+    PRECOMPRESS_TRIGGER_TOKENS: int = 1500  # shorter inputs are sent unchanged
+    PRECOMPRESS_RATIO: float = 0.35  # share of the input's tokens to keep
+    PRECOMPRESS_MIN_TOKENS: int = 600
+    PRECOMPRESS_MAX_TOKENS: Optional[int] = 6000
+    
+    # Model Routing Configuration
+    # Tiers are tried in order; the first whose max_input_tokens fits the call wins
+    MODEL_TIERS: list = [
+        {
+            "name": MODEL_NAME,
+            "max_input_tokens": 16000,
+            "max_output_tokens": 4096,
+            "context_limit": 128000,
+            "tasks": ["analyze", "packed", "rephrase"],
+        },
+        {
+            "name": "gpt-4o",
+            "max_input_tokens": 120000,
+            "max_output_tokens": 4096,
+            "context_limit": 128000,
+            "tasks": ["analyze", "packed", "rephrase"],
+        },
+    ]
+    # Analyses keep the full MAX_TOKENS cap they had before routing; a lower cap can cut off the JSON block
+    ROUTER_ANALYZE_OUTPUT_TOKENS: int = MAX_TOKENS
+    ROUTER_REPHRASE_OUTPUT_RATIO: float = 1.3
+    ROUTER_MIN_OUTPUT_TOKENS: int = 64
+    ROUTER_OVERFLOW: str = "reject"  # "reject" or "truncate"
+    ROUTER_DECISION_LOG_SIZE: int = 500
+    
+    # Batch Packing Configuration
+    PACK_ENABLED: bool = True
+    PACK_TOKEN_BUDGET: int = 1200
+    PACK_MAX_ITEM_TOKENS: int = 50
+    PACK_MAX_ITEMS: int = 20
+    PACK_OUTPUT_TOKENS_PER_ITEM: int = 120
+    
+    # Micro-batching Configuration
+    MICRO_BATCH_ENABLED: bool = True
+    MICRO_BATCH_MAX_SIZE: int = 16
+    MICRO_BATCH_MAX_WAIT_MS: float = 25.0
+    MICRO_BATCH_SMOOTHING: float = 0.2
+    
+    # LLM Resilience Configuration
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    LLM_RETRY_AFTER_MAX: float = 60.0
+    LLM_ATTEMPT_TIMEOUT: float = 30.0
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_LATENCY_WINDOW: int = 200
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_SECONDS: float = 30.0
+    CIRCUIT_DEGRADE_TO_LOCAL: bool = True
+    
+    # Admission Control Configuration
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENCY: int = 32
+    # Interactive work is served four times as often as bulk work while both are waiting
+    ADMISSION_LANES: dict = {
+        "interactive": {"weight": 4, "max_queue": 64},
+        "bulk": {"weight": 1, "max_queue": 1024},
+    }
+    ADMISSION_RATE_WINDOW_SECONDS: float = 30.0
+    ADMISSION_MAX_RETRY_AFTER: int = 120
+    ADMISSION_WAIT_SMOOTHING: float = 0.2
+    
+    # Token Usage and Budget Configuration
+    USAGE_CLIENT_HEADER: str = "X-Client-Id"
+    USAGE_DEFAULT_CLIENT: str = "anonymous"
+    # The client header is unauthenticated, so it is only honoured from these peer addresses
+    # (the bundled frontends or a proxy that sets it); everyone else is billed as the default client
+    USAGE_TRUSTED_PROXIES: list = os.environ.get("USAGE_TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+    # Token limits per fixed minute / UTC day; None disables a budget
+    BUDGET_GLOBAL_TOKENS_PER_MINUTE: Optional[int] = 200000
+    BUDGET_GLOBAL_TOKENS_PER_DAY: Optional[int] = 5000000
+    BUDGET_CLIENT_TOKENS_PER_MINUTE: Optional[int] = 50000
+    BUDGET_CLIENT_TOKENS_PER_DAY: Optional[int] = 1000000
+    BUDGET_CLIENT_OVERRIDES: dict = {}  # client id -> {"per_minute": ..., "per_day": ...}
+    # "downgrade" answers analyses from the local analyzer; "throttle" rejects with 429
+    BUDGET_EXHAUSTED_ACTION: str = "downgrade"
+    # The usage endpoints are disabled unless a token is set, as they list every client's spend
+    USAGE_ADMIN_TOKEN: Optional[str] = os.environ.get("USAGE_ADMIN_TOKEN")
+    USAGE_ADMIN_HEADER: str = "X-Usage-Token"
+    
+    # Backfill Configuration
+    BACKFILL_CLIENT_ID: str = "backfill"  # usage and budgets of LLM re-analysis are billed here
+    BACKFILL_DEFAULT_RATE: float = 2.0  # rows started per second
+    BACKFILL_CONCURRENCY: int = 4
+    BACKFILL_PAGE_SIZE: int = 100
+    BACKFILL_CHECKPOINT_ROWS: int = 20
+    # Wait between checks while interactive work is queued or the backend is degraded
+    BACKFILL_BACKOFF_SECONDS: float = 1.0
+    # Backfill endpoints are disabled unless a token is set; it is separate from the profiling token
+    BACKFILL_ADMIN_TOKEN: Optional[str] = os.environ.get("BACKFILL_ADMIN_TOKEN")
+    BACKFILL_ADMIN_HEADER: str = "X-Backfill-Token"
+    
+    # Response Compression Configuration
+    COMPRESSION_MIN_BYTES: int = 1024
+    # Low levels keep most of the size reduction at a fraction of the CPU cost
+    COMPRESSION_GZIP_LEVEL: int = 3
+    COMPRESSION_BROTLI_QUALITY: int = 1
+    COMPRESSION_OFFLOAD_BYTES: int = 64 * 1024
+    
+    # Request Profiling Configuration
+    PROFILING_ENABLED: bool = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_ADMIN_TOKEN: Optional[str] = os.environ.get("PROFILING_ADMIN_TOKEN")
+    PROFILING_HEADER: str = "X-Profile-Token"
+    PROFILING_SAMPLE_RATE: float = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 200
+    
+    # Benchmark Configuration
+    BENCH_SIZES: list = [1000, 100000, 1000000]
+    BENCH_REPEAT: int = 5
+    BENCH_REGRESSION_THRESHOLD: float = 0.20
+    BENCH_BASELINE_PATH: str = "benchmarks/baseline.json"
+    BENCH_WORK_DIR: str = ".bench"
     
     # Text Processing Configuration
     MIN_WORD_LENGTH: int = 3
@@ -4,47 +4,570 @@ Database operations and models for the chatbot application.
 import aiosqlite
 import json
 import asyncio
-from typing import List, Dict, Optional
+import heapq
+import itertools
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Awaitable, Callable, List, Dict, Optional
 from datetime import datetime
 from config.settings import settings
+from database.vector_index import vector_index, analysis_text
+
+
+# SQL expressions that map a rollup day (YYYY-MM-DD) to a reporting period
+ROLLUP_PERIODS = {
+    "day": "day",
+    "week": "strftime('%Y-W%W', day)",
+    "month": "substr(day, 1, 7)",
+}
+
+
+ANALYSES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT,
+    topics TEXT,
+    sentiment TEXT,
+    keywords TEXT,
+    summary TEXT,
+    content TEXT,
+    raw_response TEXT,
+    messages TEXT,
+    created_at TEXT,
+    confidence FLOAT,
+    prompt_version TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    parent_id INTEGER,
+    superseded_by INTEGER
+)
+"""
+
+# Columns added after the first release, with their definitions, for migrating older tables
+ANALYSES_ADDED_COLUMNS = {
+    "prompt_version": "TEXT",
+    "version": "INTEGER NOT NULL DEFAULT 1",
+    "parent_id": "INTEGER",
+    "superseded_by": "INTEGER",
+}
+
+# Taxonomy tags live next to the analyses they belong to, in the same shard
+ANALYSIS_TAGS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {schema}.analysis_tags (
+    analysis_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (analysis_id, tag)
+) WITHOUT ROWID
+"""
+
+REPHRASE_CACHE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS rephrase_cache (
+    paragraph_hash TEXT PRIMARY KEY,
+    rephrased TEXT NOT NULL,
+    created_at TEXT
+)
+"""
+
+SHARD_FILE_PATTERN = re.compile(r"^analyses_(\d{4})_(\d{2})\.db$")
+
+
+def shard_month(created_at: Optional[str] = None) -> str:
+    """Return the YYYY-MM shard month for a timestamp (default: now, UTC)."""
+    return (created_at or datetime.utcnow().isoformat())[:7]
+
+
+def shard_base_id(month: str) -> int:
+    """Return the global ID just below a month shard's first row.
+
+    IDs are <yyyymm> * DB_SHARD_ID_MULTIPLIER + n, so every ID names its
+    shard and IDs sort chronologically by month.
+    """
+    return int(month.replace("-", "")) * settings.DB_SHARD_ID_MULTIPLIER
+
+
+def shard_month_of_id(analysis_id: int) -> Optional[str]:
+    """Return the shard month an analysis ID belongs to, or None for legacy IDs."""
+    key = analysis_id // settings.DB_SHARD_ID_MULTIPLIER
+    if key == 0:
+        return None
+    return f"{key // 100:04d}-{key % 100:02d}"
+
+
+def json_column(value) -> str:
+    """Serialize a JSON column, passing through values already serialized off the event loop."""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+async def table_columns(conn: aiosqlite.Connection, schema: str = "main") -> set:
+    """Return the column names of an analyses table."""
+    cursor = await conn.execute(f"PRAGMA {schema}.table_info(analyses)")
+    return {row[1] for row in await cursor.fetchall()}
+
+
+async def migrate_analyses(conn: aiosqlite.Connection, schema: str = "main") -> None:
+    """Add any missing ANALYSES_ADDED_COLUMNS to an existing analyses table, and its tag table."""
+    columns = await table_columns(conn, schema)
+    for name, definition in ANALYSES_ADDED_COLUMNS.items():
+        if name not in columns:
+            await conn.execute(f"ALTER TABLE {schema}.analyses ADD COLUMN {name} {definition}")
+    await conn.execute(ANALYSIS_TAGS_TABLE_SQL.format(schema=schema))
+    await conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_analysis_tags_tag ON analysis_tags (tag, analysis_id)")
+
+
+async def replace_tags(conn: aiosqlite.Connection, schema: str, analysis_id: int, tags: List) -> None:
+    """Replace an analysis's (tag, count) rows, in the caller's transaction."""
+    await conn.execute(f"DELETE FROM {schema}.analysis_tags WHERE analysis_id = ?", (analysis_id,))
+    await conn.executemany(
+        f"INSERT INTO {schema}.analysis_tags (analysis_id, tag, count) VALUES (?, ?, ?)",
+        [(analysis_id, tag, count) for tag, count in tags],
+    )
+
+
+def backfill_filter(predicate: Dict, columns: set) -> tuple:
+    """Build the WHERE clause and parameters selecting rows for a backfill predicate.
+    
+    Read-only shards created before the prompt_version column existed
+    have no version on any row, so all of their rows count as outdated.
+    """
+    # Rows already replaced by a newer version are never re-analyzed
+    clauses = ["superseded_by IS NULL"] if "superseded_by" in columns else []
+    params = []
+    if predicate.get("not_prompt_version"):
+        if "prompt_version" in columns:
+            clauses.append("(prompt_version IS NULL OR prompt_version != ?)")
+            params.append(predicate["not_prompt_version"])
+    if predicate.get("start") or predicate.get("end"):
+        clauses.append("created_at >= ? AND created_at < ?")
+        params += [predicate.get("start") or "0000-00-00", (predicate.get("end") or "9999-99-99") + "~"]
+    if predicate.get("max_confidence") is not None:
+        clauses.append("(confidence IS NULL OR confidence < ?)")
+        params.append(predicate["max_confidence"])
+    return " AND ".join(clauses) or "1", params
+
+
+def decode_analysis(row: Dict) -> Dict:
+    """Decode the JSON columns of an analysis row."""
+    for field in ("topics", "keywords", "messages"):
+        if field in row:
+            try:
+                row[field] = json.loads(row[field]) if row[field] else []
+            except (TypeError, ValueError):
+                row[field] = []
+    return row
 
 
 class DatabaseManager:
-    """Handles all database operations with async support."""
+    """Handles all database operations with async support.
+    
+    Analyses are partitioned into one SQLite file per month under
+    shard_dir. The main database holds rollups, caches and the usage
+    ledger, plus the original analyses table, which is kept as a
+    read-through legacy shard for rows (and IDs) written before sharding.
+    """
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, shard_dir: str = None):
         self.db_path = db_path or settings.DB_PATH
+        self.shard_dir = shard_dir or settings.DB_SHARD_DIR or os.path.splitext(self.db_path)[0] + "_shards"
+        self.archive_dir = os.path.join(self.shard_dir, "archive")
+        self._ready_shards = set()
+    
+    def shard_path(self, month: str, archived: bool = False) -> str:
+        """Return the file path of a month's shard."""
+        directory = self.archive_dir if archived else self.shard_dir
+        return os.path.join(directory, f"analyses_{month.replace('-', '_')}.db")
+    
+    @staticmethod
+    def oldest_writable_month() -> str:
+        """Return the oldest month whose shard still accepts writes."""
+        now = datetime.utcnow()
+        index = now.year * 12 + now.month - 1 - (settings.DB_SHARD_WRITABLE_MONTHS - 1)
+        return f"{index // 12:04d}-{index % 12 + 1:02d}"
+    
+    def list_shards(self, include_archived: bool = False) -> List[Dict]:
+        """List month shards on disk, oldest first."""
+        oldest_writable = self.oldest_writable_month()
+        directories = [(self.shard_dir, False)] + ([(self.archive_dir, True)] if include_archived else [])
+        shards = []
+        for directory, archived in directories:
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                match = SHARD_FILE_PATTERN.match(name)
+                if not match:
+                    continue
+                month = f"{match.group(1)}-{match.group(2)}"
+                path = os.path.join(directory, name)
+                shards.append({
+                    "month": month,
+                    "path": path,
+                    "archived": archived,
+                    "read_only": archived or month < oldest_writable,
+                    "bytes": os.path.getsize(path),
+                })
+        shards.sort(key=lambda shard: shard["month"])
+        return shards
+    
+    def _legacy_source(self) -> Dict:
+        """The main database's analyses table, as a shard-like read source."""
+        return {"month": None, "path": self.db_path, "archived": False, "read_only": False}
+    
+    def _sources(self, start: str = None, end: str = None, include_archived: bool = False) -> List[Dict]:
+        """Return the legacy table plus the shards that can hold rows between start and end."""
+        shards = [
+            shard for shard in self.list_shards(include_archived)
+            if (not start or shard["month"] >= start[:7]) and (not end or shard["month"] <= end[:7])
+        ]
+        return [self._legacy_source()] + shards
+    
+    def _source_for_month(self, month: Optional[str]) -> Optional[Dict]:
+        """Return the read source holding a month's rows, looking in the archive too."""
+        if month is None:
+            return self._legacy_source()
+        for archived in (False, True):
+            path = self.shard_path(month, archived)
+            if os.path.exists(path):
+                read_only = archived or month < self.oldest_writable_month()
+                return {"month": month, "path": path, "archived": archived, "read_only": read_only}
+        return None
+    
+    @staticmethod
+    def _connect(source: Dict) -> aiosqlite.Connection:
+        """Open a read source; shards that no longer take writes are opened read-only."""
+        if source["read_only"]:
+            return aiosqlite.connect(Path(source["path"]).resolve().as_uri() + "?mode=ro", uri=True)
+        return aiosqlite.connect(source["path"])
+    
+    async def _fan_out(self, sources: List[Dict],
+                       query: Callable[[aiosqlite.Connection, Dict], Awaitable]) -> List:
+        """Run query(conn, source) against several sources concurrently; results are in source order."""
+        semaphore = asyncio.Semaphore(settings.DB_SHARD_FANOUT_CONCURRENCY)
+        
+        async def run(source: Dict) -> List:
+            async with semaphore:
+                async with self._connect(source) as conn:
+                    conn.row_factory = aiosqlite.Row
+                    return await query(conn, source)
+        
+        return await asyncio.gather(*(run(source) for source in sources))
+    
+    async def _ensure_shard(self, month: str) -> str:
+        """Create a month's shard if needed and return its path."""
+        if month < self.oldest_writable_month():
+            raise ValueError(f"The shard for {month} is read-only")
+        path = self.shard_path(month)
+        if path in self._ready_shards:
+            return path
+        
+        os.makedirs(self.shard_dir, exist_ok=True)
+        async with aiosqlite.connect(path) as conn:
+            await conn.execute(ANALYSES_TABLE_SQL)
+            await migrate_analyses(conn)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at)")
+            # Start the shard's AUTOINCREMENT at its global base so stored IDs are global IDs
+            await conn.execute(
+                """
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT 'analyses', ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'analyses')
+                """,
+                (shard_base_id(month),),
+            )
+            await conn.commit()
+        self._ready_shards.add(path)
+        return path
+    
+    async def archive_shards(self, before: str) -> List[str]:
+        """Compact read-only shards for months before `before` (YYYY-MM) into the archive directory.
+        
+        Archived shards are left out of searches and the vector index but
+        their analyses can still be fetched by ID.
+        """
+        archived = []
+        for shard in self.list_shards():
+            if shard["month"] >= before or not shard["read_only"]:
+                continue
+            os.makedirs(self.archive_dir, exist_ok=True)
+            target = self.shard_path(shard["month"], archived=True)
+            await asyncio.to_thread(self._vacuum_into, shard["path"], target)
+            os.remove(shard["path"])
+            archived.append(shard["month"])
+        return archived
+    
+    @staticmethod
+    def _vacuum_into(source_path: str, target_path: str) -> None:
+        """Write a compacted copy of a database file."""
+        conn = sqlite3.connect(source_path)
+        try:
+            conn.execute("VACUUM INTO ?", (target_path,))
+        finally:
+            conn.close()
     
     async def init_database(self) -> None:
         """Create database and tables if they don't exist."""
         async with aiosqlite.connect(self.db_path) as conn:
+            # Pre-sharding analyses stay readable here; new rows go to month shards
+            await conn.execute(ANALYSES_TABLE_SQL)
+            await migrate_analyses(conn)
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rollup_sentiment_daily (
+                    day TEXT NOT NULL,
+                    sentiment TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, sentiment)
+                )
+                """
+            )
             await conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS analyses (
+                CREATE TABLE IF NOT EXISTS rollup_topic_daily (
+                    day TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, topic)
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rollup_confidence_daily (
+                    day TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, bucket)
+                )
+                """
+            )
+            await conn.execute(REPHRASE_CACHE_TABLE_SQL)
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_usage (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT,
-                    topics TEXT,
-                    sentiment TEXT,
-                    keywords TEXT,
-                    summary TEXT,
-                    content TEXT,
-                    raw_response TEXT,
-                    messages TEXT,
-                    created_at TEXT,
-                    confidence FLOAT
+                    analysis_id INTEGER,
+                    client_id TEXT NOT NULL,
+                    task TEXT NOT NULL,
+                    model TEXT,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    created_at TEXT NOT NULL
                 )
                 """
             )
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_analysis ON llm_usage (analysis_id)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage (created_at)")
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_usage_client_created ON llm_usage (client_id, created_at)"
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS backfill_jobs (
+                    id TEXT PRIMARY KEY,
+                    spec TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    cursor INTEGER NOT NULL DEFAULT 0,
+                    max_id INTEGER NOT NULL,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    updated INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+            await conn.commit()
+            await self._backfill_rollups(conn)
+        
+        if settings.VECTOR_INDEX_ENABLED:
+            await self.sync_vector_index()
+    
+    async def init_rephrase_cache(self) -> None:
+        """Create only the rephrase cache table, for processes that need nothing else."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute(REPHRASE_CACHE_TABLE_SQL)
             await conn.commit()
     
+    async def sync_vector_index(self) -> None:
+        """Rebuild the vector index from the current unarchived analyses if it is out of step with them.
+        
+        Superseded versions are left out, as save_analysis removes them
+        from the index when their replacement is saved.
+        """
+        await asyncio.to_thread(vector_index.load)
+        sources = self._sources()
+        
+        async def current_rows(conn) -> str:
+            # Closed shards may predate the version columns
+            return " WHERE superseded_by IS NULL" if "superseded_by" in await table_columns(conn) else ""
+        
+        async def count(conn, source):
+            cursor = await conn.execute(f"SELECT COUNT(*) FROM analyses{await current_rows(conn)}")
+            return (await cursor.fetchone())[0]
+        
+        if sum(await self._fan_out(sources, count)) == vector_index.count:
+            return
+        
+        await asyncio.to_thread(vector_index.reset)
+        # Sources are in ID order, so the index is rebuilt in ID order
+        for source in sources:
+            async with self._connect(source) as conn:
+                conn.row_factory = aiosqlite.Row
+                cursor = await conn.execute(
+                    "SELECT id, title, topics, keywords, summary, content FROM analyses"
+                    f"{await current_rows(conn)} ORDER BY id"
+                )
+                while True:
+                    rows = await cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    items = [(row["id"], analysis_text(dict(row))) for row in rows]
+                    await asyncio.to_thread(vector_index.add_many, items)
+    
+    @staticmethod
+    def _confidence_bucket(confidence: Optional[float]) -> int:
+        """Map a confidence score to its histogram bucket index."""
+        buckets = settings.ROLLUP_CONFIDENCE_BUCKETS
+        return min(max(int((confidence or 0.0) * buckets), 0), buckets - 1)
+    
+    async def _update_rollups(self, conn: aiosqlite.Connection, record: Dict, delta: int = 1) -> None:
+        """Add one analysis to the rollup counters (or remove it with delta=-1), in the caller's transaction."""
+        day = (record.get("created_at") or datetime.utcnow().isoformat())[:10]
+        await conn.execute(
+            """
+            INSERT INTO rollup_sentiment_daily (day, sentiment, count) VALUES (?, ?, ?)
+            ON CONFLICT(day, sentiment) DO UPDATE SET count = count + excluded.count
+            """,
+            (day, (record.get("sentiment") or "unknown").lower(), delta),
+        )
+        topics = {str(t).strip().lower() for t in record.get("topics") or [] if str(t).strip()}
+        await conn.executemany(
+            """
+            INSERT INTO rollup_topic_daily (day, topic, count) VALUES (?, ?, ?)
+            ON CONFLICT(day, topic) DO UPDATE SET count = count + excluded.count
+            """,
+            [(day, topic, delta) for topic in topics],
+        )
+        await conn.execute(
+            """
+            INSERT INTO rollup_confidence_daily (day, bucket, count) VALUES (?, ?, ?)
+            ON CONFLICT(day, bucket) DO UPDATE SET count = count + excluded.count
+            """,
+            (day, self._confidence_bucket(record.get("confidence")), delta),
+        )
+    
+    async def _backfill_rollups(self, conn: aiosqlite.Connection) -> None:
+        """Populate empty rollup tables from existing analyses, archived shards included."""
+        cursor = await conn.execute("SELECT EXISTS (SELECT 1 FROM rollup_sentiment_daily)")
+        (has_rollups,) = await cursor.fetchone()
+        if has_rollups:
+            return
+        
+        conn.row_factory = aiosqlite.Row
+        for source in self._sources(include_archived=True):
+            # The legacy table lives in the main database; read it on the writing connection
+            if source["month"] is None:
+                await self._backfill_rollups_from(conn, conn)
+                continue
+            async with self._connect(source) as shard_conn:
+                shard_conn.row_factory = aiosqlite.Row
+                await self._backfill_rollups_from(shard_conn, conn)
+        await conn.commit()
+    
+    async def _backfill_rollups_from(self, source_conn: aiosqlite.Connection, conn: aiosqlite.Connection) -> None:
+        """Add one source's current analyses to the rollups, in the caller's transaction."""
+        # Superseded versions are taken out of the rollups when their replacement is saved
+        where = " WHERE superseded_by IS NULL" if "superseded_by" in await table_columns(source_conn) else ""
+        cursor = await source_conn.execute(f"SELECT topics, sentiment, created_at, confidence FROM analyses{where}")
+        while True:
+            rows = await cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                record = dict(row)
+                try:
+                    record["topics"] = json.loads(record["topics"]) if record["topics"] else []
+                except (TypeError, ValueError):
+                    record["topics"] = []
+                await self._update_rollups(conn, record)
+    
+    async def get_sentiment_rollup(self, period: str = "day", start: str = None, end: str = None) -> List[Dict]:
+        """Return sentiment counts per period from the daily rollup."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            conn.row_factory = aiosqlite.Row
+            cursor = await conn.execute(
+                f"""
+                SELECT {ROLLUP_PERIODS[period]} AS period, sentiment, SUM(count) AS count
+                FROM rollup_sentiment_daily
+                WHERE day >= ? AND day <= ?
+                GROUP BY period, sentiment
+                ORDER BY period, sentiment
+                """,
+                (start or "0000-00-00", end or "9999-99-99"),
+            )
+            return [dict(r) for r in await cursor.fetchall()]
+    
+    async def get_topic_rollup(self, period: str = "day", start: str = None, end: str = None,
+                               limit: int = 10) -> List[Dict]:
+        """Return the top topics per period from the daily rollup."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            conn.row_factory = aiosqlite.Row
+            cursor = await conn.execute(
+                f"""
+                SELECT period, topic, count FROM (
+                    SELECT period, topic, count,
+                           ROW_NUMBER() OVER (PARTITION BY period ORDER BY count DESC, topic) AS rank
+                    FROM (
+                        SELECT {ROLLUP_PERIODS[period]} AS period, topic, SUM(count) AS count
+                        FROM rollup_topic_daily
+                        WHERE day >= ? AND day <= ?
+                        GROUP BY period, topic
+                    )
+                )
+                WHERE rank <= ?
+                ORDER BY period, count DESC, topic
+                """,
+                (start or "0000-00-00", end or "9999-99-99", limit),
+            )
+            return [dict(r) for r in await cursor.fetchall()]
+    
+    async def get_confidence_rollup(self, period: str = "day", start: str = None, end: str = None) -> List[Dict]:
+        """Return the confidence histogram per period from the daily rollup."""
+        width = 1.0 / settings.ROLLUP_CONFIDENCE_BUCKETS
+        async with aiosqlite.connect(self.db_path) as conn:
+            conn.row_factory = aiosqlite.Row
+            cursor = await conn.execute(
+                f"""
+                SELECT {ROLLUP_PERIODS[period]} AS period, bucket, SUM(count) AS count
+                FROM rollup_confidence_daily
+                WHERE day >= ? AND day <= ?
+                GROUP BY period, bucket
+                ORDER BY period, bucket
+                """,
+                (start or "0000-00-00", end or "9999-99-99"),
+            )
+            rows = [dict(r) for r in await cursor.fetchall()]
+        for row in rows:
+            row["low"] = round(row["bucket"] * width, 4)
+            row["high"] = round((row["bucket"] + 1) * width, 4)
+        return rows
+    
     async def save_analysis(self, record: Dict) -> int:
-        """Save analysis record to database and return the row ID."""
+        """Save analysis record to its month's shard and return the global row ID."""
+        shard_path = await self._ensure_shard(shard_month(record.get("created_at")))
         async with aiosqlite.connect(self.db_path) as conn:
+            # Attached, the shard row, rollups and usage entries commit in one transaction
+            await conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+            parent_schema = None
+            if record.get("parent_id"):
+                parent_schema = await self._attach_parent(conn, record["parent_id"], shard_path)
             cursor = await conn.execute(
                 """
-                INSERT INTO analyses
-                (title, topics, sentiment, keywords, summary, content, raw_response, messages, created_at, confidence)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO shard.analyses
+                (title, topics, sentiment, keywords, summary, content, raw_response, messages, created_at, confidence,
+                 prompt_version, version, parent_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     record.get("title"),
@@ -54,72 +577,453 @@ class DatabaseManager:
                     record.get("summary"),
                     record.get("content"),
                     record.get("raw_response"),
-                    json.dumps(record.get("messages", [])),
+                    json_column(record.get("messages", [])),
                     record.get("created_at"),
                     record.get("confidence"),
+                    record.get("prompt_version"),
+                    record.get("version", 1),
+                    record.get("parent_id"),
                 ),
             )
+            row_id = cursor.lastrowid
+            parent = None
+            if parent_schema:
+                cursor = await conn.execute(
+                    f"SELECT topics, sentiment, created_at, confidence FROM {parent_schema}.analyses "
+                    "WHERE id = ? AND superseded_by IS NULL",
+                    (record["parent_id"],),
+                )
+                parent = await cursor.fetchone()
+                await conn.execute(
+                    f"UPDATE {parent_schema}.analyses SET superseded_by = ? WHERE id = ?",
+                    (row_id, record["parent_id"]),
+                )
+            await replace_tags(conn, "shard", row_id, record.get("tags") or [])
+            if parent is not None:
+                # The superseded version stops counting, as update_analysis does for in-place rewrites
+                columns = ("topics", "sentiment", "created_at", "confidence")
+                await self._update_rollups(conn, decode_analysis(dict(zip(columns, parent))), delta=-1)
+            await self._update_rollups(conn, record)
+            await self._insert_usage(conn, record.get("usage") or [], row_id)
             await conn.commit()
-            return cursor.lastrowid
+        
+        if settings.VECTOR_INDEX_ENABLED:
+            if parent_schema:
+                await vector_index.remove_async(record["parent_id"])
+            await vector_index.add_async(row_id, analysis_text(record))
+        return row_id
+    
+    async def _attach_parent(self, conn: aiosqlite.Connection, parent_id: int, shard_path: str) -> Optional[str]:
+        """Make the shard holding a parent analysis reachable on conn and return its schema name.
+        
+        Must run before the caller's transaction starts, since SQLite cannot
+        attach databases inside one. Returns None for archived parents.
+        """
+        month = shard_month_of_id(parent_id)
+        source = self._source_for_month(month)
+        if source is None or source["archived"]:
+            return None
+        schema = "main"
+        if month is not None:
+            if source["path"] == shard_path:
+                schema = "shard"
+            else:
+                # Like update_analysis, this rewrites a row in a possibly closed shard
+                await conn.execute("ATTACH DATABASE ? AS parent", (source["path"],))
+                schema = "parent"
+        await migrate_analyses(conn, schema)
+        return schema
     
-    async def search_analyses_by_term(self, term: str) -> List[Dict]:
-        """Search analyses by term across multiple fields."""
+    async def update_analysis(self, analysis_id: int, record: Dict) -> None:
+        """Rewrite an analysis in place and move its rollup counts from the old result to the new one.
+        
+        Backfills are the one writer allowed into shards past
+        DB_SHARD_WRITABLE_MONTHS: they only rewrite existing rows, never add
+        any, so a closed shard's ID range stays fixed. Archived shards are
+        never updated.
+        """
+        month = shard_month_of_id(analysis_id)
+        source = self._source_for_month(month)
+        if source is None or source["archived"]:
+            raise ValueError(f"Analysis {analysis_id} is not in an unarchived shard")
+        
         async with aiosqlite.connect(self.db_path) as conn:
             conn.row_factory = aiosqlite.Row
-            q = "%" + term.lower() + "%"
+            schema = "main"
+            if month is not None:
+                await conn.execute("ATTACH DATABASE ? AS shard", (source["path"],))
+                # Closed shards may predate the version columns and tag table
+                await migrate_analyses(conn, "shard")
+                schema = "shard"
+            table = f"{schema}.analyses"
+            cursor = await conn.execute(
+                f"SELECT topics, sentiment, created_at, confidence FROM {table} WHERE id = ?", (analysis_id,)
+            )
+            old = await cursor.fetchone()
+            if old is None:
+                raise ValueError(f"Analysis {analysis_id} not found")
+            old = decode_analysis(dict(old))
+            
+            await conn.execute(
+                f"""
+                UPDATE {table}
+                SET title = ?, topics = ?, sentiment = ?, keywords = ?, summary = ?, raw_response = ?,
+                    messages = ?, confidence = ?, prompt_version = ?, version = version + 1
+                WHERE id = ?
+                """,
+                (
+                    record.get("title"),
+                    json.dumps(record.get("topics", [])),
+                    record.get("sentiment"),
+                    json.dumps(record.get("keywords", [])),
+                    record.get("summary"),
+                    record.get("raw_response"),
+                    json_column(record.get("messages", [])),
+                    record.get("confidence"),
+                    record.get("prompt_version"),
+                    analysis_id,
+                ),
+            )
+            await replace_tags(conn, schema, analysis_id, record.get("tags") or [])
+            await self._update_rollups(conn, old, delta=-1)
+            await self._update_rollups(conn, {**record, "created_at": old["created_at"]})
+            await self._insert_usage(conn, record.get("usage") or [], analysis_id)
+            await conn.commit()
+        
+        if settings.VECTOR_INDEX_ENABLED:
+            await vector_index.replace_async(analysis_id, analysis_text(record))
+    
+    @staticmethod
+    async def _insert_usage(conn: aiosqlite.Connection, usages: List[Dict], analysis_id: Optional[int]) -> None:
+        """Insert token usage entries, in the caller's transaction."""
+        await conn.executemany(
+            """
+            INSERT INTO llm_usage
+            (analysis_id, client_id, task, model, prompt_tokens, completion_tokens, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    analysis_id, u["client_id"], u["task"], u.get("model"),
+                    u["prompt_tokens"], u["completion_tokens"], u["created_at"],
+                )
+                for u in usages
+            ],
+        )
+    
+    async def record_usage(self, usages: List[Dict], analysis_id: Optional[int] = None) -> None:
+        """Record token usage for calls that did not produce a saved analysis."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            await self._insert_usage(conn, usages, analysis_id)
+            await conn.commit()
+    
+    async def get_usage_summary(self, period: str = "day", start: str = None, end: str = None,
+                                client_id: str = None) -> List[Dict]:
+        """Return token usage per period, client and model from the usage ledger."""
+        client_filter = "AND client_id = ?" if client_id else ""
+        params = [start or "0000-00-00", (end or "9999-99-99") + "~"]
+        if client_id:
+            params.append(client_id)
+        async with aiosqlite.connect(self.db_path) as conn:
+            conn.row_factory = aiosqlite.Row
+            cursor = await conn.execute(
+                f"""
+                SELECT {ROLLUP_PERIODS[period]} AS period, client_id, model,
+                       COUNT(*) AS entries,
+                       SUM(prompt_tokens) AS prompt_tokens,
+                       SUM(completion_tokens) AS completion_tokens,
+                       SUM(prompt_tokens + completion_tokens) AS total_tokens
+                FROM (
+                    SELECT substr(created_at, 1, 10) AS day, client_id, model, prompt_tokens, completion_tokens
+                    FROM llm_usage
+                    WHERE created_at >= ? AND created_at < ? {client_filter}
+                )
+                GROUP BY period, client_id, model
+                ORDER BY period, client_id, model
+                """,
+                params,
+            )
+            return [dict(r) for r in await cursor.fetchall()]
+    
+    async def get_usage_for_analysis(self, analysis_id: int) -> List[Dict]:
+        """Return the token usage entries linked to one analysis."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            conn.row_factory = aiosqlite.Row
+            cursor = await conn.execute(
+                "SELECT * FROM llm_usage WHERE analysis_id = ? ORDER BY id", (analysis_id,)
+            )
+            return [dict(r) for r in await cursor.fetchall()]
+    
+    async def get_client_usage_since(self, since: str) -> Dict[str, int]:
+        """Return total tokens per client recorded at or after the given timestamp."""
+        async with aiosqlite.connect(self.db_path) as conn:
             cursor = await conn.execute(
                 """
+                SELECT client_id, SUM(prompt_tokens + completion_tokens)
+                FROM llm_usage WHERE created_at >= ?
+                GROUP BY client_id
+                """,
+                (since,),
+            )
+            return dict(await cursor.fetchall())
+    
+    async def search_analyses_by_term(self, term: str, limit: Optional[int] = None, offset: int = 0,
+                                      start: str = None, end: str = None) -> List[Dict]:
+        """Search analyses by term across multiple fields, optionally one page at a time.
+        
+        The query fans out in parallel to the shards for the start..end date
+        range (all unarchived shards by default) and the per-shard results
+        are merged in ID order.
+        """
+        q = "%" + term.lower() + "%"
+        date_filter = ""
+        params = [q, q, q, q, q]
+        if start or end:
+            date_filter = "AND created_at >= ? AND created_at < ?"
+            params += [start or "0000-00-00", (end or "9999-99-99") + "~"]
+        # Each shard must return enough rows to fill the page after merging
+        params.append(-1 if limit is None else limit + offset)
+        
+        async def query(conn, source):
+            cursor = await conn.execute(
+                f"""
                 SELECT * FROM analyses
-                WHERE lower(title) LIKE ?
+                WHERE (lower(title) LIKE ?
                 OR lower(topics) LIKE ?
                 OR lower(keywords) LIKE ?
                 OR lower(summary) LIKE ?
-                OR lower(content) LIKE ?
+                OR lower(content) LIKE ?)
+                {date_filter}
+                ORDER BY id
+                LIMIT ?
+                """,
+                params,
+            )
+            return [dict(r) for r in await cursor.fetchall()]
+        
+        per_shard = await self._fan_out(self._sources(start, end), query)
+        merged = heapq.merge(*per_shard, key=lambda row: row["id"])
+        page = itertools.islice(merged, offset, None if limit is None else offset + limit)
+        return [decode_analysis(row) for row in page]
+    
+    async def search_analyses_by_tag(self, tag: str, limit: Optional[int] = None, offset: int = 0,
+                                     start: str = None, end: str = None) -> List[Dict]:
+        """Return analyses carrying a taxonomy tag, with its occurrence count, in ID order.
+        
+        Uses each shard's tag index, fanning out like search_analyses_by_term.
+        """
+        date_filter = ""
+        params = [tag]
+        if start or end:
+            date_filter = "AND a.created_at >= ? AND a.created_at < ?"
+            params += [start or "0000-00-00", (end or "9999-99-99") + "~"]
+        params.append(-1 if limit is None else limit + offset)
+        
+        async def query(conn, source):
+            cursor = await conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'analysis_tags'")
+            if await cursor.fetchone() is None:
+                # Closed shards that no backfill has touched predate tagging
+                return []
+            cursor = await conn.execute(
+                f"""
+                SELECT a.*, t.count AS tag_count
+                FROM analysis_tags t JOIN analyses a ON a.id = t.analysis_id
+                WHERE t.tag = ? {date_filter}
+                ORDER BY t.analysis_id
+                LIMIT ?
                 """,
-                (q, q, q, q, q),
-            )
-            rows = await cursor.fetchall()
-            result = []
-            for r in rows:
-                row = dict(r)
-                try: 
-                    row["topics"] = json.loads(row["topics"]) if row["topics"] else []
-                except: 
-                    row["topics"] = []
-                try: 
-                    row["keywords"] = json.loads(row["keywords"]) if row["keywords"] else []
-                except: 
-                    row["keywords"] = []
-                try: 
-                    row["messages"] = json.loads(row["messages"]) if row["messages"] else []
-                except: 
-                    row["messages"] = []
-                result.append(row)
-            return result
+                params,
+            )
+            return [dict(r) for r in await cursor.fetchall()]
+        
+        per_shard = await self._fan_out(self._sources(start, end), query)
+        merged = heapq.merge(*per_shard, key=lambda row: row["id"])
+        page = itertools.islice(merged, offset, None if limit is None else offset + limit)
+        return [decode_analysis(row) for row in page]
+    
+    async def get_analysis_tags(self, analysis_id: int) -> List[Dict]:
+        """Return an analysis's taxonomy tags with their occurrence counts, most frequent first."""
+        source = self._source_for_month(shard_month_of_id(analysis_id))
+        if source is None:
+            return []
+        
+        async def query(conn, source):
+            cursor = await conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'analysis_tags'")
+            if await cursor.fetchone() is None:
+                return []
+            cursor = await conn.execute(
+                "SELECT tag, count FROM analysis_tags WHERE analysis_id = ? ORDER BY count DESC, tag",
+                (analysis_id,),
+            )
+            return [dict(r) for r in await cursor.fetchall()]
+        
+        return (await self._fan_out([source], query))[0]
+    
+    async def get_cached_rephrasings(self, paragraph_hashes: List[str]) -> Dict[str, str]:
+        """Return cached rephrasings keyed by paragraph hash."""
+        cached = {}
+        async with aiosqlite.connect(self.db_path) as conn:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(paragraph_hashes), 500):
+                chunk = paragraph_hashes[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor = await conn.execute(
+                    f"SELECT paragraph_hash, rephrased FROM rephrase_cache WHERE paragraph_hash IN ({placeholders})",
+                    chunk,
+                )
+                cached.update(await cursor.fetchall())
+        return cached
+    
+    async def save_rephrasing(self, paragraph_hash: str, rephrased: str) -> None:
+        """Store the rephrasing of one paragraph in the cache."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute(
+                "INSERT OR REPLACE INTO rephrase_cache (paragraph_hash, rephrased, created_at) VALUES (?, ?, ?)",
+                (paragraph_hash, rephrased, datetime.utcnow().isoformat() + "Z"),
+            )
+            await conn.commit()
+    
+    async def get_analyses_by_ids(self, analysis_ids: List[int]) -> List[Dict]:
+        """Get several analyses by ID, in the order the IDs were given.
+        
+        IDs are grouped by the shard their value names and each shard is
+        queried in parallel, archived shards included.
+        """
+        by_month: Dict[Optional[str], List[int]] = {}
+        for analysis_id in analysis_ids:
+            by_month.setdefault(shard_month_of_id(analysis_id), []).append(analysis_id)
+        
+        sources = [source for source in map(self._source_for_month, by_month) if source is not None]
+        if not sources:
+            return []
+        
+        async def query(conn, source):
+            ids = by_month[source["month"]]
+            rows = []
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor = await conn.execute(f"SELECT * FROM analyses WHERE id IN ({placeholders})", chunk)
+                rows.extend(dict(r) for r in await cursor.fetchall())
+            return rows
+        
+        by_id = {}
+        for rows in await self._fan_out(sources, query):
+            for row in rows:
+                by_id[row["id"]] = decode_analysis(row)
+        return [by_id[i] for i in analysis_ids if i in by_id]
     
     async def get_analysis_by_id(self, analysis_id: int) -> Optional[Dict]:
-        """Get analysis by ID."""
+        """Get analysis by ID, from whichever shard the ID belongs to."""
+        rows = await self.get_analyses_by_ids([analysis_id])
+        return rows[0] if rows else None
+    
+    async def get_labeled_analyses(self, limit: int) -> List[Dict]:
+        """Return up to limit of the newest LLM-labelled analyses (id, content, sentiment, topics).
+        
+        Rows answered locally or by the local classifier, and rows replaced
+        by a newer version, are left out so the classifier only learns from
+        current LLM output.
+        """
+        async def query(conn, source):
+            columns = await table_columns(conn)
+            clauses = ["sentiment IS NOT NULL"]
+            if "prompt_version" in columns:
+                clauses.append("(prompt_version IS NULL OR prompt_version NOT IN ('local', 'classifier'))")
+            if "superseded_by" in columns:
+                clauses.append("superseded_by IS NULL")
+            cursor = await conn.execute(
+                f"SELECT id, content, sentiment, topics FROM analyses WHERE {' AND '.join(clauses)} "
+                "ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            return [decode_analysis(dict(r)) for r in await cursor.fetchall()]
+        
+        per_shard = await self._fan_out(self._sources(), query)
+        newest = heapq.merge(*per_shard, key=lambda row: row["id"], reverse=True)
+        return list(itertools.islice(newest, limit))
+    
+    async def max_analysis_id(self) -> int:
+        """Return the highest analysis ID across unarchived shards, or 0."""
+        async def query(conn, source):
+            cursor = await conn.execute("SELECT MAX(id) FROM analyses")
+            return (await cursor.fetchone())[0] or 0
+        
+        return max(await self._fan_out(self._sources(), query))
+    
+    async def count_backfill_rows(self, predicate: Dict, max_id: int) -> int:
+        """Count the unarchived analyses up to max_id that match a backfill predicate."""
+        async def query(conn, source):
+            where, params = backfill_filter(predicate, await table_columns(conn))
+            cursor = await conn.execute(f"SELECT COUNT(*) FROM analyses WHERE id <= ? AND {where}", [max_id, *params])
+            return (await cursor.fetchone())[0]
+        
+        sources = self._sources(predicate.get("start"), predicate.get("end"))
+        return sum(await self._fan_out(sources, query))
+    
+    async def select_backfill_rows(self, predicate: Dict, after_id: int, max_id: int, limit: int) -> List[Dict]:
+        """Return up to limit analyses matching a backfill predicate with after_id < id <= max_id, in ID order.
+        
+        Sources are read one after another in ID order and those wholly
+        before after_id are skipped, so each page touches one or two shards.
+        """
+        cursor_month = shard_month_of_id(after_id)
+        rows = []
+        for source in self._sources(predicate.get("start"), predicate.get("end")):
+            month = source["month"]
+            if cursor_month is not None and (month is None or month < cursor_month):
+                continue
+            async with self._connect(source) as conn:
+                conn.row_factory = aiosqlite.Row
+                where, params = backfill_filter(predicate, await table_columns(conn))
+                cursor = await conn.execute(
+                    f"SELECT * FROM analyses WHERE id > ? AND id <= ? AND {where} ORDER BY id LIMIT ?",
+                    [after_id, max_id, *params, limit - len(rows)],
+                )
+                rows.extend(decode_analysis(dict(r)) for r in await cursor.fetchall())
+            if len(rows) >= limit:
+                break
+        return rows
+    
+    async def save_backfill_job(self, job: Dict) -> None:
+        """Insert or checkpoint a backfill job."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute(
+                """
+                INSERT OR REPLACE INTO backfill_jobs
+                (id, spec, status, cursor, max_id, total, processed, updated, failed, last_error, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job["id"], json.dumps(job["spec"]), job["status"], job["cursor"], job["max_id"],
+                    job["total"], job["processed"], job["updated"], job["failed"], job.get("last_error"),
+                    job["created_at"], datetime.utcnow().isoformat() + "Z",
+                ),
+            )
+            await conn.commit()
+    
+    async def get_backfill_job(self, job_id: str) -> Optional[Dict]:
+        """Get one backfill job by ID."""
         async with aiosqlite.connect(self.db_path) as conn:
             conn.row_factory = aiosqlite.Row
-            cursor = await conn.execute("SELECT * FROM analyses WHERE id = ?", (analysis_id,))
+            cursor = await conn.execute("SELECT * FROM backfill_jobs WHERE id = ?", (job_id,))
             row = await cursor.fetchone()
-            
-            if row:
-                result = dict(row)
-                try: 
-                    result["topics"] = json.loads(result["topics"]) if result["topics"] else []
-                except: 
-                    result["topics"] = []
-                try: 
-                    result["keywords"] = json.loads(result["keywords"]) if result["keywords"] else []
-                except: 
-                    result["keywords"] = []
-                try: 
-                    result["messages"] = json.loads(result["messages"]) if result["messages"] else []
-                except: 
-                    result["messages"] = []
-                return result
+        if row is None:
             return None
+        job = dict(row)
+        job["spec"] = json.loads(job["spec"])
+        return job
+    
+    async def list_backfill_jobs(self) -> List[Dict]:
+        """List backfill jobs, newest first."""
+        async with aiosqlite.connect(self.db_path) as conn:
+            conn.row_factory = aiosqlite.Row
+            cursor = await conn.execute("SELECT * FROM backfill_jobs ORDER BY created_at DESC")
+            jobs = [dict(r) for r in await cursor.fetchall()]
+        for job in jobs:
+            job["spec"] = json.loads(job["spec"])
+        return jobs
 
 
 # Global database manager instance
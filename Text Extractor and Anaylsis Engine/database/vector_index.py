@@ -0,0 +1,267 @@
+"""
+Local embedding index for similarity search over stored analyses.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+from utils.file_lock import FileLock
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=65536)
+def _projection_row(bucket: int, dim: int) -> np.ndarray:
+    """Return the fixed random projection row for one hash bucket."""
+    rng = np.random.default_rng(settings.VECTOR_SEED + bucket)
+    return rng.standard_normal(dim).astype(np.float32)
+
+
+def embed_text(text: str, dim: int = None) -> np.ndarray:
+    """Embed text offline with a signed hashing vectorizer and random projection.
+
+    Unigrams and bigrams are hashed into VECTOR_HASH_BUCKETS buckets, and each
+    bucket contributes its projection row weighted by a sublinear term count.
+    The result is L2-normalised so cosine similarity is a dot product.
+    """
+    dim = dim or settings.VECTOR_DIM
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+    
+    counts: Dict[int, float] = {}
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        bucket = h % settings.VECTOR_HASH_BUCKETS
+        counts[bucket] = counts.get(bucket, 0.0) + sign
+    
+    vector = np.zeros(dim, dtype=np.float32)
+    for bucket, count in counts.items():
+        if count:
+            weight = np.sign(count) * (1.0 + np.log(abs(count)))
+            vector += weight * _projection_row(bucket, dim)
+    
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def analysis_text(record: Dict) -> str:
+    """Build the text that represents an analysis in the index."""
+    parts = [record.get("title") or "", record.get("summary") or ""]
+    for field in ("topics", "keywords"):
+        value = record.get(field) or []
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                value = [value]
+        parts.append(" ".join(value))
+    parts.append(record.get("content") or "")
+    return " ".join(parts)
+
+
+class VectorIndex:
+    """Memory-mapped float32 matrix of analysis embeddings.
+
+    Vectors live in <base>.f32 and their analysis IDs in <base>.ids, both
+    pre-allocated in growing chunks; <base>.json holds the dimension and
+    the number of rows in use. Rows are appended as analyses are saved,
+    re-embedded in place when an analysis is rewritten and dropped when a
+    newer version supersedes it.
+
+    The API server and CLI jobs (backfills) may share the files, so every
+    write holds an exclusive lock on <base>.lock and first re-reads the
+    row count other processes left in <base>.json; searches re-read it
+    under a shared lock.
+    """
+    
+    def __init__(self, base_path: str = None, dim: int = None):
+        self.base_path = base_path or settings.VECTOR_INDEX_PATH or os.path.splitext(settings.DB_PATH)[0] + ".vectors"
+        self.dim = dim or settings.VECTOR_DIM
+        self.count = 0
+        self.capacity = 0
+        self.vectors: Optional[np.memmap] = None
+        self.ids: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.base_path + ".lock")
+        self._meta_version: Optional[Tuple[int, int]] = None
+        self._loaded = False
+    
+    @property
+    def meta_path(self) -> str:
+        return self.base_path + ".json"
+    
+    def _map(self, capacity: int) -> None:
+        """(Re)map the data files with room for capacity rows."""
+        mode = "r+" if os.path.exists(self.base_path + ".f32") else "w+"
+        if mode == "r+":
+            # Grow the files in place before mapping them at the new size
+            for suffix, itemsize in ((".f32", 4 * self.dim), (".ids", 8)):
+                with open(self.base_path + suffix, "r+b") as f:
+                    f.truncate(capacity * itemsize)
+        self.vectors = np.memmap(self.base_path + ".f32", dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self.ids = np.memmap(self.base_path + ".ids", dtype=np.int64, mode=mode, shape=(capacity,))
+        self.capacity = capacity
+    
+    def load(self) -> None:
+        """Open the index files, creating them if needed."""
+        with self._lock, self._file_lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.meta_path):
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+                if meta.get("dim") != self.dim:
+                    raise RuntimeError(
+                        f"Vector index at {self.base_path} has dim {meta.get('dim')}, expected {self.dim}"
+                    )
+                self.count = meta["count"]
+                capacity = os.path.getsize(self.base_path + ".ids") // 8
+                self._map(max(capacity, self.count, settings.VECTOR_GROWTH_ROWS))
+            else:
+                self.count = 0
+                self._map(settings.VECTOR_GROWTH_ROWS)
+                self._write_meta()
+            self._meta_version = self._stat_meta()
+            self._loaded = True
+    
+    def _stat_meta(self) -> Optional[Tuple[int, int]]:
+        """Return a key that changes whenever the meta file is replaced."""
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return None
+        # os.replace gives every write a new inode, so same-tick writes still differ
+        return stat.st_ino, stat.st_mtime_ns
+    
+    def _sync(self) -> None:
+        """Pick up rows other processes wrote since this one last looked; call holding both locks."""
+        version = self._stat_meta()
+        if version is None or version == self._meta_version:
+            return
+        with open(self.meta_path) as f:
+            self.count = json.load(f)["count"]
+        capacity = os.path.getsize(self.base_path + ".ids") // 8
+        if max(capacity, self.count) > self.capacity:
+            self.vectors.flush()
+            self.ids.flush()
+            self._map(max(capacity, self.count))
+        self._meta_version = version
+    
+    def _write_meta(self) -> None:
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "count": self.count}, f)
+        os.replace(tmp_path, self.meta_path)
+        self._meta_version = self._stat_meta()
+    
+    def add(self, analysis_id: int, text: str) -> None:
+        """Embed text and append it to the index."""
+        self.add_many([(analysis_id, text)])
+    
+    def add_many(self, items: List[Tuple[int, str]]) -> None:
+        """Embed and append several (analysis_id, text) pairs."""
+        self.load()
+        embedded = [(analysis_id, embed_text(text, self.dim)) for analysis_id, text in items]
+        with self._lock, self._file_lock:
+            self._sync()
+            needed = self.count + len(embedded)
+            if needed > self.capacity:
+                self.vectors.flush()
+                self.ids.flush()
+                self._map(max(needed, self.capacity * 2))
+            for analysis_id, vector in embedded:
+                self.vectors[self.count] = vector
+                self.ids[self.count] = analysis_id
+                self.count += 1
+            self.vectors.flush()
+            self.ids.flush()
+            self._write_meta()
+    
+    def replace(self, analysis_id: int, text: str) -> None:
+        """Re-embed an analysis already in the index, or append it if it is missing."""
+        self.load()
+        vector = embed_text(text, self.dim)
+        with self._lock, self._file_lock:
+            self._sync()
+            positions = np.flatnonzero(self.ids[:self.count] == analysis_id)
+            if len(positions):
+                self.vectors[positions] = vector
+                self.vectors.flush()
+                return
+        self.add_many([(analysis_id, text)])
+    
+    def remove(self, analysis_id: int) -> None:
+        """Drop an analysis from the index by moving the last rows into its place."""
+        self.load()
+        with self._lock, self._file_lock:
+            self._sync()
+            positions = np.flatnonzero(self.ids[:self.count] == analysis_id)
+            if not len(positions):
+                return
+            for position in positions[::-1]:
+                last = self.count - 1
+                if position != last:
+                    self.vectors[position] = self.vectors[last]
+                    self.ids[position] = self.ids[last]
+                self.count = last
+            self.vectors.flush()
+            self.ids.flush()
+            self._write_meta()
+    
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Return up to k (analysis_id, cosine similarity) pairs, best first."""
+        self.load()
+        with self._lock:
+            self._file_lock.acquire(shared=True)
+            try:
+                self._sync()
+            finally:
+                self._file_lock.release()
+            count = self.count
+            vectors, ids = self.vectors, self.ids
+        if count == 0:
+            return []
+        
+        q = embed_text(query, self.dim)
+        scores = vectors[:count] @ q
+        k = min(k, count)
+        top = np.argpartition(scores, count - k)[count - k:]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+    
+    def reset(self) -> None:
+        """Drop all rows from the index."""
+        self.load()
+        with self._lock, self._file_lock:
+            self.count = 0
+            self._write_meta()
+    
+    async def add_async(self, analysis_id: int, text: str) -> None:
+        """Append to the index without blocking the event loop."""
+        await asyncio.to_thread(self.add, analysis_id, text)
+    
+    async def replace_async(self, analysis_id: int, text: str) -> None:
+        """Re-embed an analysis without blocking the event loop."""
+        await asyncio.to_thread(self.replace, analysis_id, text)
+    
+    async def remove_async(self, analysis_id: int) -> None:
+        """Drop an analysis from the index without blocking the event loop."""
+        await asyncio.to_thread(self.remove, analysis_id)
+    
+    async def search_async(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Search the index without blocking the event loop."""
+        return await asyncio.to_thread(self.search, query, k)
+
+
+# Global vector index instance
+vector_index = VectorIndex()
@@ -1,16 +1,113 @@
 """
 Streamlit application for content analysis and extraction.
 """
-import asyncio
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 import httpx
 from config.settings import settings
 from frontend.components import (
-    apply_extractor_theme, display_app_header, 
+    apply_extractor_theme, display_app_header,
     display_analysis_results, display_search_results
 )
 
 
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """Return the process-wide keep-alive HTTP client shared by all sessions."""
+    return httpx.Client(
+        base_url=settings.API_BASE_URL,
+        timeout=settings.FRONTEND_HTTP_TIMEOUT,
+        headers={settings.USAGE_CLIENT_HEADER: "extractor-ui"},
+        limits=httpx.Limits(
+            max_connections=settings.FRONTEND_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.FRONTEND_HTTP_MAX_CONNECTIONS,
+        ),
+    )
+
+
+def read_uploaded_texts(uploaded_files) -> list:
+    """Read texts from uploaded plain-text files and CSVs (one text per row)."""
+    texts = []
+    for uploaded in uploaded_files:
+        content = uploaded.getvalue().decode("utf-8", errors="replace")
+        if uploaded.name.lower().endswith(".csv"):
+            rows = list(csv.DictReader(io.StringIO(content)))
+            if not rows:
+                continue
+            columns = list(rows[0].keys())
+            column = st.selectbox(
+                f"Text column in {uploaded.name}:",
+                columns,
+                index=columns.index("text") if "text" in columns else 0,
+                key=f"column-{uploaded.name}",
+            )
+            texts.extend(
+                (f"{uploaded.name}:{i + 1}", row[column])
+                for i, row in enumerate(rows) if (row.get(column) or "").strip()
+            )
+        elif content.strip():
+            texts.append((uploaded.name, content))
+    return texts
+
+
+def post_chunk(client: httpx.Client, chunk: list) -> list:
+    """Analyze one chunk of (name, text) pairs through the batch API; errors fill every item."""
+    try:
+        response = client.post("/analyze_batch", json={"texts": [text for _, text in chunk]})
+        response.raise_for_status()
+        return response.json()["results"]
+    except Exception as e:
+        return [{"error": str(e)}] * len(chunk)
+
+
+def run_batch(texts: list) -> None:
+    """Send texts to the batch API in concurrent chunks and show progress as each chunk finishes.
+    
+    Texts go in chunks of FRONTEND_BATCH_CHUNK_SIZE rather than one per
+    request so the API can pack short ones into shared calls; the items of
+    a chunk therefore complete together.
+    """
+    client = get_http_client()
+    chunk_size = settings.FRONTEND_BATCH_CHUNK_SIZE
+    concurrency = settings.FRONTEND_BATCH_CONCURRENCY
+    starts = list(range(0, len(texts), chunk_size))
+    progress = st.progress(0.0, text=f"0 / {len(texts)} analyzed")
+    table = st.empty()
+    status = [{"item": name, "status": "queued", "title": None, "sentiment": None} for name, _ in texts]
+    table.dataframe(status, use_container_width=True)
+    
+    def mark_running(chunks: int) -> None:
+        # The pool starts chunks in submission order, so the first ones not yet finished are in flight
+        for start in starts[:chunks]:
+            for row in status[start:start + chunk_size]:
+                if row["status"] == "queued":
+                    row["status"] = "running"
+        table.dataframe(status, use_container_width=True)
+    
+    done = 0
+    # Streamlit elements are only updated from this thread; workers just make the requests
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(post_chunk, client, texts[start:start + chunk_size]): start for start in starts}
+        mark_running(concurrency)
+        
+        for finished, future in enumerate(as_completed(futures), 1):
+            start = futures[future]
+            results = future.result()
+            for row, result in zip(status[start:start + len(results)], results):
+                if "error" in result:
+                    row["status"] = f"error: {result['error']}"
+                else:
+                    row.update(status="done", title=result.get("title"), sentiment=result.get("sentiment"))
+            
+            done += len(results)
+            progress.progress(done / len(texts), text=f"{done} / {len(texts)} analyzed")
+            mark_running(concurrency + finished)
+    
+    st.success("Batch complete!")
+
+
 def main():
     """Main application function."""
     # Page configuration
@@ -29,11 +126,17 @@ def main():
         "Intelligent Content Comprehension & Data Extraction"
     )
     
+    client = get_http_client()
+    
     # Sidebar menu
     st.sidebar.title("Choose Action")
     mode = st.sidebar.radio(
-        "Select an API Endpoint:", 
-        ["Analyze Text (POST /analyze)", "Search Analyses (GET /search)"]
+        "Select an API Endpoint:",
+        [
+            "Analyze Text (POST /analyze)",
+            "Batch Upload (POST /analyze_batch)",
+            "Search Analyses (GET /search)",
+        ]
     )
     
     # Analyze Text Mode
@@ -47,21 +150,7 @@ def main():
             else:
                 with st.spinner("Analyzing content..."):
                     try:
-                        # Use httpx for async HTTP requests
-                        async def make_request():
-                            async with httpx.AsyncClient() as client:
-                                response = await client.post(
-                                    f"{settings.API_BASE_URL}/analyze", 
-                                    json={"text": text_input},
-                                    timeout=30.0
-                                )
-                                return response
-                        
-                        # Run async request in sync context
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        response = loop.run_until_complete(make_request())
-                        loop.close()
+                        response = client.post("/analyze", json={"text": text_input})
                         
                         if response.status_code == 200:
                             data = response.json()
@@ -71,6 +160,24 @@ def main():
                     except Exception as e:
                         st.error(f"Failed to connect to API: {e}")
     
+    # Batch Upload Mode
+    elif mode == "Batch Upload (POST /analyze_batch)":
+        st.subheader("Analyze Many Documents")
+        uploaded_files = st.file_uploader(
+            "Upload text files or a CSV (one text per row):",
+            type=["txt", "md", "csv"],
+            accept_multiple_files=True,
+        )
+        texts = read_uploaded_texts(uploaded_files or [])
+        if texts:
+            st.caption(f"{len(texts)} texts ready")
+        
+        if st.button("Run Batch Analysis"):
+            if not texts:
+                st.warning("Please upload at least one non-empty file first.")
+            else:
+                run_batch(texts)
+    
     # Search Mode
     elif mode == "Search Analyses (GET /search)":
         st.subheader("Search Past Analyses")
@@ -80,31 +187,47 @@ def main():
             if not search_term.strip():
                 st.warning("Please enter a search term first.")
             else:
-                with st.spinner("Searching database..."):
-                    try:
-                        # Use httpx for async HTTP requests
-                        async def make_search_request():
-                            async with httpx.AsyncClient() as client:
-                                response = await client.get(
-                                    f"{settings.API_BASE_URL}/search", 
-                                    params={"topic": search_term},
-                                    timeout=30.0
-                                )
-                                return response
-                        
-                        # Run async request in sync context
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        response = loop.run_until_complete(make_search_request())
-                        loop.close()
+                st.session_state.search_term = search_term
+                st.session_state.search_page = 0
+        
+        if st.session_state.get("search_term"):
+            page_size = settings.FRONTEND_SEARCH_PAGE_SIZE
+            page = st.session_state.get("search_page", 0)
+            
+            with st.spinner("Searching database..."):
+                try:
+                    # Ask for one extra row to learn whether another page exists
+                    response = client.get(
+                        "/search",
+                        params={
+                            "topic": st.session_state.search_term,
+                            "limit": page_size + 1,
+                            "offset": page * page_size,
+                        },
+                    )
+                    
+                    if response.status_code == 200:
+                        results = response.json()
+                        has_next = len(results["results"]) > page_size
+                        results["results"] = results["results"][:page_size]
+                        results["count"] = len(results["results"])
+                        display_search_results(results)
                         
-                        if response.status_code == 200:
-                            results = response.json()
-                            display_search_results(results)
-                        else:
-                            st.error(f"Error: {response.status_code} - {response.text}")
-                    except Exception as e:
-                        st.error(f"Search failed: {e}")
+                        col1, col2, col3 = st.columns([1, 2, 1])
+                        with col1:
+                            if st.button("Previous", disabled=page == 0):
+                                st.session_state.search_page = page - 1
+                                st.rerun()
+                        with col2:
+                            st.caption(f"Page {page + 1}")
+                        with col3:
+                            if st.button("Next", disabled=not has_next):
+                                st.session_state.search_page = page + 1
+                                st.rerun()
+                    else:
+                        st.error(f"Error: {response.status_code} - {response.text}")
+                except Exception as e:
+                    st.error(f"Search failed: {e}")
 
 
 if __name__ == "__main__":
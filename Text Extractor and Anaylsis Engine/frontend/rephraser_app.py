@@ -5,11 +5,49 @@ import asyncio
 import streamlit as st
 from config.settings import settings
 from services.ai_service import ai_service
+from services.document_rephraser import rephrase_document
+from database.db_manager import db_manager
 from frontend.components import (
     apply_academic_theme, display_app_header, display_chat_message
 )
 
 
+@st.cache_resource
+def init_database() -> bool:
+    """Create the rephrase cache table once per process rather than on every rephrase.
+    
+    Only the cache is needed here, so the analyses schema, rollup backfill
+    and vector index sync of the full init_database are skipped.
+    """
+    asyncio.run(db_manager.init_rephrase_cache())
+    return True
+
+
+def display_document_mode():
+    """Rephrase a full document paragraph by paragraph."""
+    document = st.text_area("Paste your full document (paragraphs separated by blank lines):", height=300)
+    
+    if st.button("Rephrase Document") and document.strip():
+        with st.spinner("Athena is refining each paragraph..."):
+            try:
+                init_database()
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                result = loop.run_until_complete(rephrase_document(document))
+                loop.close()
+            except Exception as e:
+                st.error(f"⚠️ Error: {str(e)}")
+                return
+        
+        st.caption(
+            f"{result['paragraphs']} paragraphs: {result['rephrased']} rephrased, "
+            f"{result['cached']} reused from cache"
+        )
+        if result["failed"]:
+            st.warning(f"Paragraphs kept unchanged after errors: {result['failed']}")
+        display_chat_message("assistant", result["text"])
+
+
 def main():
     """Main application function."""
     # Page configuration
@@ -28,6 +66,11 @@ def main():
         "Your Personal Research Writing Mentor"
     )
     
+    # Whole-document mode rephrases paragraph by paragraph with caching
+    if st.sidebar.checkbox("Rephrase whole document"):
+        display_document_mode()
+        return
+    
     # Initialize chat state
     if "messages" not in st.session_state:
         st.session_state.messages = []
@@ -45,14 +45,140 @@ async def test_api():
     return await test_api()
 
 
+def run_bench(args) -> bool:
+    """Run the micro-benchmark suite against the stored baseline."""
+    from config.settings import settings
+    from benchmarks.micro_benchmarks import run_benchmarks
+    sizes = [int(size) for size in args.sizes.split(",")] if args.sizes else settings.BENCH_SIZES
+    return run_benchmarks(
+        sizes,
+        baseline_path=args.baseline,
+        threshold=args.threshold,
+        save_baseline=args.save_baseline,
+    )
+
+
+def run_shards(args) -> None:
+    """List analysis shards, optionally archiving old ones first."""
+    from database.db_manager import db_manager
+    if args.archive_before:
+        archived = asyncio.run(db_manager.archive_shards(args.archive_before))
+        print(f"Archived {len(archived)} shard(s): {', '.join(archived) or '-'}")
+    
+    print(f"{'month':<9} {'state':<10} {'size':>12}  path")
+    for shard in db_manager.list_shards(include_archived=True):
+        state = "archived" if shard["archived"] else "read-only" if shard["read_only"] else "writable"
+        print(f"{shard['month']:<9} {state:<10} {shard['bytes']:>12,}  {shard['path']}")
+
+
+def run_backfill(args) -> None:
+    """Create and run a backfill job in the foreground, or resume or list jobs.
+    
+    Ctrl-C pauses the job at its last checkpoint; resume it with --resume.
+    """
+    from config.settings import settings
+    from database.db_manager import db_manager
+    from services.backfill import JobLockedError, backfill_runner
+    
+    async def backfill():
+        await db_manager.init_database()
+        await backfill_runner.recover()
+        if args.list:
+            for job in await db_manager.list_backfill_jobs():
+                print(f"{job['id']}  {job['status']:<8} {job['processed']:>7}/{job['total']:<7} "
+                      f"failed {job['failed']:<5} {job['spec']}")
+            return
+        if args.resume:
+            job_id = args.resume
+        else:
+            predicate = {
+                "not_prompt_version": settings.ANALYSIS_PROMPT_VERSION if args.outdated else None,
+                "start": args.start,
+                "end": args.end,
+                "max_confidence": args.max_confidence,
+            }
+            job = await backfill_runner.create_job(
+                args.stage, args.write, {key: value for key, value in predicate.items() if value is not None},
+                args.rate,
+            )
+            job_id = job["id"]
+            print(f"Created backfill job {job_id} over {job['total']} row(s)")
+        try:
+            job = await backfill_runner.run(job_id)
+        except JobLockedError as e:
+            print(e)
+            return
+        print(f"Job {job_id} {job['status']}: {job['processed']}/{job['total']} processed, "
+              f"{job['updated']} updated, {job['failed']} failed")
+        if job["last_error"]:
+            print(f"Last error: {job['last_error']}")
+    
+    try:
+        asyncio.run(backfill())
+    except KeyboardInterrupt:
+        print("Backfill paused; resume with --resume")
+
+
+def run_classifier() -> bool:
+    """Train the local classifier from stored analyses and print its evaluation report."""
+    import json
+    from config.settings import settings
+    from database.db_manager import db_manager
+    from services.classifier import local_classifier, train_classifier
+    
+    async def labeled_rows():
+        await db_manager.init_database()
+        return await db_manager.get_labeled_analyses(settings.CLASSIFIER_MAX_TRAIN_ROWS)
+    
+    rows = asyncio.run(labeled_rows())
+    if not rows:
+        print("No LLM-labelled analyses to train on")
+        return False
+    print(f"Training on {len(rows)} analyses...")
+    model = train_classifier(rows)
+    local_classifier.save(model)
+    print(f"Saved {len(model['topics'])} topic labels to {local_classifier.path}")
+    print(json.dumps(model["meta"]["report"], indent=2))
+    return True
+
+
+def run_taxonomy() -> bool:
+    """Compile the taxonomy dictionary into its cached automaton and print its size."""
+    import json
+    from utils.taxonomy import taxonomy_tagger
+    
+    if not taxonomy_tagger.refresh(wait=True):
+        print(f"No taxonomy dictionary at {taxonomy_tagger.path}")
+        return False
+    print(json.dumps(taxonomy_tagger.get_state(), indent=2))
+    return True
+
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(description="Chatbot Application CLI")
     parser.add_argument(
         "command", 
-        choices=["api", "extractor", "rephraser", "test"],
+        choices=["api", "extractor", "rephraser", "test", "bench", "shards", "backfill", "classifier", "taxonomy"],
         help="Command to run"
     )
+    parser.add_argument("--sizes", help="bench: comma-separated database sizes, e.g. 1000,100000")
+    parser.add_argument("--baseline", help="bench: baseline JSON path")
+    parser.add_argument("--threshold", type=float, help="bench: allowed median slowdown, e.g. 0.2 for 20%%")
+    parser.add_argument("--save-baseline", action="store_true", help="bench: store results as the new baseline")
+    parser.add_argument("--archive-before", help="shards: archive read-only shards before this month (YYYY-MM)")
+    parser.add_argument("--stage", choices=["local", "llm"], default="local",
+                        help="backfill: re-run local parsing/scoring only, or the full LLM analysis")
+    parser.add_argument("--write", choices=["in_place", "version"], default="in_place",
+                        help="backfill: rewrite rows or save new versions")
+    parser.add_argument("--outdated", action="store_true",
+                        help="backfill: select rows not analyzed with the current prompt version")
+    parser.add_argument("--start", help="backfill: select rows created on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="backfill: select rows created on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--max-confidence", type=float, help="backfill: select rows below this confidence")
+    parser.add_argument("--rate", type=float, help="backfill: rows per second")
+    parser.add_argument("--resume", help="backfill: resume a paused job by ID")
+    parser.add_argument("--list", action="store_true", help="backfill: list jobs")
     
     args = parser.parse_args()
     
@@ -69,6 +195,19 @@ def main():
         result = loop.run_until_complete(test_api())
         loop.close()
         return result
+    elif args.command == "bench":
+        if not run_bench(args):
+            sys.exit(1)
+    elif args.command == "shards":
+        run_shards(args)
+    elif args.command == "backfill":
+        run_backfill(args)
+    elif args.command == "classifier":
+        if not run_classifier():
+            sys.exit(1)
+    elif args.command == "taxonomy":
+        if not run_taxonomy():
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,18 +1,43 @@
 """
 Pydantic models for data validation and API schemas.
 """
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Dict, Optional, List
+from pydantic import BaseModel, Field
 
 
 class AnalyzeRequest(BaseModel):
     """Request model for content analysis."""
     text: str
+    classifier: bool = False  # answer locally when the local classifier is confident
 
 
 class AnalyzeBatchRequest(BaseModel):
     """Request model for batch content analysis."""
     texts: List[str]
+    classifier: bool = False
+
+
+class RephraseDocumentRequest(BaseModel):
+    """Request model for whole-document rephrasing."""
+    text: str
+
+
+class NormalizationReport(BaseModel):
+    """Sizes of an input before and after normalization, and what each step removed."""
+    original_bytes: int
+    normalized_bytes: int
+    bytes_removed: int
+    original_tokens: int
+    tokens_removed: int
+    steps: Dict[str, int] = {}
+
+
+class CompressionReport(BaseModel):
+    """Token counts of an input shortened by local pre-compression."""
+    original_tokens: int
+    compressed_tokens: int
+    sentences: int
+    kept_sentences: int
 
 
 class AnalyzeResponse(BaseModel):
@@ -22,9 +47,13 @@ class AnalyzeResponse(BaseModel):
     topics: List[str] = []
     sentiment: Optional[str]
     keywords: List[str] = []
+    tags: List[str] = []
     summary: Optional[str]
     created_at: str
     confidence: float
+    compression: Optional[CompressionReport] = None
+    classified_locally: bool = False
+    normalization: Optional[NormalizationReport] = None
 
 
 class SearchRequest(BaseModel):
@@ -42,3 +71,33 @@ class BatchAnalyzeResponse(BaseModel):
     """Response model for batch analysis operations."""
     count: int
     results: List[dict]
+
+
+class RollupResponse(BaseModel):
+    """Response model for aggregate analytics endpoints."""
+    period: str
+    count: int
+    results: List[dict]
+
+
+class RephraseDocumentResponse(BaseModel):
+    """Response model for whole-document rephrasing."""
+    text: str
+    paragraphs: int
+    rephrased: int
+    cached: int
+    failed: List[int] = []
+
+
+class BackfillRequest(BaseModel):
+    """Request model for creating a backfill job.
+    
+    Predicates are combined: rows must match every one that is set.
+    """
+    stage: str = "local"  # "local" or "llm"
+    write: str = "in_place"  # "in_place" or "version"
+    outdated: bool = False  # rows not analyzed with the current prompt version
+    start: Optional[str] = Field(None, pattern=r"^\d{4}-\d{2}-\d{2}$")
+    end: Optional[str] = Field(None, pattern=r"^\d{4}-\d{2}-\d{2}$")
+    max_confidence: Optional[float] = None
+    rate: Optional[float] = Field(None, gt=0)  # rows per second
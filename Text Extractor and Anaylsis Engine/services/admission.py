@@ -0,0 +1,232 @@
+"""
+Admission control for the LLM pipeline: weighted priority lanes and load shedding.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Tuple
+from config.settings import settings
+
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a lane's queue is full; carries a suggested retry delay in seconds."""
+    
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"The {lane} queue is full; retry in {retry_after} seconds")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """Queue room a multi-item request holds in a lane until its items are admitted."""
+    
+    def __init__(self, lane: str, units: int):
+        self.lane = lane
+        self.remaining = units
+
+
+class AdmissionController:
+    """Limits concurrent LLM work and queues the rest in weighted lanes.
+
+    Up to max_concurrency units of work run at once. Further work waits in
+    its lane's bounded FIFO queue; when a slot frees, the next lane is
+    picked by smooth weighted round-robin among lanes with waiters, so
+    interactive calls keep moving while a large bulk backlog drains. A
+    full lane rejects new work with a retry delay estimated from the
+    recent completion (drain) rate. Multi-item requests reserve room for
+    all their items up front; reserved units count toward max_queue until
+    an item is admitted or the request cancels what is left.
+    """
+    
+    def __init__(self, max_concurrency: int = None, lanes: Dict[str, Dict] = None):
+        self.max_concurrency = max_concurrency or settings.ADMISSION_MAX_CONCURRENCY
+        self.lanes = lanes or settings.ADMISSION_LANES
+        self.in_flight = 0
+        self._queues: Dict[str, Deque[Tuple[asyncio.Future, float]]] = {name: deque() for name in self.lanes}
+        self._reserved = {name: 0 for name in self.lanes}
+        self._credit = {name: 0 for name in self.lanes}
+        self._avg_wait: Dict[str, Optional[float]] = {name: None for name in self.lanes}
+        self._completions: Deque[float] = deque()
+        self._started: Optional[float] = None
+        self.stats = {name: {"admitted": 0, "rejected": 0, "completed": 0} for name in self.lanes}
+    
+    def queued(self, lane: str = None) -> int:
+        """Return the number of waiters in one lane, or across all lanes."""
+        if lane is not None:
+            return len(self._queues[lane])
+        return sum(len(queue) for queue in self._queues.values())
+    
+    def drain_rate(self) -> float:
+        """Return completed units per second over the recent window."""
+        now = time.monotonic()
+        cutoff = now - settings.ADMISSION_RATE_WINDOW_SECONDS
+        while self._completions and self._completions[0] < cutoff:
+            self._completions.popleft()
+        if self._started is None or not self._completions:
+            return 0.0
+        window = min(settings.ADMISSION_RATE_WINDOW_SECONDS, max(now - self._started, 1.0))
+        return len(self._completions) / window
+    
+    def retry_after(self, lane: str) -> int:
+        """Estimate how many seconds it will take the lane's current queue to drain."""
+        rate = self.drain_rate()
+        if rate <= 0:
+            return settings.ADMISSION_MAX_RETRY_AFTER
+        # The lane gets its weighted share of the drain rate while other lanes have waiters
+        active = [name for name, queue in self._queues.items() if queue or name == lane]
+        share = self.lanes[lane]["weight"] / sum(self.lanes[name]["weight"] for name in active)
+        seconds = len(self._queues[lane]) / (rate * share)
+        return max(1, min(settings.ADMISSION_MAX_RETRY_AFTER, math.ceil(seconds)))
+    
+    def reserve(self, lane: str, units: int = 1) -> Reservation:
+        """Reserve queue room for units of work, or raise QueueFullError if the lane cannot take them.
+
+        Requests larger than the whole queue are admitted when the lane is
+        empty, so an oversized batch is not told to retry forever. Cancel
+        the reservation once the request finishes to free unused units.
+        """
+        if not settings.ADMISSION_ENABLED:
+            return Reservation(lane, 0)
+        max_queue = self.lanes[lane]["max_queue"]
+        needed = min(units, max_queue)
+        if len(self._queues[lane]) + self._reserved[lane] + needed > max_queue:
+            self.stats[lane]["rejected"] += 1
+            raise QueueFullError(lane, self.retry_after(lane))
+        self._reserved[lane] += needed
+        return Reservation(lane, needed)
+    
+    def cancel(self, reservation: Reservation) -> None:
+        """Return a reservation's unused units to its lane."""
+        self._reserved[reservation.lane] -= reservation.remaining
+        reservation.remaining = 0
+    
+    def _consume(self, reservation: Optional[Reservation]) -> None:
+        """Turn one reserved unit into an admitted or queued item."""
+        if reservation is not None and reservation.remaining:
+            reservation.remaining -= 1
+            self._reserved[reservation.lane] -= 1
+    
+    async def acquire(self, lane: str, reservation: Optional[Reservation] = None) -> None:
+        """Wait for a slot in the given lane, or raise QueueFullError if its queue is full.
+
+        Items of a request holding a reservation use one of its units and
+        are never rejected individually, even once the units run out (e.g.
+        when a failed pack is retried item by item).
+        """
+        loop = asyncio.get_running_loop()
+        if self._started is None:
+            self._started = time.monotonic()
+        
+        if self.in_flight < self.max_concurrency and not self.queued():
+            self._consume(reservation)
+            self.in_flight += 1
+            self._record_admission(lane, 0.0)
+            return
+        
+        queue = self._queues[lane]
+        if reservation is None and len(queue) + self._reserved[lane] >= self.lanes[lane]["max_queue"]:
+            self.stats[lane]["rejected"] += 1
+            raise QueueFullError(lane, self.retry_after(lane))
+        
+        self._consume(reservation)
+        entry = (loop.create_future(), loop.time())
+        queue.append(entry)
+        try:
+            await entry[0]
+        except asyncio.CancelledError:
+            if entry[0].done() and not entry[0].cancelled():
+                # The slot was granted just as the caller went away; hand it on
+                self.release(lane, completed=False)
+            elif entry in queue:
+                queue.remove(entry)
+            raise
+    
+    def release(self, lane: str, completed: bool = True) -> None:
+        """Free a slot and wake the next waiter."""
+        self.in_flight -= 1
+        if completed:
+            self._completions.append(time.monotonic())
+            self.stats[lane]["completed"] += 1
+        self._grant_next()
+    
+    @asynccontextmanager
+    async def slot(self, lane: str, reservation: Optional[Reservation] = None):
+        """Hold a slot in the given lane for the duration of the block."""
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        await self.acquire(lane, reservation)
+        try:
+            yield
+        finally:
+            self.release(lane)
+    
+    def _pick_lane(self) -> Optional[str]:
+        """Choose the next lane to serve by smooth weighted round-robin."""
+        active = [name for name, queue in self._queues.items() if queue]
+        if not active:
+            return None
+        total = 0
+        for name in active:
+            self._credit[name] += self.lanes[name]["weight"]
+            total += self.lanes[name]["weight"]
+        chosen = max(active, key=lambda name: self._credit[name])
+        self._credit[chosen] -= total
+        return chosen
+    
+    def _grant_next(self) -> None:
+        """Hand free slots to waiters until slots or waiters run out."""
+        now = asyncio.get_running_loop().time()
+        while self.in_flight < self.max_concurrency:
+            lane = self._pick_lane()
+            if lane is None:
+                return
+            future, enqueued_at = self._queues[lane].popleft()
+            if future.done():
+                # Waiter was cancelled while queued
+                continue
+            self.in_flight += 1
+            self._record_admission(lane, now - enqueued_at)
+            future.set_result(None)
+    
+    def _record_admission(self, lane: str, wait: float) -> None:
+        """Update admission counters and the smoothed queue wait for a lane."""
+        self.stats[lane]["admitted"] += 1
+        previous = self._avg_wait[lane]
+        alpha = settings.ADMISSION_WAIT_SMOOTHING
+        self._avg_wait[lane] = wait if previous is None else alpha * wait + (1 - alpha) * previous
+    
+    def get_state(self) -> Dict:
+        """Return queue depths, wait times and drain rate for monitoring."""
+        now = asyncio.get_running_loop().time()
+        lanes = {}
+        for name, queue in self._queues.items():
+            oldest = now - queue[0][1] if queue else 0.0
+            avg_wait = self._avg_wait[name]
+            lanes[name] = {
+                "weight": self.lanes[name]["weight"],
+                "queued": len(queue),
+                "reserved": self._reserved[name],
+                "max_queue": self.lanes[name]["max_queue"],
+                "oldest_wait_ms": round(oldest * 1000, 2),
+                "avg_wait_ms": round(avg_wait * 1000, 2) if avg_wait is not None else None,
+                **self.stats[name],
+            }
+        return {
+            "enabled": settings.ADMISSION_ENABLED,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued(),
+            "drain_rate_per_second": round(self.drain_rate(), 3),
+            "lanes": lanes,
+        }
+
+
+# Global admission controller instance
+admission_controller = AdmissionController()
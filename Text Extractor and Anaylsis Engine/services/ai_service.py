@@ -2,9 +2,18 @@
 AI service module for OpenAI interactions and content analysis.
 """
 import asyncio
-from typing import Optional, List, Dict
+import json
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
 from openai import AsyncOpenAI
 from config.settings import settings
+from database.db_manager import db_manager
+from services.executor import cpu_executor
+from services.resilience import ResilientCaller, CircuitOpenError
+from services.router import ModelRouter
+from services.usage import BudgetExceededError, current_client, split_usage, token_budget
+from utils.precompression import compress_text
+from utils.text_processing import estimate_tokens, extract_json_array, local_analysis_response
 
 
 class AIService:
@@ -12,13 +21,105 @@ class AIService:
     
     def __init__(self):
         settings.validate_config()
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model_name = settings.MODEL_NAME
-        self.max_tokens = settings.MAX_TOKENS
+        # Retries are handled by the resilience layer, not the client
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
         self.temperature = settings.TEMPERATURE
+        self.resilience = ResilientCaller()
+        self.router = ModelRouter()
+        self.precompression_stats = {"compressed": 0, "original_tokens": 0, "compressed_tokens": 0}
+    
+    async def _complete(self, task: str, messages: List[Dict], temperature: float,
+                        items: int = 1) -> Tuple[str, List[Dict], Dict]:
+        """Route and run a chat completion through the resilience layer.
+        
+        Returns the reply text, the messages actually sent (which differ
+        from the input when the router truncated an oversized text) and the
+        call's token usage. The call's estimated tokens are reserved against
+        the caller's budgets first; BudgetExceededError is raised if any
+        budget is exhausted.
+        
+        Attempts abandoned after they were sent (hedged duplicates that
+        lost, attempts cut off by the timeout) are still billed by the
+        provider, so each is charged too, to the budget and in the returned
+        usage: at the winning attempt's usage, or at the reservation when
+        no attempt succeeded.
+        """
+        decision, messages = self.router.route(task, messages, items)
+        client = current_client.get()
+        reserved = decision["input_tokens"] + decision["max_tokens"]
+        token_budget.reserve(client, reserved)
+        # Attempts started, and those the backend answered with a reply or an error; the rest were cut off
+        sent = answered = 0
+        
+        async def attempt():
+            nonlocal sent, answered
+            sent += 1
+            try:
+                response = await self.client.chat.completions.create(
+                    model=decision["model"],
+                    messages=messages,
+                    max_tokens=decision["max_tokens"],
+                    temperature=temperature,
+                )
+            except Exception:
+                answered += 1
+                raise
+            answered += 1
+            return response
+        
+        try:
+            response = await self.resilience.call(attempt)
+        except CircuitOpenError:
+            token_budget.settle(client, reserved, (sent - answered) * reserved)
+            raise
+        except Exception as e:
+            token_budget.settle(client, reserved, (sent - answered) * reserved)
+            raise RuntimeError(f"LLM API failure: {e}")
+        except BaseException:
+            # Cancelled calls (client disconnects, wait_for timeouts) release their reservation too
+            token_budget.settle(client, reserved, (sent - answered) * reserved)
+            raise
+        
+        assistant_text = response.choices[0].message.content.strip()
+        reported = getattr(response, "usage", None)
+        usage = {
+            "client_id": client,
+            "task": task,
+            "model": getattr(response, "model", None) or decision["model"],
+            # Fall back to local estimates if the provider omits usage
+            "prompt_tokens": getattr(reported, "prompt_tokens", None) or decision["input_tokens"],
+            "completion_tokens": getattr(reported, "completion_tokens", None) or estimate_tokens(assistant_text),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+        }
+        # Losing hedges are cancelled only after this returns, so they still count as unanswered
+        abandoned = sent - answered
+        if abandoned:
+            # Abandoned duplicates sent the same prompt, so count them like the winner
+            usage["prompt_tokens"] *= abandoned + 1
+            usage["completion_tokens"] *= abandoned + 1
+        token_budget.settle(client, reserved, usage["prompt_tokens"] + usage["completion_tokens"])
+        return assistant_text, messages, usage
+    
+    @staticmethod
+    def _local_result(user_text: str, messages: List[Dict]) -> Dict:
+        """Answer an analysis from the local analyzer without calling the backend."""
+        assistant_text = local_analysis_response(user_text)
+        return {
+            "raw_response": assistant_text,
+            "messages": messages + [{"role": "assistant", "content": assistant_text}],
+            "usage": [],
+            "degraded": True,
+        }
     
     async def analyze_content(self, user_text: str, history: Optional[List[Dict]] = None) -> Dict:
-        """Analyze content using OpenAI API with structured output."""
+        """Analyze content using OpenAI API with structured output.
+        
+        Falls back to the local analyzer while the circuit breaker is open,
+        unless CIRCUIT_DEGRADE_TO_LOCAL is disabled, and when a token budget
+        is exhausted if BUDGET_EXHAUSTED_ACTION is "downgrade". With
+        PRECOMPRESS_ENABLED, inputs over PRECOMPRESS_TRIGGER_TOKENS are cut
+        down to their most central sentences before they are sent.
+        """
         system_prompt = """
         You are a precise AI content analyst. Always respond in the following exact structure:
 
@@ -35,27 +136,108 @@ class AIService:
         - The JSON block must contain only the structured metadata.
         """
         
+        compression = await self.precompress(user_text)
+        prompt_text = compression.pop("text") if compression else user_text
+        
         messages = [{"role": "system", "content": system_prompt}]
         if history:
             messages.extend(history)
-        messages.append({"role": "user", "content": user_text})
+        messages.append({"role": "user", "content": prompt_text})
         
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-            )
-            assistant_text = response.choices[0].message.content.strip()
-        except Exception as e:
-            raise RuntimeError(f"LLM API failure: {e}")
+            assistant_text, messages, usage = await self._complete("analyze", messages, self.temperature)
+        except CircuitOpenError:
+            if not settings.CIRCUIT_DEGRADE_TO_LOCAL:
+                raise
+            # Backend is unhealthy; answer from the local analyzer instead
+            return self._local_result(user_text, messages)
+        except BudgetExceededError:
+            if settings.BUDGET_EXHAUSTED_ACTION != "downgrade":
+                raise
+            return self._local_result(user_text, messages)
         
         return {
             "raw_response": assistant_text,
-            "messages": messages + [{"role": "assistant", "content": assistant_text}]
+            "messages": messages + [{"role": "assistant", "content": assistant_text}],
+            "usage": [usage],
+            "compression": compression,
         }
     
+    async def precompress(self, user_text: str) -> Optional[Dict]:
+        """Extractively compress a long input, or return None if it is sent unchanged."""
+        if not settings.PRECOMPRESS_ENABLED or estimate_tokens(user_text) <= settings.PRECOMPRESS_TRIGGER_TOKENS:
+            return None
+        compression = await cpu_executor.run(
+            compress_text, user_text, settings.PRECOMPRESS_RATIO, settings.PRECOMPRESS_MAX_TOKENS,
+            size=len(user_text),
+        )
+        self.precompression_stats["compressed"] += 1
+        self.precompression_stats["original_tokens"] += compression["original_tokens"]
+        self.precompression_stats["compressed_tokens"] += compression["compressed_tokens"]
+        return compression
+    
+    async def analyze_packed(self, texts: List[str]) -> List[Dict]:
+        """Analyze several short texts in one call and split the results per item.
+        
+        Raises ValueError if the packed response cannot be parsed, so callers
+        can fall back to single-item analysis.
+        """
+        system_prompt = """
+        You are a precise AI content analyst. You will receive several independent texts,
+        each prefixed with its index in square brackets, e.g. [0], [1].
+        Analyze each text on its own and respond with ONLY a JSON array, one object per text:
+
+        [
+          {
+            "index": 0,
+            "summary": "<1-2 concise sentences summarizing the text.>",
+            "title": "<title if available>",
+            "topics": ["topic1", "topic2", "topic3"],
+            "sentiment": "<positive/neutral/negative>",
+            "keywords": ["keyword1", "keyword2", "keyword3"]
+          }
+        ]
+
+        - Include exactly one object for every index you were given.
+        - Do not add any text outside the JSON array.
+        """
+        
+        user_text = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts))
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_text},
+        ]
+        
+        assistant_text, messages, usage = await self._complete(
+            "packed", messages, self.temperature, items=len(texts)
+        )
+        
+        try:
+            items = extract_json_array(assistant_text, len(texts))
+        except ValueError:
+            # The tokens were spent even though no analysis will be saved from them
+            await db_manager.record_usage([usage])
+            raise
+        shares = split_usage(usage, [estimate_tokens(text) for text in texts])
+        
+        results = []
+        for text, item, share in zip(texts, items, shares):
+            metadata = {
+                key: item[key] for key in ("title", "topics", "sentiment", "keywords")
+                if item.get(key) is not None
+            }
+            # Rebuild the single-item response shape so downstream parsing is shared
+            raw_response = f"Summary: {item.get('summary') or ''}\n\n{json.dumps(metadata)}"
+            # Packs mix texts from unrelated requests, so each row stores only its own
+            # text and its own slice of the reply, renumbered as a pack of one
+            transcript = [
+                messages[0],
+                {"role": "user", "content": f"[0] {text}"},
+                {"role": "assistant", "content": json.dumps([{**item, "index": 0}])},
+            ]
+            results.append({"raw_response": raw_response, "messages": transcript, "usage": [share]})
+        return results
+    
     async def rephrase_text(self, user_text: str, history: Optional[List[Dict]] = None) -> str:
         """Rephrase text using OpenAI API for academic writing."""
         system_prompt = """
@@ -79,16 +261,9 @@ class AIService:
             messages.extend(history)
         messages.append({"role": "user", "content": user_text})
         
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                max_tokens=400,
-                temperature=0.6,
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            raise RuntimeError(f"LLM API failure: {e}")
+        assistant_text, _, usage = await self._complete("rephrase", messages, 0.6)
+        await db_manager.record_usage([usage])
+        return assistant_text
 
 
 # Global AI service instance
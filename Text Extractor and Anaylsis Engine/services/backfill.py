@@ -0,0 +1,286 @@
+"""
+Throttled background re-analysis (backfill) of stored analyses.
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, List, Set
+from config.settings import settings
+from database.db_manager import db_manager
+from services.admission import admission_controller, QueueFullError, BULK, INTERACTIVE
+from services.ai_service import ai_service
+from services.executor import cpu_executor
+from services.resilience import CircuitOpenError
+from services.usage import BudgetExceededError, current_client
+from utils.file_lock import FileLock
+from utils.text_processing import local_confidence, postprocess_analysis
+
+
+# "local" re-runs parsing, keyword extraction and scoring on the stored
+# response; "llm" re-runs the full analysis on the stored content
+STAGES = ("local", "llm")
+# "in_place" rewrites each row; "version" saves a new row linked by parent_id
+WRITE_MODES = ("in_place", "version")
+
+
+class BackendUnavailableError(RuntimeError):
+    """Raised when the LLM backend answered with a degraded local result."""
+
+
+class JobLockedError(RuntimeError):
+    """Raised when a job is already running in another process."""
+
+
+class BackfillRunner:
+    """Re-runs analysis stages over stored rows selected by a predicate, at a bounded rate.
+
+    Rows are visited in global ID order up to the highest ID that existed
+    when the job was created, so rows a job saves itself are never
+    revisited. The checkpoint cursor is the highest ID below which every
+    row is finished, so a paused or interrupted job resumes where it left
+    off. LLM re-analysis runs in the bulk admission lane, billed to
+    BACKFILL_CLIENT_ID, and holds back while interactive work is queued.
+    A running job holds a file lock next to the database, so the API
+    server and CLI never run the same job twice or pause each other's jobs.
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stopping: Set[str] = set()
+    
+    async def create_job(self, stage: str, write: str, predicate: Dict, rate: float = None,
+                         job_id: str = None) -> Dict:
+        """Create a paused backfill job over the rows currently matching predicate."""
+        if stage not in STAGES:
+            raise ValueError(f"stage must be one of {', '.join(STAGES)}")
+        if write not in WRITE_MODES:
+            raise ValueError(f"write must be one of {', '.join(WRITE_MODES)}")
+        rate = rate or settings.BACKFILL_DEFAULT_RATE
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        
+        max_id = await db_manager.max_analysis_id()
+        job = {
+            "id": job_id or uuid.uuid4().hex[:12],
+            "spec": {"stage": stage, "write": write, "predicate": predicate, "rate": rate},
+            "status": "paused",
+            "cursor": 0,
+            "max_id": max_id,
+            "total": await db_manager.count_backfill_rows(predicate, max_id),
+            "processed": 0,
+            "updated": 0,
+            "failed": 0,
+            "last_error": None,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+        }
+        await db_manager.save_backfill_job(job)
+        return job
+    
+    def is_running(self, job_id: str) -> bool:
+        """Return True if the job is running in this process."""
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+    
+    @staticmethod
+    def _job_lock(job_id: str) -> FileLock:
+        """Return the lock a process holds while it runs a job."""
+        directory = os.path.splitext(db_manager.db_path)[0] + "_backfill"
+        return FileLock(os.path.join(directory, f"{job_id}.lock"))
+    
+    def is_running_elsewhere(self, job_id: str) -> bool:
+        """Return True if another process (the API server or a CLI run) is running the job."""
+        return not self.is_running(job_id) and self._job_lock(job_id).is_held_elsewhere()
+    
+    def start(self, job_id: str) -> None:
+        """Run a job in the background of the current event loop."""
+        if not self.is_running(job_id):
+            self._tasks[job_id] = asyncio.get_running_loop().create_task(self.run(job_id))
+    
+    async def pause(self, job_id: str) -> None:
+        """Stop starting rows and wait for the job's in-flight rows to finish."""
+        if self.is_running(job_id):
+            self._stopping.add(job_id)
+            await asyncio.wait([self._tasks[job_id]])
+    
+    async def recover(self) -> None:
+        """Mark jobs left running by a process that has exited as paused."""
+        for job in await db_manager.list_backfill_jobs():
+            if job["status"] == "running" and not self.is_running(job["id"]) \
+                    and not self.is_running_elsewhere(job["id"]):
+                job["status"] = "paused"
+                await db_manager.save_backfill_job(job)
+    
+    async def run(self, job_id: str) -> Dict:
+        """Run a job until it finishes or is paused, checkpointing as it goes.
+
+        Raises JobLockedError if another process is running the job.
+        """
+        lock = self._job_lock(job_id)
+        if not lock.acquire(blocking=False):
+            raise JobLockedError(f"Backfill job {job_id} is running in another process")
+        try:
+            return await self._run(job_id)
+        finally:
+            lock.release()
+    
+    async def _run(self, job_id: str) -> Dict:
+        """Run a job while holding its lock."""
+        job = await db_manager.get_backfill_job(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job["status"] == "done":
+            return job
+        self._stopping.discard(job_id)
+        job["status"] = "running"
+        await db_manager.save_backfill_job(job)
+        
+        spec = job["spec"]
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / spec["rate"]
+        next_start = loop.time()
+        semaphore = asyncio.Semaphore(settings.BACKFILL_CONCURRENCY)
+        in_flight: Set[asyncio.Task] = set()
+        started: List[int] = []
+        finished: Set[int] = set()
+        errors: List[Exception] = []
+        since_checkpoint = 0
+        
+        async def checkpoint() -> None:
+            # Advance the cursor over the finished prefix of the rows started so far
+            while started and started[0] in finished:
+                job["cursor"] = started.pop(0)
+                finished.discard(job["cursor"])
+            await db_manager.save_backfill_job(job)
+        
+        async def process(row: Dict) -> None:
+            nonlocal since_checkpoint
+            try:
+                if await self._process_row(job, row):
+                    finished.add(row["id"])
+                    since_checkpoint += 1
+            except Exception as e:
+                # Storage errors are not per-row problems; stop the job
+                job["last_error"] = f"analysis {row['id']}: {e}"
+                errors.append(e)
+                self._stopping.add(job_id)
+            finally:
+                semaphore.release()
+        
+        try:
+            while job_id not in self._stopping:
+                # Continue after the last row started, which may be ahead of the checkpoint
+                after = started[-1] if started else job["cursor"]
+                rows = await db_manager.select_backfill_rows(
+                    spec["predicate"], after, job["max_id"], settings.BACKFILL_PAGE_SIZE
+                )
+                if not rows:
+                    break
+                for row in rows:
+                    await asyncio.sleep(max(0.0, next_start - loop.time()))
+                    next_start = max(next_start, loop.time()) + interval
+                    await semaphore.acquire()
+                    if job_id in self._stopping:
+                        semaphore.release()
+                        break
+                    started.append(row["id"])
+                    task = loop.create_task(process(row))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    if since_checkpoint >= settings.BACKFILL_CHECKPOINT_ROWS:
+                        since_checkpoint = 0
+                        await checkpoint()
+            if in_flight:
+                await asyncio.wait(in_flight)
+        except asyncio.CancelledError:
+            for task in in_flight:
+                task.cancel()
+            job["status"] = "paused"
+            await asyncio.shield(checkpoint())
+            self._stopping.discard(job_id)
+            raise
+        
+        job["status"] = "failed" if errors else "paused" if job_id in self._stopping else "done"
+        self._stopping.discard(job_id)
+        await checkpoint()
+        return job
+    
+    async def _process_row(self, job: Dict, row: Dict) -> bool:
+        """Re-analyze and write one row; return False if the job stopped before it finished.
+
+        Shed or degraded LLM calls are retried after a delay rather than
+        written, so a backend outage never overwrites rows with local results.
+        Rows that fail to analyze are counted and skipped.
+        """
+        while job["id"] not in self._stopping:
+            try:
+                record = await self._reanalyze(job["spec"]["stage"], row)
+                if job["spec"]["write"] == "in_place":
+                    await db_manager.update_analysis(row["id"], record)
+                else:
+                    record["created_at"] = datetime.utcnow().isoformat() + "Z"
+                    record["version"] = (row.get("version") or 1) + 1
+                    record["parent_id"] = row["id"]
+                    await db_manager.save_analysis(record)
+            except (QueueFullError, BudgetExceededError) as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except (BackendUnavailableError, CircuitOpenError):
+                await asyncio.sleep(settings.BACKFILL_BACKOFF_SECONDS)
+                continue
+            except (RuntimeError, ValueError) as e:
+                job["failed"] += 1
+                job["processed"] += 1
+                job["last_error"] = f"analysis {row['id']}: {e}"
+                return True
+            job["updated"] += 1
+            job["processed"] += 1
+            return True
+        return False
+    
+    async def _reanalyze(self, stage: str, row: Dict) -> Dict:
+        """Build the new record for a stored row by re-running the given stage."""
+        text = row["content"] or ""
+        if stage == "llm":
+            while admission_controller.queued(INTERACTIVE):
+                await asyncio.sleep(settings.BACKFILL_BACKOFF_SECONDS)
+            token = current_client.set(settings.BACKFILL_CLIENT_ID)
+            try:
+                async with admission_controller.slot(BULK):
+                    model_result = await ai_service.analyze_content(text)
+            finally:
+                current_client.reset(token)
+            if model_result.get("degraded"):
+                raise BackendUnavailableError("The LLM backend is degraded")
+            prompt_version = settings.ANALYSIS_PROMPT_VERSION
+        else:
+            model_result = {"raw_response": row["raw_response"] or "", "messages": row["messages"], "usage": []}
+            prompt_version = row.get("prompt_version")
+        
+        raw_response = model_result["raw_response"]
+        metadata = await cpu_executor.run(
+            postprocess_analysis, text, raw_response, model_result["messages"], local_confidence(prompt_version),
+            size=2 * len(text) + len(raw_response),
+        )
+        return {
+            "title": metadata["title"],
+            "topics": metadata["topics"],
+            "sentiment": metadata["sentiment"],
+            "keywords": metadata["keywords"],
+            "tags": metadata["tags"],
+            "summary": metadata["summary"],
+            "content": text,
+            "raw_response": raw_response,
+            "messages": metadata["messages_json"],
+            "usage": model_result.get("usage", []),
+            "confidence": metadata["confidence"],
+            "prompt_version": prompt_version,
+        }
+    
+    def get_state(self) -> Dict:
+        """Return the IDs of jobs running in this process."""
+        return {"running": sorted(job_id for job_id in self._tasks if self.is_running(job_id))}
+
+
+# Global backfill runner instance
+backfill_runner = BackfillRunner()
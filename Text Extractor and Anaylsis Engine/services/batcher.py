@@ -0,0 +1,144 @@
+"""
+Adaptive micro-batching of concurrent analysis requests.
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from config.settings import settings
+from services.ai_service import ai_service
+from services.usage import current_client
+from utils.text_processing import estimate_tokens, plan_packs
+
+
+class AnalysisBatcher:
+    """Collects concurrent single-text analyses and dispatches them together.
+
+    The collection window adapts to load: arrivals are tracked as an
+    exponentially weighted inter-arrival gap, and when fewer than one other
+    request is expected within the max wait the request is dispatched
+    immediately, so solo latency is unaffected when traffic is low.
+    """
+    
+    def __init__(self, max_batch_size: int = None, max_wait_ms: float = None):
+        self.max_batch_size = max_batch_size or settings.MICRO_BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.MICRO_BATCH_MAX_WAIT_MS) / 1000.0
+        self._pending: List[Tuple[str, asyncio.Future, str]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._dispatches = set()
+        self._last_arrival: Optional[float] = None
+        self._avg_gap: Optional[float] = None
+        self.stats = {"requests": 0, "batches": 0, "packed_items": 0, "bypassed": 0}
+    
+    def current_window(self) -> float:
+        """Return the collection window in seconds for the observed arrival rate."""
+        if self._avg_gap is None or self._avg_gap <= 0:
+            return 0.0
+        expected_arrivals = self.max_wait / self._avg_gap
+        if expected_arrivals < 1:
+            return 0.0
+        return min(self.max_wait, (self.max_batch_size - 1) * self._avg_gap)
+    
+    def _observe_arrival(self, now: float) -> None:
+        """Update the smoothed inter-arrival gap."""
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            alpha = settings.MICRO_BATCH_SMOOTHING
+            self._avg_gap = gap if self._avg_gap is None else alpha * gap + (1 - alpha) * self._avg_gap
+        self._last_arrival = now
+    
+    async def submit(self, text: str) -> Dict:
+        """Queue a text for analysis and wait for its model result."""
+        self.stats["requests"] += 1
+        
+        # Long texts are never packed, so waiting would only add latency
+        if estimate_tokens(text) > settings.PACK_MAX_ITEM_TOKENS:
+            self.stats["bypassed"] += 1
+            return await ai_service.analyze_content(text)
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._observe_arrival(loop.time())
+        self._pending.append((text, future, current_client.get()))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            window = self.current_window()
+            if window <= 0:
+                self._flush()
+            else:
+                self._flush_handle = loop.call_later(window, self._flush)
+        
+        return await future
+    
+    def _flush(self) -> None:
+        """Dispatch everything collected so far."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future, str]]) -> None:
+        """Send a collected batch to the LLM backend and route results back.
+        
+        Texts are only packed with texts from the same client, so each
+        call's tokens are billed to the client that sent them.
+        """
+        self.stats["batches"] += 1
+        texts = [text for text, _, _ in batch]
+        by_client: Dict[str, List[int]] = {}
+        for index, (_, _, client) in enumerate(batch):
+            by_client.setdefault(client, []).append(index)
+        
+        packs, singles = [], []
+        for indices in by_client.values():
+            client_packs, client_singles = plan_packs([texts[i] for i in indices])
+            packs.extend([indices[i] for i in pack] for pack in client_packs)
+            singles.extend(indices[i] for i in client_singles)
+        
+        async def run_single(index: int):
+            future = batch[index][1]
+            current_client.set(batch[index][2])
+            try:
+                result = await ai_service.analyze_content(texts[index])
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(result)
+        
+        async def run_pack(indices: List[int]):
+            current_client.set(batch[indices[0]][2])
+            try:
+                results = await ai_service.analyze_packed([texts[i] for i in indices])
+            except (ValueError, RuntimeError):
+                await asyncio.gather(*(run_single(i) for i in indices))
+                return
+            self.stats["packed_items"] += len(indices)
+            for index, result in zip(indices, results):
+                future = batch[index][1]
+                if not future.done():
+                    future.set_result(result)
+        
+        tasks = [run_pack(indices) for indices in packs]
+        tasks.extend(run_single(index) for index in singles)
+        await asyncio.gather(*tasks)
+    
+    def get_state(self) -> Dict:
+        """Return batcher state for monitoring."""
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "window_ms": round(self.current_window() * 1000, 2),
+            "avg_gap_ms": round(self._avg_gap * 1000, 2) if self._avg_gap is not None else None,
+        }
+
+
+# Global analysis batcher instance
+analysis_batcher = AnalysisBatcher()
@@ -0,0 +1,333 @@
+"""
+Local sentiment/topic classifier distilled from stored LLM analyses.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SENTIMENTS = ("positive", "neutral", "negative")
+
+
+def hashed_features(text: str, buckets: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (bucket indices, weights) of hashed unigrams and bigrams.
+
+    Only the first CLASSIFIER_MAX_CHARS characters are used. Weights are
+    sublinear term counts, L2-normalised so long and short texts score alike.
+    """
+    buckets = buckets or settings.CLASSIFIER_HASH_BUCKETS
+    tokens = TOKEN_PATTERN.findall(text[:settings.CLASSIFIER_MAX_CHARS].lower())
+    counts: Dict[int, int] = {}
+    for feature in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+        bucket = zlib.crc32(feature.encode("utf-8")) % buckets
+        counts[bucket] = counts.get(bucket, 0) + 1
+    
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    norm = np.linalg.norm(values)
+    return indices, values / norm if norm > 0 else values
+
+
+def normalise_topics(topics) -> List[str]:
+    """Lower-case, strip and de-duplicate topic labels."""
+    return sorted({str(topic).strip().lower() for topic in topics or [] if str(topic).strip()})
+
+
+def is_holdout(analysis_id: int) -> bool:
+    """Deterministically assign a row to the evaluation split by hashing its ID."""
+    return zlib.crc32(str(analysis_id).encode()) % 1000 < settings.CLASSIFIER_HOLDOUT * 1000
+
+
+class _Batch:
+    """Rows of sparse features flattened into one (row, column, value) list."""
+    
+    def __init__(self, features: List[Tuple[np.ndarray, np.ndarray]]):
+        lengths = [len(indices) for indices, _ in features]
+        self.size = len(features)
+        self.rows = np.repeat(np.arange(self.size), lengths)
+        self.cols = np.concatenate([indices for indices, _ in features]) if features else np.zeros(0, np.int64)
+        self.values = np.concatenate([values for _, values in features]) if features else np.zeros(0, np.float32)
+    
+    def logits(self, weights: np.ndarray, bias: np.ndarray) -> np.ndarray:
+        """Return X @ weights + bias without building X."""
+        out = np.zeros((self.size, weights.shape[1]), dtype=np.float32)
+        np.add.at(out, self.rows, self.values[:, None] * weights[self.cols])
+        return out + bias
+    
+    def gradient(self, errors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (touched columns, X.T @ errors restricted to them)."""
+        order = np.argsort(self.cols, kind="stable")
+        cols = self.cols[order]
+        touched, starts = np.unique(cols, return_index=True)
+        contributions = self.values[order, None] * errors[self.rows[order]]
+        return touched, np.add.reduceat(contributions, starts, axis=0)
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Row-wise softmax."""
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def sigmoid(logits: np.ndarray) -> np.ndarray:
+    """Elementwise logistic function, clipped against overflow."""
+    return 1.0 / (1.0 + np.exp(-np.clip(logits, -30, 30)))
+
+
+def train_classifier(rows: List[Dict]) -> Dict:
+    """Fit the classifier on labelled rows (id, content, sentiment, topics) and evaluate it.
+
+    Sentiment is a softmax over SENTIMENTS; each of the CLASSIFIER_MAX_TOPICS
+    most frequent topics (with at least CLASSIFIER_MIN_TOPIC_SUPPORT rows)
+    is an independent logistic output. Both share one weight matrix over
+    the hashed features and are trained with mini-batch AdaGrad, which
+    suits the sparse, skewed feature counts. Rows picked by is_holdout are
+    kept out of training and used for the agreement report.
+    """
+    topic_counts: Dict[str, int] = {}
+    for row in rows:
+        for topic in normalise_topics(row["topics"]):
+            topic_counts[topic] = topic_counts.get(topic, 0) + 1
+    topics = [
+        topic for topic, count in sorted(topic_counts.items(), key=lambda item: (-item[1], item[0]))
+        if count >= settings.CLASSIFIER_MIN_TOPIC_SUPPORT
+    ][:settings.CLASSIFIER_MAX_TOPICS]
+    topic_index = {topic: i for i, topic in enumerate(topics)}
+    
+    n_sentiments, n_outputs = len(SENTIMENTS), len(SENTIMENTS) + len(topics)
+    features = []
+    targets = np.zeros((len(rows), n_outputs), dtype=np.float32)
+    sentiment_mask = np.zeros(len(rows), dtype=bool)
+    for i, row in enumerate(rows):
+        features.append(hashed_features(row["content"] or ""))
+        sentiment = (row["sentiment"] or "").strip().lower()
+        if sentiment in SENTIMENTS:
+            targets[i, SENTIMENTS.index(sentiment)] = 1.0
+            sentiment_mask[i] = True
+        for topic in normalise_topics(row["topics"]):
+            if topic in topic_index:
+                targets[i, n_sentiments + topic_index[topic]] = 1.0
+    
+    holdout = np.array([is_holdout(row["id"]) for row in rows], dtype=bool)
+    train = np.flatnonzero(~holdout)
+    buckets = settings.CLASSIFIER_HASH_BUCKETS
+    weights = np.zeros((buckets, n_outputs), dtype=np.float32)
+    bias = np.zeros(n_outputs, dtype=np.float32)
+    squared = np.full((buckets, n_outputs), 1e-8, dtype=np.float32)
+    bias_squared = np.full(n_outputs, 1e-8, dtype=np.float32)
+    rate, batch_size = settings.CLASSIFIER_LEARNING_RATE, settings.CLASSIFIER_BATCH_SIZE
+    rng = np.random.default_rng(settings.VECTOR_SEED)
+    
+    for _ in range(settings.CLASSIFIER_EPOCHS):
+        rng.shuffle(train)
+        for start in range(0, len(train), batch_size):
+            members = train[start:start + batch_size]
+            batch = _Batch([features[i] for i in members])
+            logits = batch.logits(weights, bias)
+            errors = np.empty_like(logits)
+            errors[:, :n_sentiments] = softmax(logits[:, :n_sentiments]) - targets[members, :n_sentiments]
+            # Rows without a usable sentiment label only train the topic outputs
+            errors[~sentiment_mask[members], :n_sentiments] = 0.0
+            errors[:, n_sentiments:] = sigmoid(logits[:, n_sentiments:]) - targets[members, n_sentiments:]
+            errors /= len(members)
+            
+            touched, gradient = batch.gradient(errors)
+            gradient += settings.CLASSIFIER_L2 * weights[touched]
+            squared[touched] += gradient ** 2
+            weights[touched] -= rate * gradient / np.sqrt(squared[touched])
+            bias_gradient = errors.sum(axis=0)
+            bias_squared += bias_gradient ** 2
+            bias -= rate * bias_gradient / np.sqrt(bias_squared)
+    
+    model = {
+        "weights": weights,
+        "bias": bias,
+        "topics": topics,
+        "meta": {
+            "trained_at": datetime.utcnow().isoformat() + "Z",
+            "buckets": buckets,
+            "train_rows": int(len(train)),
+            "holdout_rows": int(holdout.sum()),
+        },
+    }
+    model["meta"]["report"] = evaluate_classifier(
+        model, [features[i] for i in np.flatnonzero(holdout)], targets[holdout], sentiment_mask[holdout]
+    )
+    return model
+
+
+def evaluate_classifier(model: Dict, features: List[Tuple[np.ndarray, np.ndarray]], targets: np.ndarray,
+                        sentiment_mask: np.ndarray) -> Dict:
+    """Report agreement between the classifier and the LLM labels on held-out rows."""
+    threshold = settings.CLASSIFIER_THRESHOLD
+    n_sentiments = len(SENTIMENTS)
+    if not features:
+        return {"rows": 0, "threshold": threshold}
+    
+    logits = _Batch(features).logits(model["weights"], model["bias"])
+    sentiment_probs = softmax(logits[:, :n_sentiments])
+    topic_probs = sigmoid(logits[:, n_sentiments:])
+    predicted = sentiment_probs.argmax(axis=1)
+    actual = targets[:, :n_sentiments].argmax(axis=1)
+    agree = (predicted == actual) & sentiment_mask
+    
+    per_class = {}
+    for i, label in enumerate(SENTIMENTS):
+        tp = int((agree & (actual == i)).sum())
+        predicted_count = int(((predicted == i) & sentiment_mask).sum())
+        support = int(((actual == i) & sentiment_mask).sum())
+        per_class[label] = {
+            "precision": round(tp / predicted_count, 4) if predicted_count else None,
+            "recall": round(tp / support, 4) if support else None,
+            "support": support,
+        }
+    
+    topic_targets = targets[:, n_sentiments:].astype(bool)
+    topic_hits = topic_probs >= threshold
+    true_positives = int((topic_hits & topic_targets).sum())
+    
+    # Rows /analyze would answer locally, and how well those answers agree with the LLM
+    confident = (sentiment_probs.max(axis=1) >= threshold) & topic_hits.any(axis=1) & sentiment_mask
+    local_topic_hits = topic_hits[confident]
+    
+    def ratio(numerator, denominator) -> Optional[float]:
+        return round(float(numerator) / float(denominator), 4) if denominator else None
+    
+    return {
+        "rows": len(features),
+        "threshold": threshold,
+        "sentiment": {
+            "agreement": ratio(agree.sum(), sentiment_mask.sum()),
+            "per_class": per_class,
+            "coverage_at_threshold": ratio(((sentiment_probs.max(axis=1) >= threshold) & sentiment_mask).sum(),
+                                           sentiment_mask.sum()),
+            "agreement_at_threshold": ratio((agree & (sentiment_probs.max(axis=1) >= threshold)).sum(),
+                                            ((sentiment_probs.max(axis=1) >= threshold) & sentiment_mask).sum()),
+        },
+        "topics": {
+            "labels": len(model["topics"]),
+            "precision_at_threshold": ratio(true_positives, topic_hits.sum()),
+            "recall_at_threshold": ratio(true_positives, topic_targets.sum()),
+        },
+        "local_answers": {
+            "coverage": ratio(confident.sum(), len(features)),
+            "sentiment_agreement": ratio(agree[confident].sum(), confident.sum()),
+            "topic_precision": ratio((local_topic_hits & topic_targets[confident]).sum(), local_topic_hits.sum()),
+        },
+    }
+
+
+class LocalClassifier:
+    """Serves a trained classifier artifact, reloading it when the file changes.
+
+    The artifact is an .npz file with the weight matrix, biases, topic
+    labels and a JSON metadata blob holding the evaluation report.
+    """
+    
+    def __init__(self, path: str = None):
+        self.path = path or settings.CLASSIFIER_PATH or os.path.splitext(settings.DB_PATH)[0] + ".classifier.npz"
+        self.model: Optional[Dict] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"predictions": 0, "confident": 0, "reloads": 0}
+    
+    def save(self, model: Dict) -> None:
+        """Write a trained model to the artifact path atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            weights=model["weights"],
+            bias=model["bias"],
+            topics=np.array(model["topics"], dtype=str),
+            meta=np.array(json.dumps(model["meta"])),
+        )
+        os.replace(tmp_path, self.path)
+    
+    def refresh(self) -> bool:
+        """Load the artifact if it changed on disk, checking at most every CLASSIFIER_RELOAD_SECONDS."""
+        now = time.monotonic()
+        if self.model is not None and now - self._checked_at < settings.CLASSIFIER_RELOAD_SECONDS:
+            return True
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return self.model is not None
+            if mtime == self._mtime:
+                return True
+            try:
+                with np.load(self.path) as artifact:
+                    model = {
+                        "weights": artifact["weights"],
+                        "bias": artifact["bias"],
+                        "topics": [str(topic) for topic in artifact["topics"]],
+                        "meta": json.loads(str(artifact["meta"])),
+                    }
+            except (OSError, ValueError, KeyError):
+                # Keep serving the previous model if the new file is unreadable
+                return self.model is not None
+            self.model, self._mtime = model, mtime
+            self.stats["reloads"] += 1
+            return True
+    
+    def predict(self, text: str) -> Optional[Dict]:
+        """Return sentiment and topic probabilities for text, or None if no model is trained."""
+        if not self.refresh():
+            return None
+        model = self.model
+        indices, values = hashed_features(text, model["meta"]["buckets"])
+        logits = values @ model["weights"][indices] + model["bias"]
+        sentiment_probs = softmax(logits[:len(SENTIMENTS)])
+        topic_probs = sigmoid(logits[len(SENTIMENTS):])
+        best = int(sentiment_probs.argmax())
+        ranked = np.argsort(-topic_probs)[:settings.CLASSIFIER_MAX_PREDICTED_TOPICS]
+        self.stats["predictions"] += 1
+        return {
+            "sentiment": SENTIMENTS[best],
+            "sentiment_probability": float(sentiment_probs[best]),
+            "topics": [(model["topics"][i], float(topic_probs[i])) for i in ranked],
+        }
+    
+    def confident_labels(self, text: str) -> Optional[Dict]:
+        """Return the sentiment and topics to use for text if the model clears CLASSIFIER_THRESHOLD.
+
+        Both the sentiment and at least one topic must clear the threshold;
+        otherwise None is returned and the text should go to the LLM.
+        """
+        prediction = self.predict(text)
+        if prediction is None or prediction["sentiment_probability"] < settings.CLASSIFIER_THRESHOLD:
+            return None
+        topics = [topic for topic, probability in prediction["topics"] if probability >= settings.CLASSIFIER_THRESHOLD]
+        if not topics:
+            return None
+        self.stats["confident"] += 1
+        return {"sentiment": prediction["sentiment"], "topics": topics}
+    
+    def get_state(self) -> Dict:
+        """Return the loaded model's metadata, evaluation report and usage counters."""
+        self.refresh()
+        if self.model is None:
+            return {"loaded": False, "path": self.path, **self.stats}
+        return {
+            "loaded": True,
+            "path": self.path,
+            "topics": len(self.model["topics"]),
+            **self.model["meta"],
+            **self.stats,
+        }
+
+
+# Global local classifier instance
+local_classifier = LocalClassifier()
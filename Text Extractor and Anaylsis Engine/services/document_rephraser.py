@@ -0,0 +1,76 @@
+"""
+Paragraph-level rephrasing of whole documents with a per-paragraph cache.
+"""
+import asyncio
+import hashlib
+import re
+from typing import Dict, List
+from config.settings import settings
+from database.db_manager import db_manager
+from services.ai_service import ai_service
+
+
+PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Split text into alternating paragraph / separator pieces.
+
+    Even positions hold paragraphs and odd positions the blank-line runs
+    between them, so "".join(pieces) == text.
+    """
+    return PARAGRAPH_BREAK.split(text)
+
+
+def paragraph_hash(paragraph: str) -> str:
+    """Cache key for a paragraph: its normalised content plus the prompt version."""
+    normalised = " ".join(paragraph.split())
+    key = f"{settings.REPHRASE_PROMPT_VERSION}\n{normalised}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+async def rephrase_document(text: str) -> Dict:
+    """Rephrase a document paragraph by paragraph, reusing cached paragraphs.
+
+    Uncached paragraphs are rephrased concurrently (bounded by
+    REPHRASE_CONCURRENCY) and stored in the cache; a paragraph that fails is
+    kept as written and its index is reported under "failed".
+    """
+    pieces = split_paragraphs(text)
+    indices = [i for i in range(0, len(pieces), 2) if pieces[i].strip()]
+    hashes = {i: paragraph_hash(pieces[i]) for i in indices}
+    
+    cached = await db_manager.get_cached_rephrasings(list(set(hashes.values())))
+    pending: Dict[str, List[int]] = {}
+    for i in indices:
+        if hashes[i] not in cached:
+            pending.setdefault(hashes[i], []).append(i)
+    
+    semaphore = asyncio.Semaphore(settings.REPHRASE_CONCURRENCY)
+    failed: List[int] = []
+    
+    async def rephrase_paragraph(key: str, positions: List[int]) -> None:
+        async with semaphore:
+            try:
+                rephrased = await ai_service.rephrase_text(pieces[positions[0]].strip())
+            except (RuntimeError, ValueError):
+                failed.extend(positions)
+                return
+        cached[key] = rephrased
+        await db_manager.save_rephrasing(key, rephrased)
+    
+    await asyncio.gather(*(rephrase_paragraph(key, positions) for key, positions in pending.items()))
+    
+    output = list(pieces)
+    for i in indices:
+        if hashes[i] in cached:
+            output[i] = cached[hashes[i]]
+    
+    paragraph_order = {i: n for n, i in enumerate(indices)}
+    return {
+        "text": "".join(output),
+        "paragraphs": len(indices),
+        "rephrased": sum(len(positions) for positions in pending.values()) - len(failed),
+        "cached": len(indices) - sum(len(positions) for positions in pending.values()),
+        "failed": sorted(paragraph_order[i] for i in failed),
+    }
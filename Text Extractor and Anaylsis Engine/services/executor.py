@@ -0,0 +1,143 @@
+"""
+Executor layer for CPU-bound work, and an event-loop lag monitor.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config.settings import settings
+
+
+class CPUExecutor:
+    """Runs CPU-bound functions off the event loop, picking a pool by input size.
+
+    Inputs under EXECUTOR_INLINE_MAX_CHARS run inline, where a thread hop
+    would cost more than the work. Larger inputs go to a thread pool, which
+    lets the loop's thread interleave with the work between GIL switches.
+    Inputs of EXECUTOR_PROCESS_THRESHOLD_CHARS or more go to a process
+    pool so they run in parallel without holding the loop's GIL. Functions
+    sent to the process pool must be picklable module-level functions.
+    """
+    
+    def __init__(self):
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self.stats = {"inline": 0, "thread": 0, "process": 0}
+    
+    def thread_pool(self) -> ThreadPoolExecutor:
+        """Return the shared thread pool, creating it on first use."""
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=settings.EXECUTOR_THREAD_WORKERS, thread_name_prefix="cpu"
+            )
+        return self._threads
+    
+    def process_pool(self) -> ProcessPoolExecutor:
+        """Return the shared process pool, creating it on first use."""
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=settings.EXECUTOR_PROCESS_WORKERS)
+        return self._processes
+    
+    async def run(self, fn: Callable, *args, size: int = 0) -> Any:
+        """Run fn(*args) inline, in a thread or in a process depending on the input size."""
+        if size < settings.EXECUTOR_INLINE_MAX_CHARS:
+            self.stats["inline"] += 1
+            return fn(*args)
+        if size < settings.EXECUTOR_PROCESS_THRESHOLD_CHARS:
+            self.stats["thread"] += 1
+            return await asyncio.get_running_loop().run_in_executor(self.thread_pool(), fn, *args)
+        return await self.run_process(fn, *args)
+    
+    async def run_process(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in the process pool."""
+        self.stats["process"] += 1
+        return await asyncio.get_running_loop().run_in_executor(self.process_pool(), fn, *args)
+    
+    def shutdown(self) -> None:
+        """Release pool workers without waiting for queued work."""
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+    
+    def get_state(self) -> Dict:
+        """Return pool configuration and how often each path was taken."""
+        return {
+            "inline_max_chars": settings.EXECUTOR_INLINE_MAX_CHARS,
+            "process_threshold_chars": settings.EXECUTOR_PROCESS_THRESHOLD_CHARS,
+            "thread_workers": settings.EXECUTOR_THREAD_WORKERS,
+            "process_workers": settings.EXECUTOR_PROCESS_WORKERS,
+            **self.stats,
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a periodic timer.
+
+    A timer that fires later than scheduled means something held the loop
+    for that long; lags over LOOP_LAG_STALL_MS are counted as stalls and
+    added to the total blocked time.
+    """
+    
+    def __init__(self, interval_ms: float = None):
+        self.interval = (interval_ms or settings.LOOP_LAG_INTERVAL_MS) / 1000.0
+        self.lags = deque(maxlen=settings.LOOP_LAG_WINDOW)
+        self.max_lag = 0.0
+        self.blocked_seconds = 0.0
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start sampling on the running loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        stall = settings.LOOP_LAG_STALL_MS / 1000.0
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= stall:
+                self.stalls += 1
+                self.blocked_seconds += lag
+    
+    def get_state(self) -> Dict:
+        """Return recent and cumulative loop lag."""
+        ordered = sorted(self.lags)
+        
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+        
+        return {
+            "running": self._task is not None,
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": len(ordered),
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.stalls,
+            "blocked_ms": round(self.blocked_seconds * 1000, 2),
+        }
+
+
+# Global executor and loop lag monitor instances
+cpu_executor = CPUExecutor()
+loop_lag_monitor = LoopLagMonitor()
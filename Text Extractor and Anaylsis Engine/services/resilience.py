@@ -0,0 +1,235 @@
+"""
+Resilience primitives for LLM calls: retries, hedged requests and a circuit breaker.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config.settings import settings
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker rejects a call without trying the backend."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Decide whether an error is transient and worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    # Connection-level client errors carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Read the server's requested retry delay in seconds, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        except ValueError:
+            pass
+    
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open circuit breaker."""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = None, recovery_seconds: float = None):
+        self.failure_threshold = failure_threshold or settings.CIRCUIT_FAILURE_THRESHOLD
+        self.recovery_seconds = recovery_seconds if recovery_seconds is not None else settings.CIRCUIT_RECOVERY_SECONDS
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0, "failures": 0, "successes": 0}
+    
+    def allow_request(self) -> bool:
+        """Return True if a call may go to the backend right now."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_seconds:
+                self.stats["rejected"] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        
+        if self.state == self.HALF_OPEN:
+            # Let a single probe through to test the backend
+            if self.probe_in_flight:
+                self.stats["rejected"] += 1
+                return False
+            self.probe_in_flight = True
+        return True
+    
+    def record_success(self) -> None:
+        """Record a healthy backend response."""
+        self.stats["successes"] += 1
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self.state = self.CLOSED
+        self.opened_at = None
+    
+    def release_probe(self) -> None:
+        """Free the half-open probe slot of a call that ended without a verdict, e.g. when cancelled."""
+        self.probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        """Record a backend failure and open the circuit when over threshold."""
+        self.stats["failures"] += 1
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.stats["opened"] += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def get_state(self) -> Dict:
+        """Return breaker state for monitoring."""
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = round(max(0.0, self.recovery_seconds - (time.monotonic() - self.opened_at)), 2)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in_seconds": retry_in,
+            **self.stats,
+        }
+
+
+class ResilientCaller:
+    """Runs backend calls with per-attempt timeouts, jittered retries and optional hedging."""
+    
+    def __init__(self, breaker: CircuitBreaker = None):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = settings.LLM_MAX_RETRIES
+        self.base_delay = settings.LLM_RETRY_BASE_DELAY
+        self.max_delay = settings.LLM_RETRY_MAX_DELAY
+        self.attempt_timeout = settings.LLM_ATTEMPT_TIMEOUT
+        self.hedge_enabled = settings.LLM_HEDGE_ENABLED
+        self.latencies = deque(maxlen=settings.LLM_LATENCY_WINDOW)
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0}
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Return the p95-based delay before a hedged attempt, or None if hedging is off."""
+        if not self.hedge_enabled or len(self.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(settings.LLM_HEDGE_PERCENTILE * (len(ordered) - 1))]
+    
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Return the wait before the next retry, honouring Retry-After when present."""
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, settings.LLM_RETRY_AFTER_MAX)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Call factory() until it succeeds, retries are exhausted or the circuit opens."""
+        self.stats["calls"] += 1
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("LLM backend circuit is open; failing fast")
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await self._attempt(factory)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The backend answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                await asyncio.sleep(delay)
+                if not self.breaker.allow_request():
+                    raise CircuitOpenError("LLM backend circuit opened while retrying") from e
+                self.stats["retries"] += 1
+                continue
+            except BaseException:
+                # Cancelled (client disconnect, shutdown): no verdict on the backend, but a
+                # half-open probe must not keep its slot or every later call is rejected
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return result
+    
+    async def _timed(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a single attempt under the per-attempt timeout and record its latency."""
+        self.stats["attempts"] += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(factory(), self.attempt_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        self.latencies.append(time.monotonic() - started)
+        return result
+    
+    async def _attempt(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run one attempt, launching a hedged duplicate if the first is slow."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(factory)
+        
+        primary = asyncio.ensure_future(self._timed(factory))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.stats["hedges"] += 1
+                pending.add(asyncio.ensure_future(self._timed(factory)))
+            
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def get_state(self) -> Dict:
+        """Return retry, hedging and circuit breaker state for monitoring."""
+        hedge_delay = self.hedge_delay()
+        return {
+            "circuit": self.breaker.get_state(),
+            "hedge_delay_ms": round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+            "latency_samples": len(self.latencies),
+            **self.stats,
+        }
@@ -0,0 +1,84 @@
+"""
+Length- and task-based model routing for LLM calls.
+"""
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+from config.settings import settings
+from utils.text_processing import estimate_tokens
+
+
+class ContextLimitError(ValueError):
+    """Raised when an input cannot fit the context window of any model tier."""
+
+
+class ModelRouter:
+    """Chooses a model tier and output budget per call before it is sent."""
+    
+    def __init__(self, tiers: List[Dict] = None):
+        self.tiers = tiers or settings.MODEL_TIERS
+        self.recent = deque(maxlen=settings.ROUTER_DECISION_LOG_SIZE)
+        self.counts: Dict[str, int] = {}
+    
+    def estimate_output_tokens(self, task: str, input_tokens: int, items: int = 1) -> int:
+        """Estimate how many completion tokens a task needs."""
+        if task == "analyze":
+            return min(settings.ROUTER_ANALYZE_OUTPUT_TOKENS, settings.MAX_TOKENS)
+        if task == "packed":
+            return settings.PACK_OUTPUT_TOKENS_PER_ITEM * items
+        # Rephrasing produces roughly as much text as it receives
+        return max(settings.ROUTER_MIN_OUTPUT_TOKENS, int(input_tokens * settings.ROUTER_REPHRASE_OUTPUT_RATIO))
+    
+    def route(self, task: str, messages: List[Dict], items: int = 1) -> Tuple[Dict, List[Dict]]:
+        """Pick a tier for the call and return (decision, messages).
+
+        Inputs over the largest context window are rejected with
+        ContextLimitError, or truncated to fit when ROUTER_OVERFLOW is
+        "truncate"; the returned messages reflect any truncation.
+        """
+        input_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        user_tokens = estimate_tokens(messages[-1]["content"])
+        output_tokens = self.estimate_output_tokens(task, user_tokens, items)
+        
+        candidates = [t for t in self.tiers if task in t.get("tasks", [task])]
+        if not candidates:
+            raise ValueError(f"No model tier configured for task '{task}'")
+        
+        tier = next((t for t in candidates if input_tokens <= t["max_input_tokens"]), candidates[-1])
+        max_tokens = min(output_tokens, tier["max_output_tokens"])
+        truncated_tokens = 0
+        
+        overflow = input_tokens + max_tokens - tier["context_limit"]
+        if overflow > 0:
+            if settings.ROUTER_OVERFLOW != "truncate" or overflow >= user_tokens:
+                self.counts["rejected"] = self.counts.get("rejected", 0) + 1
+                raise ContextLimitError(
+                    f"Input of ~{input_tokens} tokens exceeds the {tier['context_limit']}-token "
+                    f"context limit of {tier['name']}"
+                )
+            # Keep the head of the user text; ~4 characters per token
+            user_text = messages[-1]["content"]
+            keep_chars = max(0, len(user_text) - overflow * 4)
+            messages = messages[:-1] + [{**messages[-1], "content": user_text[:keep_chars]}]
+            truncated_tokens = overflow
+            input_tokens -= overflow
+        
+        decision = {
+            "task": task,
+            "model": tier["name"],
+            "input_tokens": input_tokens,
+            "max_tokens": max_tokens,
+            "truncated_tokens": truncated_tokens,
+            "timestamp": time.time(),
+        }
+        self.recent.append(decision)
+        self.counts[tier["name"]] = self.counts.get(tier["name"], 0) + 1
+        return decision, messages
+    
+    def get_state(self) -> Dict:
+        """Return routing counters and recent decisions for tuning."""
+        return {
+            "tiers": [t["name"] for t in self.tiers],
+            "counts": dict(self.counts),
+            "recent": list(self.recent),
+        }
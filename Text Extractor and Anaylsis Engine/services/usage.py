@@ -0,0 +1,138 @@
+"""
+Token usage accounting and per-client / global token budgets.
+"""
+import math
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from config.settings import settings
+
+
+# Client the current request is billed to; set per request by the API middleware
+current_client: ContextVar[str] = ContextVar("current_client", default=settings.USAGE_DEFAULT_CLIENT)
+
+BUDGET_WINDOWS = {"minute": 60, "day": 86400}
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when a call would exceed a token budget; carries a suggested retry delay."""
+    
+    def __init__(self, scope: str, window: str, retry_after: int):
+        super().__init__(f"The {scope} token budget per {window} is exhausted; retry in {retry_after} seconds")
+        self.scope = scope
+        self.window = window
+        self.retry_after = retry_after
+
+
+def split_usage(usage: Dict, weights: List[int]) -> List[Dict]:
+    """Split one call's usage into per-item shares proportional to weights.
+
+    Uses largest-remainder rounding so the shares add up to the call's totals.
+    """
+    if not sum(weights):
+        weights = [1] * len(weights)
+    total_weight = sum(weights)
+    shares = [dict(usage) for _ in weights]
+    for field in ("prompt_tokens", "completion_tokens"):
+        exact = [usage[field] * w / total_weight for w in weights]
+        counts = [int(x) for x in exact]
+        leftover = usage[field] - sum(counts)
+        for i in sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)[:leftover]:
+            counts[i] += 1
+        for share, count in zip(shares, counts):
+            share[field] = count
+    return shares
+
+
+class TokenBudget:
+    """Fixed-window token budgets per minute and per UTC day, globally and per client.
+
+    Calls reserve their estimated tokens before they are sent and settle
+    the difference once the provider reports actual usage, so concurrent
+    calls cannot all slip under a nearly spent budget. Counters of past
+    windows are pruned every minute, so memory follows the clients seen
+    in the current day rather than every client ever seen.
+    """
+    
+    def __init__(self):
+        self._used: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        self._pruned_at = 0.0
+        self.stats = {"reserved": 0, "rejected": 0}
+    
+    def _limits(self, client: str) -> List[Tuple[str, str, Optional[int]]]:
+        """Return (key, window, limit) for every budget that applies to a client."""
+        overrides = settings.BUDGET_CLIENT_OVERRIDES.get(client, {})
+        return [
+            ("global", "minute", settings.BUDGET_GLOBAL_TOKENS_PER_MINUTE),
+            ("global", "day", settings.BUDGET_GLOBAL_TOKENS_PER_DAY),
+            (f"client:{client}", "minute", overrides.get("per_minute", settings.BUDGET_CLIENT_TOKENS_PER_MINUTE)),
+            (f"client:{client}", "day", overrides.get("per_day", settings.BUDGET_CLIENT_TOKENS_PER_DAY)),
+        ]
+    
+    def _used_in(self, key: str, window: str, now: float) -> int:
+        """Return tokens used by key in the window containing now."""
+        window_id = int(now // BUDGET_WINDOWS[window])
+        started, used = self._used.get((key, window), (window_id, 0))
+        return used if started == window_id else 0
+    
+    def _add(self, key: str, window: str, now: float, tokens: int) -> None:
+        """Add (or with a negative count, return) tokens to key's current window."""
+        window_id = int(now // BUDGET_WINDOWS[window])
+        used = self._used_in(key, window, now)
+        self._used[(key, window)] = (window_id, max(0, used + tokens))
+    
+    def _prune(self, now: float) -> None:
+        """Drop counters whose window has ended, at most once per minute."""
+        if now - self._pruned_at < BUDGET_WINDOWS["minute"]:
+            return
+        self._pruned_at = now
+        current = {window: int(now // seconds) for window, seconds in BUDGET_WINDOWS.items()}
+        for (key, window), (started, _) in list(self._used.items()):
+            if started != current[window]:
+                del self._used[(key, window)]
+    
+    def reserve(self, client: str, tokens: int) -> None:
+        """Reserve tokens for a call, or raise BudgetExceededError if any budget would be exceeded."""
+        now = time.time()
+        self._prune(now)
+        for key, window, limit in self._limits(client):
+            if limit is not None and self._used_in(key, window, now) + tokens > limit:
+                self.stats["rejected"] += 1
+                seconds = BUDGET_WINDOWS[window]
+                retry_after = max(1, math.ceil(seconds - now % seconds))
+                raise BudgetExceededError("global" if key == "global" else "client", window, retry_after)
+        for key, window, _ in self._limits(client):
+            self._add(key, window, now, tokens)
+        self.stats["reserved"] += 1
+    
+    def settle(self, client: str, reserved: int, actual: int) -> None:
+        """Replace a reservation with the tokens the call actually used."""
+        now = time.time()
+        for key, window, _ in self._limits(client):
+            self._add(key, window, now, actual - reserved)
+    
+    def seed_day(self, totals: Dict[str, int]) -> None:
+        """Load today's per-client token totals, e.g. from the usage ledger at startup."""
+        now = time.time()
+        for client, tokens in totals.items():
+            self._add(f"client:{client}", "day", now, tokens)
+            self._add("global", "day", now, tokens)
+    
+    def get_state(self) -> Dict:
+        """Return current usage against each budget for monitoring."""
+        now = time.time()
+        budgets = {}
+        for key, window in sorted(self._used):
+            client = key.split(":", 1)[1] if key.startswith("client:") else settings.USAGE_DEFAULT_CLIENT
+            limit = {(k, w): l for k, w, l in self._limits(client)}[(key, window)]
+            used = self._used_in(key, window, now)
+            budgets.setdefault(key, {})[window] = {
+                "used": used,
+                "limit": limit,
+                "remaining": None if limit is None else max(0, limit - used),
+            }
+        return {"exhausted_action": settings.BUDGET_EXHAUSTED_ACTION, **self.stats, "budgets": budgets}
+
+
+# Global token budget instance
+token_budget = TokenBudget()
@@ -0,0 +1,22 @@
+"""
+Shared fixtures for the test suite.
+"""
+import asyncio
+import pytest
+from config.settings import settings
+from database.db_manager import db_manager
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point the global database manager at a fresh database under tmp_path."""
+    path = str(tmp_path / "test.db")
+    shard_dir = str(tmp_path / "test_shards")
+    monkeypatch.setattr(settings, "DB_PATH", path)
+    monkeypatch.setattr(settings, "VECTOR_INDEX_ENABLED", False)
+    monkeypatch.setattr(db_manager, "db_path", path)
+    monkeypatch.setattr(db_manager, "shard_dir", shard_dir)
+    monkeypatch.setattr(db_manager, "archive_dir", str(tmp_path / "test_shards" / "archive"))
+    monkeypatch.setattr(db_manager, "_ready_shards", set())
+    asyncio.run(db_manager.init_database())
+    return db_manager
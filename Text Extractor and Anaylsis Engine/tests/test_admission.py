@@ -0,0 +1,94 @@
+"""
+Tests for admission control lanes, reservations and load shedding.
+"""
+import asyncio
+import pytest
+from services.admission import AdmissionController, QueueFullError, BULK, INTERACTIVE
+
+
+LANES = {
+    INTERACTIVE: {"weight": 4, "max_queue": 4},
+    BULK: {"weight": 1, "max_queue": 4},
+}
+
+
+def make_controller(max_concurrency: int = 1) -> AdmissionController:
+    return AdmissionController(max_concurrency=max_concurrency, lanes=LANES)
+
+
+def test_reservations_count_toward_the_queue_bound():
+    controller = make_controller()
+    first = controller.reserve(BULK, 3)
+    with pytest.raises(QueueFullError):
+        controller.reserve(BULK, 2)
+    controller.cancel(first)
+    assert controller.reserve(BULK, 4).remaining == 4
+
+
+def test_oversized_request_is_admitted_only_into_an_empty_lane():
+    controller = make_controller()
+    big = controller.reserve(BULK, 100)
+    assert big.remaining == 4
+    with pytest.raises(QueueFullError):
+        controller.reserve(BULK, 1)
+
+
+def test_items_consume_their_reservation_and_cancel_frees_the_rest():
+    async def scenario():
+        controller = make_controller()
+        reservation = controller.reserve(BULK, 3)
+        await controller.acquire(BULK, reservation)
+        assert reservation.remaining == 2
+        # The slot is busy, so the next item queues on a reserved unit
+        waiter = asyncio.ensure_future(controller.acquire(BULK, reservation))
+        await asyncio.sleep(0)
+        assert reservation.remaining == 1
+        assert controller.queued(BULK) == 1
+        # One queued item plus one reserved unit leave room for two more
+        other = controller.reserve(BULK, 2)
+        with pytest.raises(QueueFullError):
+            controller.reserve(BULK, 1)
+        controller.cancel(reservation)
+        controller.cancel(other)
+        controller.release(BULK)
+        await waiter
+        controller.release(BULK)
+        return controller
+    
+    controller = asyncio.run(scenario())
+    assert controller._reserved[BULK] == 0
+    assert controller.in_flight == 0
+
+
+def test_unreserved_work_is_shed_while_reservations_fill_the_lane():
+    async def scenario():
+        controller = make_controller()
+        await controller.acquire(INTERACTIVE)
+        controller.reserve(BULK, 4)
+        with pytest.raises(QueueFullError):
+            await controller.acquire(BULK)
+    
+    asyncio.run(scenario())
+
+
+def test_concurrent_batches_cannot_overfill_the_lane():
+    async def scenario():
+        controller = make_controller()
+        await controller.acquire(INTERACTIVE)
+        accepted, rejected = 0, 0
+        
+        async def batch():
+            nonlocal accepted, rejected
+            try:
+                controller.reserve(BULK, 2)
+            except QueueFullError:
+                rejected += 1
+                return
+            accepted += 1
+            # Simulate an upload or extraction before the items queue
+            await asyncio.sleep(0.01)
+        
+        await asyncio.gather(*(batch() for _ in range(5)))
+        return accepted, rejected
+    
+    assert asyncio.run(scenario()) == (2, 3)
@@ -0,0 +1,140 @@
+"""
+Tests for backfill jobs: checkpoints, resuming and cross-process job locks.
+"""
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime
+import pytest
+from config.settings import settings
+from services.backfill import BackfillRunner, JobLockedError
+
+
+def save_rows(manager, count: int) -> list:
+    """Save count analyses with a parseable stored response and return their IDs."""
+    metadata = {"title": "t", "topics": ["backfill"], "sentiment": "neutral", "keywords": ["row"]}
+    raw_response = f"Summary: A stored row.\n\n{json.dumps(metadata)}"
+    
+    async def save():
+        return [
+            await manager.save_analysis({
+                "title": "t", "content": f"row {i} text", "raw_response": raw_response, "messages": [],
+                "created_at": datetime.utcnow().isoformat(), "prompt_version": "v1",
+            })
+            for i in range(count)
+        ]
+    
+    return asyncio.run(save())
+
+
+@pytest.fixture
+def fast_backfill(monkeypatch):
+    """One row at a time, without rate limiting, checkpointing every two rows."""
+    monkeypatch.setattr(settings, "BACKFILL_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "BACKFILL_CHECKPOINT_ROWS", 2)
+    monkeypatch.setattr(settings, "BACKFILL_PAGE_SIZE", 3)
+
+
+def count_updates(manager, monkeypatch) -> Counter:
+    """Count update_analysis calls per ID."""
+    updates = Counter()
+    update = manager.update_analysis
+    
+    async def counted(analysis_id, record):
+        await update(analysis_id, record)
+        updates[analysis_id] += 1
+    
+    monkeypatch.setattr(manager, "update_analysis", counted)
+    return updates
+
+
+def test_paused_job_resumes_after_its_checkpoint(temp_db, fast_backfill, monkeypatch):
+    ids = save_rows(temp_db, 7)
+    updates = count_updates(temp_db, monkeypatch)
+    runner = BackfillRunner()
+    reanalyze = runner._reanalyze
+    
+    async def pause_after_four(stage, row):
+        if sum(updates.values()) == 3:
+            runner._stopping.add(job["id"])
+        return await reanalyze(stage, row)
+    
+    monkeypatch.setattr(runner, "_reanalyze", pause_after_four)
+    job = asyncio.run(runner.create_job("local", "in_place", {}, rate=1000))
+    assert job["total"] == 7
+    
+    job = asyncio.run(runner.run(job["id"]))
+    assert job["status"] == "paused"
+    assert (job["cursor"], job["processed"]) == (ids[3], 4)
+    stored = asyncio.run(temp_db.get_backfill_job(job["id"]))
+    assert (stored["status"], stored["cursor"]) == ("paused", ids[3])
+    
+    monkeypatch.setattr(runner, "_reanalyze", reanalyze)
+    job = asyncio.run(runner.run(job["id"]))
+    assert (job["status"], job["cursor"], job["processed"], job["updated"]) == ("done", ids[-1], 7, 7)
+    assert updates == Counter(ids)
+
+
+def test_interrupted_job_is_recovered_and_resumed(temp_db, fast_backfill, monkeypatch):
+    ids = save_rows(temp_db, 6)
+    updates = count_updates(temp_db, monkeypatch)
+    runner = BackfillRunner()
+    reanalyze = runner._reanalyze
+    
+    async def hang_on_fifth(stage, row):
+        if row["id"] == ids[4]:
+            await asyncio.sleep(60)
+        return await reanalyze(stage, row)
+    
+    monkeypatch.setattr(runner, "_reanalyze", hang_on_fifth)
+    job = asyncio.run(runner.create_job("local", "in_place", {}, rate=1000))
+    
+    async def interrupt():
+        runner.start(job["id"])
+        while sum(updates.values()) < 4:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        runner._tasks[job["id"]].cancel()
+        await asyncio.wait([runner._tasks[job["id"]]])
+    
+    asyncio.run(interrupt())
+    stored = asyncio.run(temp_db.get_backfill_job(job["id"]))
+    assert (stored["status"], stored["cursor"], stored["processed"]) == ("paused", ids[3], 4)
+    
+    # Had the process died instead, the job would still read running: a new process marks
+    # it paused and finishes only the rows after the checkpoint
+    stored["status"] = "running"
+    asyncio.run(temp_db.save_backfill_job(stored))
+    runner = BackfillRunner()
+    asyncio.run(runner.recover())
+    assert asyncio.run(temp_db.get_backfill_job(job["id"]))["status"] == "paused"
+    job = asyncio.run(runner.run(job["id"]))
+    assert (job["status"], job["cursor"], job["processed"]) == ("done", ids[-1], 6)
+    assert updates == Counter(ids)
+
+
+def test_job_running_elsewhere_is_neither_run_nor_paused(temp_db):
+    runner = BackfillRunner()
+    
+    async def scenario():
+        job = await runner.create_job("local", "in_place", {})
+        job["status"] = "running"
+        await temp_db.save_backfill_job(job)
+        
+        # Another process holds the job's lock while it runs the job
+        lock = runner._job_lock(job["id"])
+        assert lock.acquire(blocking=False)
+        try:
+            assert runner.is_running_elsewhere(job["id"])
+            with pytest.raises(JobLockedError):
+                await runner.run(job["id"])
+            await runner.recover()
+            assert (await temp_db.get_backfill_job(job["id"]))["status"] == "running"
+        finally:
+            lock.release()
+        
+        # Once that process is gone, the job counts as interrupted
+        await runner.recover()
+        assert (await temp_db.get_backfill_job(job["id"]))["status"] == "paused"
+    
+    asyncio.run(scenario())
@@ -0,0 +1,100 @@
+"""
+Tests for the input normalization pipeline and search query cleaning.
+"""
+import pytest
+from utils.normalization import clean_text, normalize_text
+
+
+SHORT_INPUTS = [
+    "Share prices fell 5% today",
+    "Copyright law changes in EU spark debate",
+    "Related articles show a clear trend",
+    "Home prices / rates / jobs",
+    "Subscribe",
+    "Home",
+    "Menu | Home | Register",
+]
+
+
+@pytest.mark.parametrize("text", SHORT_INPUTS)
+def test_short_inputs_are_kept(text):
+    normalized, report = normalize_text(text)
+    assert normalized == text
+    assert report["steps"]["boilerplate"] == 0
+
+
+@pytest.mark.parametrize("text", SHORT_INPUTS)
+def test_short_inputs_with_extra_whitespace_are_only_collapsed(text):
+    normalized, _ = normalize_text(f"  {text}\n\n")
+    assert normalized == text
+
+
+def test_headline_lines_survive_in_documents():
+    text = "\n".join([
+        "Share prices fell 5% today",
+        "Copyright law changes in EU spark debate",
+        "Related articles show a clear trend",
+        "Home prices / rates / jobs",
+    ])
+    normalized, _ = normalize_text(text)
+    assert normalized == text
+
+
+def test_documents_drop_chrome_lines():
+    text = "\n".join([
+        "Skip to content",
+        "Home | News | Sport | Weather",
+        "Markets rallied on Tuesday after the central bank held rates.",
+        "Share this article",
+        "Analysts expect the rally to continue into next week.",
+        "© 2024 Example News. All rights reserved.",
+    ])
+    normalized, report = normalize_text(text)
+    assert normalized == (
+        "Markets rallied on Tuesday after the central bank held rates.\n"
+        "Analysts expect the rally to continue into next week."
+    )
+    assert report["steps"]["boilerplate"] > 0
+
+
+def test_html_drops_chrome_even_when_short():
+    normalized, _ = normalize_text("<div>Subscribe</div><p>Rates were held at 4%.</p>")
+    assert normalized == "Rates were held at 4%."
+
+
+@pytest.mark.parametrize("text", [
+    "Home\nMenu\nSign in\nSubscribe",
+    "<p>Home</p><p>Menu</p><p>Register</p>",
+    "<nav>Home</nav>",
+])
+def test_non_empty_input_never_normalizes_to_empty(text):
+    normalized, _ = normalize_text(text)
+    assert normalized
+
+
+def test_repeated_lines_are_deduplicated():
+    line = "The same sentence appears twice here."
+    normalized, report = normalize_text(f"{line}\n{line}\nAnd then one more.")
+    assert normalized == f"{line}\nAnd then one more."
+    assert report["steps"]["dedupe_lines"] == len(line) + 1
+
+
+@pytest.mark.parametrize("query", [
+    "home",
+    "share",
+    "menu",
+    "register",
+    "copyright law",
+    "home|share|menu|register|copyright law",
+])
+def test_clean_text_keeps_queries(query):
+    assert clean_text(query) == query
+
+
+def test_clean_text_keeps_urls():
+    query = "https://example.com/articles/2024/rates?page=2"
+    assert clean_text(query) == query
+
+
+def test_clean_text_collapses_whitespace_and_applies_nfkc():
+    assert clean_text("  ﬁnance​  news\n") == "finance news"
@@ -0,0 +1,31 @@
+"""
+Tests for splitting packed analyses into per-item results.
+"""
+import asyncio
+import json
+from services.ai_service import ai_service
+
+
+def test_packed_items_store_only_their_own_transcript(monkeypatch):
+    texts = ["Alice's private note about rent", "Bob's complaint about the bus"]
+    reply = json.dumps([
+        {"index": 0, "summary": "Rent note.", "topics": ["housing"], "sentiment": "neutral", "keywords": ["rent"]},
+        {"index": 1, "summary": "Bus complaint.", "topics": ["transport"], "sentiment": "negative", "keywords": ["bus"]},
+    ])
+    
+    async def fake_complete(task, messages, temperature, items=1):
+        usage = {"client_id": "anonymous", "task": task, "model": "m", "prompt_tokens": 40,
+                 "completion_tokens": 20, "created_at": "2024-01-01T00:00:00Z"}
+        return reply, messages, usage
+    
+    monkeypatch.setattr(ai_service, "_complete", fake_complete)
+    results = asyncio.run(ai_service.analyze_packed(texts))
+    
+    for i, result in enumerate(results):
+        stored = json.dumps(result["messages"])
+        assert texts[i] in stored
+        assert texts[1 - i] not in stored
+        assert ["Rent note.", "Bus complaint."][1 - i] not in stored
+        answer = json.loads(result["messages"][-1]["content"])
+        assert answer[0]["index"] == 0
+    assert sum(r["usage"][0]["prompt_tokens"] for r in results) == 40
@@ -0,0 +1,61 @@
+"""
+Tests for the circuit breaker and the resilient caller.
+"""
+import asyncio
+from services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+def make_caller() -> ResilientCaller:
+    caller = ResilientCaller(CircuitBreaker(failure_threshold=1, recovery_seconds=0))
+    caller.max_retries = 0
+    caller.hedge_enabled = False
+    return caller
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    caller = make_caller()
+    caller.breaker.record_failure()
+    assert caller.breaker.state == CircuitBreaker.OPEN
+    
+    async def hang():
+        await asyncio.sleep(10)
+    
+    async def ok():
+        return "ok"
+    
+    async def scenario():
+        probe = asyncio.ensure_future(caller.call(hang))
+        await asyncio.sleep(0.01)
+        assert caller.breaker.state == CircuitBreaker.HALF_OPEN
+        assert caller.breaker.probe_in_flight
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+        return await caller.call(ok)
+    
+    assert asyncio.run(scenario()) == "ok"
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_second_call_during_probe_fails_fast():
+    caller = make_caller()
+    caller.breaker.record_failure()
+    
+    async def hang():
+        await asyncio.sleep(10)
+    
+    async def scenario():
+        probe = asyncio.ensure_future(caller.call(hang))
+        await asyncio.sleep(0.01)
+        try:
+            await caller.call(hang)
+        except CircuitOpenError:
+            rejected = True
+        else:
+            rejected = False
+        probe.cancel()
+        return rejected
+    
+    assert asyncio.run(scenario())
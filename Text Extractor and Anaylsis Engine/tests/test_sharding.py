@@ -0,0 +1,93 @@
+"""
+Tests for monthly analysis shards: global IDs, legacy rows, read-only shards and archiving.
+"""
+import asyncio
+import os
+import sqlite3
+from datetime import datetime
+import pytest
+from database.db_manager import DatabaseManager, shard_base_id, shard_month_of_id
+
+
+OLD_MONTH = "2020-03"
+
+
+def record(title: str, created_at: str) -> dict:
+    return {"title": title, "content": f"{title} content", "topics": ["shards"], "sentiment": "neutral",
+            "keywords": [title], "summary": title, "created_at": created_at}
+
+
+def save_old_row(manager, monkeypatch, title: str) -> int:
+    """Write a row into OLD_MONTH's shard as if it were still writable."""
+    with monkeypatch.context() as patch:
+        patch.setattr(DatabaseManager, "oldest_writable_month", staticmethod(lambda: "2000-01"))
+        return asyncio.run(manager.save_analysis(record(title, f"{OLD_MONTH}-05T10:00:00")))
+
+
+def test_new_rows_get_global_ids_in_their_month_shard(temp_db):
+    month = datetime.utcnow().strftime("%Y-%m")
+    now = datetime.utcnow().isoformat()
+    
+    first = asyncio.run(temp_db.save_analysis(record("first", now)))
+    second = asyncio.run(temp_db.save_analysis(record("second", now)))
+    
+    assert (first, second) == (shard_base_id(month) + 1, shard_base_id(month) + 2)
+    assert shard_month_of_id(first) == month
+    assert os.path.exists(temp_db.shard_path(month))
+    conn = sqlite3.connect(temp_db.shard_path(month))
+    rows = conn.execute("SELECT id FROM analyses ORDER BY id").fetchall()
+    conn.close()
+    assert [row[0] for row in rows] == [first, second]
+    assert asyncio.run(temp_db.get_analysis_by_id(second))["title"] == "second"
+
+
+def test_legacy_rows_stay_readable(temp_db):
+    conn = sqlite3.connect(temp_db.db_path)
+    conn.execute(
+        "INSERT INTO analyses (id, title, content, topics, keywords, created_at) VALUES (7, ?, ?, ?, ?, ?)",
+        ("legacy", "legacy content", '["shards"]', '["legacy"]', "2019-06-01T00:00:00"),
+    )
+    conn.commit()
+    conn.close()
+    current = asyncio.run(temp_db.save_analysis(record("current", datetime.utcnow().isoformat())))
+    
+    assert shard_month_of_id(7) is None
+    legacy = asyncio.run(temp_db.get_analysis_by_id(7))
+    assert legacy["title"] == "legacy" and legacy["topics"] == ["shards"]
+    # Legacy IDs sort before every global ID when shard results are merged
+    assert [row["id"] for row in asyncio.run(temp_db.search_analyses_by_term("content"))] == [7, current]
+    assert [row["id"] for row in asyncio.run(temp_db.get_analyses_by_ids([current, 7]))] == [current, 7]
+
+
+def test_closed_shards_refuse_new_rows(temp_db, monkeypatch):
+    old_id = save_old_row(temp_db, monkeypatch, "old")
+    
+    with pytest.raises(ValueError, match="read-only"):
+        asyncio.run(temp_db.save_analysis(record("late", f"{OLD_MONTH}-20T10:00:00")))
+    
+    source = temp_db._source_for_month(OLD_MONTH)
+    assert source["read_only"]
+    
+    async def write_through_read_source():
+        async with temp_db._connect(source) as conn:
+            await conn.execute("DELETE FROM analyses")
+    
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(write_through_read_source())
+    assert asyncio.run(temp_db.get_analysis_by_id(old_id))["title"] == "old"
+
+
+def test_archived_shards_are_fetched_by_id_but_not_searched(temp_db, monkeypatch):
+    old_id = save_old_row(temp_db, monkeypatch, "archived")
+    current = asyncio.run(temp_db.save_analysis(record("current", datetime.utcnow().isoformat())))
+    
+    assert asyncio.run(temp_db.archive_shards("2021-01")) == [OLD_MONTH]
+    assert not os.path.exists(temp_db.shard_path(OLD_MONTH))
+    assert os.path.exists(temp_db.shard_path(OLD_MONTH, archived=True))
+    
+    assert [row["id"] for row in asyncio.run(temp_db.search_analyses_by_term("content"))] == [current]
+    fetched = asyncio.run(temp_db.get_analyses_by_ids([old_id, current, shard_base_id(OLD_MONTH) + 99]))
+    assert [row["id"] for row in fetched] == [old_id, current]
+    assert fetched[0]["keywords"] == ["archived"]
+    with pytest.raises(ValueError):
+        asyncio.run(temp_db.update_analysis(old_id, record("rewrite", f"{OLD_MONTH}-05T10:00:00")))
@@ -0,0 +1,103 @@
+"""
+Tests for taxonomy tagging against a brute-force matcher, the automaton cache and hot reload.
+"""
+import os
+import random
+import time
+from collections import Counter
+from config.settings import settings
+from utils.taxonomy import TaxonomyTagger, parse_dictionary, term_words
+
+
+def brute_force_tags(entries, text):
+    """Count every occurrence of every term by scanning all word positions."""
+    words = term_words(text)
+    counts = Counter()
+    for term, tag in set((tuple(term), tag) for term, tag in entries):
+        for start in range(len(words) - len(term) + 1):
+            if tuple(words[start:start + len(term)]) == term:
+                counts[tag] += 1
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:settings.TAXONOMY_MAX_TAGS]
+
+
+def write_dictionary(path, content, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def make_tagger(tmp_path):
+    return TaxonomyTagger(str(tmp_path / "taxonomy.tsv"), str(tmp_path / "cache" / "automaton.npz"))
+
+
+def test_tags_match_brute_force(tmp_path):
+    rng = random.Random(3)
+    # A small vocabulary makes overlapping and nested terms common
+    vocabulary = ["alpha", "beta", "gamma", "delta", "Epsilon", "zeta"]
+    lines = []
+    for i in range(60):
+        term = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4)))
+        lines.append(f"{term}\ttag{i % 25}" if i % 3 else term)
+    content = "# test dictionary\n\n" + "\n".join(lines) + "\n"
+    write_dictionary(tmp_path / "taxonomy.tsv", content, 1_000_000)
+    tagger = make_tagger(tmp_path)
+    assert tagger.refresh(wait=True)
+    
+    entries = parse_dictionary(content)
+    for _ in range(200):
+        words = [rng.choice(vocabulary + ["other"]) for _ in range(rng.randint(0, 40))]
+        text = rng.choice([" ", ", ", "\n"]).join(word.upper() if rng.random() < 0.2 else word for word in words)
+        assert tagger.tag(text) == brute_force_tags(entries, text)
+
+
+def test_cached_automaton_round_trips(tmp_path):
+    write_dictionary(tmp_path / "taxonomy.tsv", "machine learning\tai\nlearning\ncat\tanimals\n", 1_000_000)
+    text = "Machine learning helps the cat; learning never stops."
+    
+    built = make_tagger(tmp_path)
+    assert built.refresh(wait=True)
+    assert built.stats["cache_hits"] == 0
+    assert os.path.exists(built.cache_path)
+    
+    loaded = make_tagger(tmp_path)
+    assert loaded.refresh(wait=True)
+    assert loaded.stats["cache_hits"] == 1
+    assert loaded.automaton["hash"] == built.automaton["hash"]
+    for key in ("vocabulary", "tags", "goto", "fail", "output_link", "offsets", "output_tags", "terms"):
+        assert loaded.automaton[key] == built.automaton[key]
+    assert loaded.tag(text) == built.tag(text) == [("learning", 2), ("ai", 1), ("animals", 1)]
+    
+    # A changed dictionary does not reuse the stale cache
+    write_dictionary(tmp_path / "taxonomy.tsv", "dog\tanimals\n", 1_000_100)
+    rebuilt = make_tagger(tmp_path)
+    assert rebuilt.refresh(wait=True)
+    assert rebuilt.stats["cache_hits"] == 0
+    assert rebuilt.tag("a dog and a cat") == [("animals", 1)]
+
+
+def test_dictionary_changes_are_hot_reloaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TAXONOMY_RELOAD_SECONDS", 0)
+    path = tmp_path / "taxonomy.tsv"
+    write_dictionary(path, "cat\tanimals\n", 1_000_000)
+    tagger = make_tagger(tmp_path)
+    assert tagger.tag("cat and dog") == [("animals", 1)]
+    
+    write_dictionary(path, "cat\tanimals\ndog\tanimals\n", 1_000_100)
+    assert tagger.refresh(wait=True)
+    assert tagger.tag("cat and dog") == [("animals", 2)]
+    assert tagger.stats["reloads"] == 2
+    
+    # A background reload swaps the new automaton in once it is built
+    write_dictionary(path, "dog\tpets\n", 1_000_200)
+    tagger.refresh()
+    for _ in range(500):
+        if tagger.stats["reloads"] == 3:
+            break
+        time.sleep(0.01)
+    assert tagger.tag("cat and dog") == [("pets", 1)]
+    
+    # An unreadable dictionary keeps the previous automaton
+    os.remove(path)
+    assert tagger.refresh(wait=True)
+    assert tagger.tag("cat and dog") == [("pets", 1)]
@@ -0,0 +1,36 @@
+"""
+Tests for response post-processing and confidence scoring.
+"""
+import json
+from config.settings import settings
+from utils.text_processing import local_analysis_response, local_confidence, postprocess_analysis
+
+
+TEXT = "Solar panels cut household energy bills. Installers report record demand this spring."
+
+
+def test_llm_rows_are_scored_from_the_response():
+    metadata = {"title": None, "topics": ["energy"], "sentiment": "positive", "keywords": ["solar"]}
+    raw_response = f"Summary: Solar demand grows.\n\n{json.dumps(metadata)}"
+    result = postprocess_analysis(TEXT, raw_response, [], local_confidence(settings.ANALYSIS_PROMPT_VERSION))
+    assert result["confidence"] == 1.0
+
+
+def test_local_answers_get_a_fixed_low_confidence():
+    raw_response = local_analysis_response(TEXT)
+    assert postprocess_analysis(TEXT, raw_response, [])["confidence"] == 1.0
+    result = postprocess_analysis(TEXT, raw_response, [], local_confidence("local"))
+    assert result["confidence"] == settings.LOCAL_ANALYSIS_CONFIDENCE
+
+
+def test_classifier_answers_get_their_own_confidence():
+    raw_response = local_analysis_response(TEXT, "positive", ["energy"])
+    result = postprocess_analysis(TEXT, raw_response, [], local_confidence("classifier"))
+    assert result["confidence"] == settings.CLASSIFIER_CONFIDENCE
+    assert result["sentiment"] == "positive"
+
+
+def test_local_confidence_stays_below_llm_rows():
+    assert local_confidence("local") < 0.5
+    assert local_confidence("classifier") < 0.5
+    assert local_confidence(None) is None
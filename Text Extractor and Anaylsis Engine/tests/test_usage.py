@@ -0,0 +1,56 @@
+"""
+Tests for token usage accounting of hedged calls and the usage endpoints' admin guard.
+"""
+import asyncio
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from config.settings import settings
+from services import ai_service as ai_module
+from services.ai_service import ai_service
+from services.usage import TokenBudget
+
+
+class SlowThenFastCompletions:
+    """Fake completions API whose first call hangs and later calls answer at once."""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            await asyncio.sleep(10)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Summary: ok."))],
+            usage=SimpleNamespace(prompt_tokens=30, completion_tokens=10),
+            model="m",
+        )
+
+
+def test_losing_hedge_is_charged(monkeypatch):
+    budget = TokenBudget()
+    completions = SlowThenFastCompletions()
+    monkeypatch.setattr(ai_module, "token_budget", budget)
+    monkeypatch.setattr(ai_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(ai_service.resilience, "hedge_delay", lambda: 0.01)
+    
+    messages = [{"role": "user", "content": "hello"}]
+    _, _, usage = asyncio.run(ai_service._complete("rephrase", messages, 0.5))
+    
+    assert completions.calls == 2
+    assert (usage["prompt_tokens"], usage["completion_tokens"]) == (60, 20)
+    assert budget.get_state()["budgets"]["global"]["minute"]["used"] == 80
+
+
+def test_usage_endpoints_require_the_admin_token(monkeypatch):
+    from api.content_analysis_api import app
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "USAGE_ADMIN_TOKEN", None)
+    assert client.get("/usage/budget").status_code == 403
+    
+    monkeypatch.setattr(settings, "USAGE_ADMIN_TOKEN", "secret")
+    assert client.get("/usage/budget").status_code == 403
+    assert client.get("/usage/budget", headers={settings.USAGE_ADMIN_HEADER: "wrong"}).status_code == 403
+    assert client.get("/analysis/1/usage").status_code == 403
+    assert client.get("/usage").status_code == 403
+    assert client.get("/usage/budget", headers={settings.USAGE_ADMIN_HEADER: "secret"}).status_code == 200
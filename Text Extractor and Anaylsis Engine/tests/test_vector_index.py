@@ -0,0 +1,69 @@
+"""
+Tests for the memory-mapped vector index, including writers in several processes.
+"""
+import asyncio
+import multiprocessing
+from config.settings import settings
+from database import db_manager as db_module
+from database.vector_index import VectorIndex
+
+
+def write_rows(base_path: str, start: int, count: int) -> None:
+    index = VectorIndex(base_path, dim=16)
+    for analysis_id in range(start, start + count):
+        index.add(analysis_id, f"document number {analysis_id} about topic {analysis_id % 7}")
+    for analysis_id in range(start, start + count, 10):
+        index.remove(analysis_id)
+
+
+def test_remove_keeps_the_other_rows(tmp_path):
+    index = VectorIndex(str(tmp_path / "v"), dim=16)
+    index.add_many([(i, f"text {i}") for i in range(1, 6)])
+    index.remove(2)
+    assert index.count == 4
+    assert sorted(index.ids[:index.count].tolist()) == [1, 3, 4, 5]
+    assert index.search("text 5", k=1)[0][0] == 5
+
+
+def test_processes_sharing_the_index_keep_each_others_rows(tmp_path):
+    base_path = str(tmp_path / "shared")
+    VectorIndex(base_path, dim=16).load()
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=write_rows, args=(base_path, start, 300)) for start in (1, 1001)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    
+    expected = {i for start in (1, 1001) for i in range(start, start + 300) if (i - start) % 10}
+    index = VectorIndex(base_path, dim=16)
+    index.load()
+    assert index.count == len(expected)
+    assert set(index.ids[:index.count].tolist()) == expected
+
+
+def test_searches_see_rows_written_by_another_instance(tmp_path):
+    base_path = str(tmp_path / "v")
+    reader = VectorIndex(base_path, dim=16)
+    reader.load()
+    VectorIndex(base_path, dim=16).add(42, "solar panels and batteries")
+    assert reader.search("solar panels", k=1)[0][0] == 42
+
+
+def test_sync_leaves_superseded_versions_out(temp_db, tmp_path, monkeypatch):
+    index = VectorIndex(str(tmp_path / "sync"), dim=16)
+    monkeypatch.setattr(db_module, "vector_index", index)
+    monkeypatch.setattr(settings, "VECTOR_INDEX_ENABLED", True)
+    
+    async def scenario():
+        first = await temp_db.save_analysis({"title": "first", "content": "original text"})
+        second = await temp_db.save_analysis({"title": "second", "content": "revised text", "parent_id": first})
+        await temp_db.sync_vector_index()
+        assert index.ids[:index.count].tolist() == [second]
+        # A stale index is rebuilt without the superseded parent
+        index.add(first, "original text")
+        await temp_db.sync_vector_index()
+        assert index.ids[:index.count].tolist() == [second]
+    
+    asyncio.run(scenario())
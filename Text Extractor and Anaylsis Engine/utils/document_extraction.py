@@ -0,0 +1,143 @@
+"""
+Text extraction from uploaded PDF, DOCX, HTML and plain-text documents.
+
+Extraction functions are plain module-level functions operating on file
+paths so they can run in a worker process.
+"""
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from typing import Optional
+
+
+SUPPORTED_EXTENSIONS = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".html": "html",
+    ".htm": "html",
+    ".txt": "text",
+    ".md": "text",
+    ".csv": "text",
+}
+
+SUPPORTED_CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "text/html": "html",
+    "text/plain": "text",
+}
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def detect_document_kind(filename: str, content_type: Optional[str] = None) -> Optional[str]:
+    """Return the document kind for an upload, or None if it is not supported."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in SUPPORTED_EXTENSIONS:
+        return SUPPORTED_EXTENSIONS[extension]
+    if content_type:
+        return SUPPORTED_CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    return None
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collects visible text from HTML, breaking lines at block elements."""
+    
+    # Navigation, sidebars and footers are page chrome rather than content
+    SKIP_TAGS = {"script", "style", "noscript", "template", "head", "nav", "aside", "footer", "svg", "iframe"}
+    BLOCK_TAGS = {
+        "p", "div", "br", "li", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6",
+        "section", "article", "header", "main", "blockquote", "pre",
+    }
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Extract visible text from an HTML string."""
+    parser = _HTMLTextParser()
+    parser.feed(html)
+    parser.close()
+    return re.sub(r"\n\s*\n+", "\n\n", "".join(parser.parts))
+
+
+def extract_html(path: str) -> str:
+    """Extract visible text from an HTML file."""
+    parser = _HTMLTextParser()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for chunk in iter(lambda: f.read(1 << 16), ""):
+            parser.feed(chunk)
+    parser.close()
+    text = "".join(parser.parts)
+    return re.sub(r"\n\s*\n+", "\n\n", text)
+
+
+def extract_docx(path: str) -> str:
+    """Extract paragraph text from a DOCX file using only the standard library."""
+    paragraphs = []
+    current = []
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as document:
+            for event, element in ET.iterparse(document, events=("end",)):
+                if element.tag == WORD_NAMESPACE + "t" and element.text:
+                    current.append(element.text)
+                elif element.tag == WORD_NAMESPACE + "tab":
+                    current.append("\t")
+                elif element.tag == WORD_NAMESPACE + "br":
+                    current.append("\n")
+                elif element.tag == WORD_NAMESPACE + "p":
+                    paragraphs.append("".join(current))
+                    current = []
+                    element.clear()
+    return "\n\n".join(p for p in paragraphs if p.strip())
+
+
+def extract_pdf(path: str) -> str:
+    """Extract text from a PDF file with pypdf."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF extraction requires the 'pypdf' package.")
+    
+    reader = PdfReader(path)
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_plain_text(path: str) -> str:
+    """Read a plain-text file as UTF-8."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+EXTRACTORS = {
+    "pdf": extract_pdf,
+    "docx": extract_docx,
+    "html": extract_html,
+    "text": extract_plain_text,
+}
+
+
+def extract_document_text(path: str, kind: str) -> str:
+    """Extract text from the document at path; runs inside a worker process."""
+    return EXTRACTORS[kind](path).strip()
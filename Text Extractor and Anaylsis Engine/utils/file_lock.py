@@ -0,0 +1,63 @@
+"""
+Advisory file locks shared by the API server and CLI processes.
+
+Locks use flock, so the kernel drops them when the holding process
+exits, crashed or not. Where fcntl is unavailable (Windows) locking is
+a no-op and only one process should write shared files at a time.
+"""
+import os
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """An exclusive or shared flock on a lock file.
+
+    Each acquire opens its own descriptor, and flock treats separate
+    descriptors as separate holders, so threads of one process must
+    serialize with their own lock before taking this one.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+    
+    def acquire(self, shared: bool = False, blocking: bool = True) -> bool:
+        """Take the lock; return False if blocking is False and another holder has it."""
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+    
+    def release(self) -> None:
+        """Release the lock if held."""
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+    
+    def is_held_elsewhere(self) -> bool:
+        """Return True if another holder has the lock right now."""
+        if not self.acquire(blocking=False):
+            return True
+        self.release()
+        return False
+    
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.release()
@@ -0,0 +1,236 @@
+"""
+Input normalization applied to text before it is analyzed and stored.
+
+Every step is a single pass over the text (a compiled regex, a
+translate table or one walk over the lines), so normalization stays
+linear in the input size. The steps and their patterns are configured
+with the NORMALIZE_* settings.
+"""
+import re
+import unicodedata
+from typing import Dict, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from config.settings import settings
+from utils.document_extraction import html_to_text
+from utils.text_processing import estimate_tokens
+
+
+STEPS = ("html", "nfkc", "urls", "boilerplate", "dedupe_lines", "whitespace")
+URL_MODES = ("domain", "clean", "remove")
+
+# Only inputs containing a common tag are parsed as HTML
+HTML_HINT = re.compile(
+    r"<(?:!doctype|html|head|body|div|span|p|br|a|img|table|ul|ol|li|h[1-6]|script|style|"
+    r"section|article|nav|header|footer)\b[^<>]{0,500}>",
+    re.I,
+)
+# No re.I or \b: either stops the regex engine from skipping ahead to the literal prefixes
+URL_PATTERN = re.compile(r"(?:https?://|www\.)[^\s<>\"'()\[\]{}]+")
+URL_TRAILING_PUNCTUATION = ".,;:!?"
+# Several short items separated by |, •, ·, » or › make a navigation bar; "/" is left
+# out because plain text uses it in ordinary phrases such as "prices / rates / jobs"
+NAV_SEPARATOR = re.compile(r"\s[|•·»›]\s")
+
+# Control characters other than tab and line breaks, plus zero-width and soft-hyphen characters
+INVISIBLE_CHARACTERS = dict.fromkeys(
+    [c for c in range(32) if chr(c) not in "\t\n\r\x0b\x0c"]
+    + list(range(127, 160))
+    + [0x00AD, 0x180E, 0x200B, 0x200C, 0x200D, 0x200E, 0x200F, 0x2060, 0xFEFF]
+)
+
+
+class TextNormalizer:
+    """Compiled normalization pipeline that reports what each step removed.
+
+    Patterns are compiled once from settings when the normalizer is built;
+    call reload() after changing the NORMALIZE_* settings.
+    """
+    
+    def __init__(self):
+        self.stats = {"requests": 0, "bytes_removed": 0, "tokens_removed": 0}
+        self.reload()
+    
+    def reload(self) -> None:
+        """Compile the configured steps and patterns."""
+        unknown = set(settings.NORMALIZE_STEPS) - set(STEPS)
+        if unknown:
+            raise ValueError(f"Unknown normalization steps: {', '.join(sorted(unknown))}")
+        if settings.NORMALIZE_URL_MODE not in URL_MODES:
+            raise ValueError(f"NORMALIZE_URL_MODE must be one of {', '.join(URL_MODES)}")
+        self.steps = [step for step in STEPS if step in settings.NORMALIZE_STEPS]
+        # Separate case-sensitive patterns run against the casefolded line are much
+        # faster than one re.I alternation, which retries every branch at every offset
+        self.boilerplate = [re.compile(pattern) for pattern in settings.NORMALIZE_BOILERPLATE_PATTERNS]
+        self.tracking_params = tuple(param.lower() for param in settings.NORMALIZE_TRACKING_PARAMS)
+    
+    def _replace_url(self, match) -> str:
+        url = match.group(0)
+        stripped = url.rstrip(URL_TRAILING_PUNCTUATION)
+        trailing = url[len(stripped):]
+        if settings.NORMALIZE_URL_MODE == "remove":
+            return trailing
+        
+        parts = urlsplit(stripped if "://" in stripped else "http://" + stripped)
+        if settings.NORMALIZE_URL_MODE == "domain":
+            host = parts.hostname or stripped
+            return (host[4:] if host.startswith("www.") else host) + trailing
+        query = [
+            (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith(self.tracking_params)
+        ]
+        cleaned = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+        return (cleaned if "://" in stripped else cleaned.split("://", 1)[1]) + trailing
+    
+    def is_boilerplate(self, line: str) -> bool:
+        """Return True for short lines that look like navigation, cookie or sharing chrome."""
+        if len(line) > settings.NORMALIZE_BOILERPLATE_MAX_CHARS:
+            return False
+        folded = line.casefold()
+        if any(pattern.search(folded) for pattern in self.boilerplate):
+            return True
+        items = NAV_SEPARATOR.split(line)
+        return len(items) >= 3 and all(len(item.split()) <= 3 for item in items)
+    
+    @staticmethod
+    def _has_lines(lines, count: int) -> bool:
+        """Return True once count non-blank lines are seen, without scanning the rest."""
+        for line in lines:
+            if line and not line.isspace():
+                count -= 1
+                if count <= 0:
+                    return True
+        return False
+    
+    def _walk_lines(self, lines, removed: Dict[str, int], drop_chrome: bool) -> list:
+        """Drop boilerplate and repeated lines and collapse whitespace in one pass over the lines."""
+        dedupe = "dedupe_lines" in self.steps
+        whitespace = "whitespace" in self.steps
+        
+        seen = set()
+        kept = []
+        blank = False
+        for line in lines:
+            if whitespace:
+                # split() with no separator collapses every run of whitespace and strips the ends
+                line = " ".join(line.split())
+                if not line:
+                    # Keep one blank line between paragraphs
+                    if not blank and kept:
+                        blank = True
+                        kept.append(line)
+                    continue
+            if drop_chrome and line and self.is_boilerplate(line):
+                removed["boilerplate"] += len(line) + 1
+                continue
+            if dedupe and len(line) >= settings.NORMALIZE_DEDUPE_MIN_CHARS:
+                key = line.casefold()
+                if key in seen:
+                    removed["dedupe_lines"] += len(line) + 1
+                    continue
+                seen.add(key)
+            blank = False
+            kept.append(line)
+        if whitespace:
+            while kept and not kept[-1]:
+                kept.pop()
+        return kept
+    
+    def _normalize_lines(self, text: str, removed: Dict[str, int], from_html: bool = False) -> str:
+        """Run the line steps, dropping boilerplate only from pages and multi-line documents.
+
+        A headline, tweet or single sentence is never treated as page
+        chrome, and if dropping chrome would leave nothing, the lines are
+        kept and only the whitespace and dedupe steps apply.
+        """
+        before = len(text)
+        # splitlines also breaks at \r, \r\n and Unicode line separators
+        lines = text.splitlines()
+        drop_chrome = "boilerplate" in self.steps and (
+            from_html or self._has_lines(lines, settings.NORMALIZE_BOILERPLATE_MIN_LINES)
+        )
+        counts = {"boilerplate": 0, "dedupe_lines": 0}
+        kept = self._walk_lines(lines, counts, drop_chrome)
+        if drop_chrome and counts["boilerplate"] and not any(kept):
+            counts = {"boilerplate": 0, "dedupe_lines": 0}
+            kept = self._walk_lines(lines, counts, False)
+        for step, count in counts.items():
+            if step in removed:
+                removed[step] = count
+        
+        text = "\n".join(kept)
+        if "whitespace" in self.steps:
+            removed["whitespace"] = before - len(text) - counts["boilerplate"] - counts["dedupe_lines"]
+        return text
+    
+    def normalize(self, text: str) -> Tuple[str, Dict]:
+        """Normalize text and report the bytes and estimated tokens removed.
+
+        The report holds the input and output sizes plus the characters
+        each step removed; a step that adds characters (such as NFKC
+        expanding ligatures) reports a negative count.
+        """
+        original = text
+        original_bytes = len(text.encode("utf-8"))
+        original_tokens = estimate_tokens(text)
+        removed = dict.fromkeys(self.steps, 0)
+        
+        from_html = "html" in self.steps and HTML_HINT.search(text) is not None
+        if from_html:
+            before = len(text)
+            text = html_to_text(text)
+            removed["html"] = before - len(text)
+        if "nfkc" in self.steps:
+            before = len(text)
+            text = unicodedata.normalize("NFKC", text).translate(INVISIBLE_CHARACTERS)
+            removed["nfkc"] = before - len(text)
+        if "urls" in self.steps:
+            before = len(text)
+            text = URL_PATTERN.sub(self._replace_url, text)
+            removed["urls"] = before - len(text)
+        if {"boilerplate", "dedupe_lines", "whitespace"} & set(self.steps):
+            text = self._normalize_lines(text, removed, from_html)
+        else:
+            text = text.strip()
+        if not text and not original.isspace() and original:
+            # Markup whose only text sat in skipped tags; analyze the raw input rather than nothing
+            text = clean_text(original)
+            removed = dict.fromkeys(self.steps, 0)
+        
+        normalized_bytes = len(text.encode("utf-8"))
+        report = {
+            "original_bytes": original_bytes,
+            "normalized_bytes": normalized_bytes,
+            "bytes_removed": original_bytes - normalized_bytes,
+            "original_tokens": original_tokens,
+            "tokens_removed": original_tokens - estimate_tokens(text),
+            "steps": removed,
+        }
+        return text, report
+    
+    def record(self, report: Dict) -> None:
+        """Add a request's report to the running totals."""
+        self.stats["requests"] += 1
+        self.stats["bytes_removed"] += report["bytes_removed"]
+        self.stats["tokens_removed"] += report["tokens_removed"]
+    
+    def get_state(self) -> Dict:
+        """Return the configured steps and totals removed so far."""
+        return {"steps": self.steps, "url_mode": settings.NORMALIZE_URL_MODE, **self.stats}
+
+
+def normalize_text(text: str) -> Tuple[str, Dict]:
+    """Normalize text with the global normalizer; module-level so it can run in a worker process."""
+    return text_normalizer.normalize(text)
+
+
+def clean_text(text: str) -> str:
+    """Clean a search query or topic: NFKC, invisible characters removed and whitespace collapsed.
+
+    Queries skip the document steps, so words such as "home" or "share"
+    and URLs are matched as typed.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).translate(INVISIBLE_CHARACTERS).split())
+
+
+# Global text normalizer instance
+text_normalizer = TextNormalizer()
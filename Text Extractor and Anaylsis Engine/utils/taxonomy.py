@@ -0,0 +1,335 @@
+"""
+Dictionary-based taxonomy tagging with a word-level Aho-Corasick automaton.
+
+The dictionary is a UTF-8 text file with one term per line, optionally
+followed by a tab and the tag it maps to (the term itself by default);
+blank lines and lines starting with # are ignored. Terms and text are
+casefolded and split into words, and the automaton runs over word IDs
+rather than characters, so terms only match on word boundaries, states
+number at most the total words across all terms, and one pass over the
+text's words finds every term occurrence, overlapping ones included.
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+
+
+WORD_PATTERN = re.compile(r"\w+")
+# Bump when the cached automaton layout changes so stale caches are rebuilt
+CACHE_FORMAT = 1
+
+
+def term_words(term: str) -> List[str]:
+    """Split a term or text into the casefolded words the automaton matches on."""
+    return WORD_PATTERN.findall(term.casefold())
+
+
+def in_event_loop() -> bool:
+    """Return True when called from a thread running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def parse_dictionary(content: str) -> List[Tuple[List[str], str]]:
+    """Parse dictionary lines into (words, tag) pairs."""
+    entries = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        term, _, tag = line.partition("\t")
+        words = term_words(term)
+        if words:
+            entries.append((words, tag.strip() or term.strip()))
+    return entries
+
+
+def build_automaton(entries: List[Tuple[List[str], str]]) -> Dict:
+    """Compile (words, tag) pairs into flat Aho-Corasick arrays.
+
+    Transitions are keyed by state * vocabulary_size + word_id. Each state
+    has a failure link (the longest proper suffix that is also a prefix)
+    and an output link (the nearest state on its failure chain that ends
+    a term), and its own tags are the slice tags[offsets[s]:offsets[s + 1]].
+    """
+    vocabulary: Dict[str, int] = {}
+    for words, _ in entries:
+        for word in words:
+            vocabulary.setdefault(word, len(vocabulary))
+    size = max(1, len(vocabulary))
+    tag_ids: Dict[str, int] = {}
+    
+    goto: Dict[int, int] = {}
+    children: List[List[int]] = [[]]
+    outputs: List[set] = [set()]
+    for words, tag in entries:
+        state = 0
+        for word in words:
+            key = state * size + vocabulary[word]
+            if key not in goto:
+                goto[key] = len(children)
+                children[state].append(vocabulary[word])
+                children.append([])
+                outputs.append(set())
+            state = goto[key]
+        outputs[state].add(tag_ids.setdefault(tag, len(tag_ids)))
+    
+    states = len(children)
+    fail = [0] * states
+    output_link = [0] * states
+    queue = deque(goto[word] for word in children[0])
+    while queue:
+        state = queue.popleft()
+        for word in children[state]:
+            child = goto[state * size + word]
+            queue.append(child)
+            # Follow failure links until some state continues with this word
+            suffix = fail[state]
+            while suffix and suffix * size + word not in goto:
+                suffix = fail[suffix]
+            fail[child] = goto.get(suffix * size + word, 0) if state else 0
+            target = fail[child]
+            output_link[child] = target if outputs[target] else output_link[target]
+    
+    keys = np.fromiter(goto.keys(), dtype=np.int64, count=len(goto))
+    values = np.fromiter(goto.values(), dtype=np.int32, count=len(goto))
+    offsets = np.zeros(states + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(tags) for tags in outputs])
+    tags = np.fromiter(
+        (tag for tags in outputs for tag in sorted(tags)), dtype=np.int32, count=int(offsets[-1])
+    )
+    return {
+        "vocabulary": list(vocabulary),
+        "tags": list(tag_ids),
+        "keys": keys,
+        "values": values,
+        "fail": np.asarray(fail, dtype=np.int32),
+        "output_link": np.asarray(output_link, dtype=np.int32),
+        "offsets": offsets,
+        "output_tags": tags,
+        "terms": len(entries),
+    }
+
+
+def pack_strings(strings: List[str]) -> np.ndarray:
+    """Pack newline-free strings into one byte array for compact .npz storage."""
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def unpack_strings(packed: np.ndarray) -> List[str]:
+    """Reverse pack_strings."""
+    return packed.tobytes().decode("utf-8").split("\n") if len(packed) else []
+
+
+class TaxonomyTagger:
+    """Tags text against a term dictionary, reloading it when the file changes.
+
+    The compiled automaton is cached next to the dictionary in an .npz
+    file keyed by the dictionary's hash, so a restart with an unchanged
+    dictionary loads arrays instead of rebuilding. The API loads it at
+    startup; later changes on disk are built in a background thread and
+    swapped in, and tagging keeps using the previous automaton meanwhile.
+    Process-pool workers tag with their own copy of the tagger (forked
+    from, or loaded like, the parent's) and keep their own stats.
+    """
+    
+    def __init__(self, path: str = None, cache_path: str = None):
+        self.path = path or settings.TAXONOMY_PATH or os.path.splitext(settings.DB_PATH)[0] + ".taxonomy.tsv"
+        self.cache_path = cache_path or settings.TAXONOMY_CACHE_PATH or self.path + ".automaton.npz"
+        self.automaton: Optional[Dict] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self.stats = {"documents": 0, "matches": 0, "reloads": 0, "cache_hits": 0}
+    
+    def refresh(self, wait: bool = False) -> bool:
+        """Pick up dictionary changes, checking at most every TAXONOMY_RELOAD_SECONDS.
+
+        Returns True if an automaton is loaded. Loads run in a background
+        thread unless wait is True, in which case the calling thread loads
+        (or builds) the automaton before returning.
+        """
+        now = time.monotonic()
+        if self.automaton is not None and now - self._checked_at < settings.TAXONOMY_RELOAD_SECONDS:
+            return True
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return self.automaton is not None
+            if mtime == self._mtime or self._reloading:
+                return self.automaton is not None
+            self._reloading = True
+        if wait:
+            self._reload(mtime)
+        else:
+            threading.Thread(target=self._reload, args=(mtime,), daemon=True).start()
+        return self.automaton is not None
+    
+    def _reload(self, mtime: float) -> None:
+        """Load the dictionary's automaton from the cache, or build and cache it."""
+        try:
+            with open(self.path, "rb") as f:
+                content = f.read()
+            digest = hashlib.sha1(content).hexdigest()
+            automaton = self._load_cache(digest)
+            if automaton is None:
+                started = time.perf_counter()
+                automaton = build_automaton(parse_dictionary(content.decode("utf-8", errors="replace")))
+                automaton["build_seconds"] = round(time.perf_counter() - started, 3)
+                self._save_cache(automaton, digest)
+            else:
+                self.stats["cache_hits"] += 1
+            automaton["hash"] = digest
+            self.automaton = self._prepare(automaton)
+            self._mtime = mtime
+            self.stats["reloads"] += 1
+        except (OSError, ValueError, KeyError):
+            # Keep serving the previous automaton if the new dictionary or cache is unreadable
+            self._mtime = mtime
+        finally:
+            self._reloading = False
+    
+    def _load_cache(self, digest: str) -> Optional[Dict]:
+        """Return the cached automaton if it was built from this dictionary hash."""
+        try:
+            with np.load(self.cache_path) as cache:
+                meta = json.loads(str(cache["meta"]))
+                if meta.get("hash") != digest or meta.get("format") != CACHE_FORMAT:
+                    return None
+                return {
+                    "vocabulary": unpack_strings(cache["vocabulary"]),
+                    "tags": unpack_strings(cache["tags"]),
+                    "keys": cache["keys"],
+                    "values": cache["values"],
+                    "fail": cache["fail"],
+                    "output_link": cache["output_link"],
+                    "offsets": cache["offsets"],
+                    "output_tags": cache["output_tags"],
+                    "terms": meta["terms"],
+                }
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _save_cache(self, automaton: Dict, digest: str) -> None:
+        """Write the compiled automaton to the cache path atomically."""
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.cache_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            vocabulary=pack_strings(automaton["vocabulary"]),
+            tags=pack_strings(automaton["tags"]),
+            keys=automaton["keys"],
+            values=automaton["values"],
+            fail=automaton["fail"],
+            output_link=automaton["output_link"],
+            offsets=automaton["offsets"],
+            output_tags=automaton["output_tags"],
+            meta=np.array(json.dumps({"hash": digest, "format": CACHE_FORMAT, "terms": automaton["terms"]})),
+        )
+        os.replace(tmp_path, self.cache_path)
+    
+    @staticmethod
+    def _prepare(automaton: Dict) -> Dict:
+        """Turn the flat arrays into the dicts and lists the matching loop indexes."""
+        return {
+            "vocabulary": {word: i for i, word in enumerate(automaton["vocabulary"])},
+            "size": max(1, len(automaton["vocabulary"])),
+            "tags": automaton["tags"],
+            "goto": dict(zip(automaton["keys"].tolist(), automaton["values"].tolist())),
+            "fail": automaton["fail"].tolist(),
+            "output_link": automaton["output_link"].tolist(),
+            "offsets": automaton["offsets"].tolist(),
+            "output_tags": automaton["output_tags"].tolist(),
+            "terms": automaton["terms"],
+            "states": len(automaton["fail"]),
+            "hash": automaton["hash"],
+            "build_seconds": automaton.get("build_seconds"),
+        }
+    
+    def tag(self, text: str) -> List[Tuple[str, int]]:
+        """Return (tag, occurrences) for every dictionary term in text, most frequent first.
+
+        At most TAXONOMY_MAX_TAGS tags are returned; an empty list means no
+        dictionary is loaded or no term matched. On the event loop a missing
+        automaton is loaded in the background and [] returned meanwhile;
+        worker threads and processes, which may block, load it inline.
+        """
+        if not self.refresh(wait=self.automaton is None and not in_event_loop()):
+            return []
+        automaton = self.automaton
+        vocabulary, size, goto = automaton["vocabulary"], automaton["size"], automaton["goto"]
+        fail, output_link = automaton["fail"], automaton["output_link"]
+        offsets, output_tags = automaton["offsets"], automaton["output_tags"]
+        
+        counts: Dict[int, int] = {}
+        state = 0
+        for word in term_words(text):
+            word_id = vocabulary.get(word)
+            if word_id is None:
+                # No term contains this word, so no partial match survives it
+                state = 0
+                continue
+            while True:
+                next_state = goto.get(state * size + word_id)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if not state:
+                    break
+                state = fail[state]
+            match = state if offsets[state] != offsets[state + 1] else output_link[state]
+            while match:
+                for tag_id in output_tags[offsets[match]:offsets[match + 1]]:
+                    counts[tag_id] = counts.get(tag_id, 0) + 1
+                match = output_link[match]
+        
+        self.stats["documents"] += 1
+        self.stats["matches"] += sum(counts.values())
+        tags = automaton["tags"]
+        ranked = heapq.nsmallest(
+            settings.TAXONOMY_MAX_TAGS, counts.items(), key=lambda item: (-item[1], tags[item[0]])
+        )
+        return [(tags[tag_id], count) for tag_id, count in ranked]
+    
+    def get_state(self) -> Dict:
+        """Return the loaded dictionary's size and usage counters.
+
+        Counters cover this process only; texts large enough for the
+        process pool are tagged, and counted, in the workers.
+        """
+        self.refresh()
+        automaton = self.automaton
+        if automaton is None:
+            return {"loaded": False, "path": self.path, **self.stats}
+        return {
+            "loaded": True,
+            "path": self.path,
+            "cache_path": self.cache_path,
+            "hash": automaton["hash"],
+            "terms": automaton["terms"],
+            "tags": len(automaton["tags"]),
+            "states": automaton["states"],
+            "build_seconds": automaton["build_seconds"],
+            "reloading": self._reloading,
+            **self.stats,
+        }
+
+
+# Global taxonomy tagger instance
+taxonomy_tagger = TaxonomyTagger()
@@ -3,8 +3,9 @@ Utility functions for text processing and analysis.
 """
 import re
 import json
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Dict
 from config.settings import settings
+from utils.taxonomy import taxonomy_tagger
 
 
 # Common English stopwords
@@ -68,12 +69,140 @@ def compute_confidence(parsed: Optional[dict], keywords: List[str]) -> float:
     return round(score, 2)
 
 
-def clean_text(text: str) -> str:
-    """Clean and normalize input text."""
-    return text.strip()
+def local_confidence(prompt_version: Optional[str]) -> Optional[float]:
+    """Return the fixed confidence of rows answered without the LLM, or None for LLM rows.
+
+    Local answers always parse cleanly, so compute_confidence would score
+    them 1.0 even though their labels and summary are rough.
+    """
+    if prompt_version == "local":
+        return settings.LOCAL_ANALYSIS_CONFIDENCE
+    if prompt_version == "classifier":
+        return settings.CLASSIFIER_CONFIDENCE
+    return None
+
+
+def postprocess_analysis(text: str, raw_response: str, messages: List[Dict],
+                         confidence: Optional[float] = None) -> Dict:
+    """Run the CPU-bound stages that turn a model response into a stored record.
+    
+    Parses the response, falls back to local keywords, tags the text
+    against the taxonomy dictionary, scores confidence (unless a fixed
+    confidence is given) and serializes the message transcript. A plain
+    module-level function so the executor layer can run it in a worker
+    thread or process.
+    """
+    summary, parsed = extract_json_and_summary(raw_response)
+    keywords = parsed.get("keywords", None) if parsed else None
+    if keywords is None:
+        keywords = extract_keywords(text)
+    return {
+        "title": parsed.get("title") if parsed else None,
+        "topics": parsed.get("topics", []) if parsed else [],
+        "sentiment": parsed.get("sentiment", "neutral") if parsed else "neutral",
+        "keywords": keywords,
+        "tags": taxonomy_tagger.tag(text),
+        "summary": summary,
+        "confidence": compute_confidence(parsed, keywords) if confidence is None else confidence,
+        "messages_json": json.dumps(messages),
+    }
+
+
+def local_analysis_response(text: str, sentiment: str = None, topics: Optional[List[str]] = None) -> str:
+    """Build a model-style response locally, used when the LLM backend is unavailable.
+    
+    Sentiment and topics default to neutral and the extracted keywords,
+    unless labels from the local classifier are passed in.
+    """
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    summary = sentences[0][:300] if sentences else ""
+    keywords = extract_keywords(text)
+    metadata = {
+        "title": None,
+        "topics": topics or keywords,
+        "sentiment": sentiment or "neutral",
+        "keywords": keywords,
+    }
+    return f"Summary: {summary}\n\n{json.dumps(metadata)}"
 
 
 def validate_text_input(text: str) -> bool:
     """Validate text input for analysis."""
-    cleaned_text = clean_text(text)
-    return len(cleaned_text) > 0
+    return len(text.strip()) > 0
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text locally (roughly 4 characters per token)."""
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+
+def plan_packs(texts: List[str], token_budget: int = None, max_item_tokens: int = None,
+               max_items: int = None) -> Tuple[List[List[int]], List[int]]:
+    """Group indices of short texts into packs that fit the token budget.
+
+    Returns (packs, singles): packs holds lists of indices to analyze together,
+    singles holds indices that should be analyzed one at a time.
+    """
+    if token_budget is None:
+        token_budget = settings.PACK_TOKEN_BUDGET
+    if max_item_tokens is None:
+        max_item_tokens = settings.PACK_MAX_ITEM_TOKENS
+    if max_items is None:
+        max_items = settings.PACK_MAX_ITEMS
+    
+    packs = []
+    singles = []
+    current = []
+    current_tokens = 0
+    
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if not validate_text_input(text) or tokens > max_item_tokens:
+            singles.append(index)
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    
+    # A pack of one gains nothing over a single call
+    singles.extend(pack[0] for pack in packs if len(pack) == 1)
+    packs = [pack for pack in packs if len(pack) > 1]
+    
+    return packs, sorted(singles)
+
+
+def extract_json_array(text: str, expected_count: int) -> List[Dict]:
+    """Extract an indexed JSON array of per-item results from AI response text.
+
+    Raises ValueError when the array is missing, malformed, or does not cover
+    every index from 0 to expected_count - 1.
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end == -1:
+        raise ValueError("No JSON array found in packed response")
+    
+    try:
+        items = json.loads(text[start:end+1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed JSON array in packed response: {e}")
+    
+    if not isinstance(items, list):
+        raise ValueError("Packed response is not a JSON array")
+    
+    by_index = {}
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get("index"), int):
+            by_index[item["index"]] = item
+    
+    if sorted(by_index) != list(range(expected_count)):
+        raise ValueError(
+            f"Packed response covers {len(by_index)} of {expected_count} items"
+        )
+    
+    return [by_index[i] for i in range(expected_count)]